@@ -0,0 +1,163 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#include "Arena.h"
+#include <string.h>
+
+/**
+ * Arena.cpp - blocks are kept on a doubly linked list so any one can be freed when it
+ * empties. The open block of a level (or the open long-lived block) is only freed once
+ * it is closed; until then an empty one just starts over from the beginning. Pieces
+ * too big to share a block get a block of their own.
+ */
+
+struct Arena::Block {
+    Arena *arena;
+    Block *prev;
+    Block *next;
+    char *free;         // the next unused byte
+    char *end;
+    long live;          // pieces not yet released
+    long long bytes;    // size of the whole block
+    bool kept;          // holds promoted pieces
+};
+
+//-- the header in front of each piece
+struct Arena::Piece {
+    Block *block;
+    long bytes;
+};
+
+static const long ALIGN = 16;
+
+static long roundUp(long bytes) {
+    return (bytes + ALIGN - 1) & ~(ALIGN - 1);
+}
+
+Arena::Arena(long blockSize) {
+    this->blockSize = blockSize;
+    levelBlock = NULL;
+    keptBlock = NULL;
+    blocks = NULL;
+    blockBytes = 0;
+    liveBytes = 0;
+}
+
+Arena::~Arena() {
+    while (blocks)
+        freeBlock(blocks);
+}
+
+Arena::Block *Arena::newBlock(long bytes, bool kept) {
+    char *data = new char[bytes];
+    Block *block = (Block *) data;
+    block->arena = this;
+    block->prev = NULL;
+    block->next = blocks;
+    if (blocks)
+        blocks->prev = block;
+    blocks = block;
+    block->free = data + roundUp(sizeof(Block));
+    block->end = data + bytes;
+    block->live = 0;
+    block->bytes = bytes;
+    block->kept = kept;
+    blockBytes += bytes;
+    return block;
+}
+
+void Arena::freeBlock(Block *block) {
+    if (block->prev)
+        block->prev->next = block->next;
+    else
+        blocks = block->next;
+    if (block->next)
+        block->next->prev = block->prev;
+    if (block == levelBlock)
+        levelBlock = NULL;
+    if (block == keptBlock)
+        keptBlock = NULL;
+    blockBytes -= block->bytes;
+    delete[] (char *) block;
+}
+
+//-- take space from the given open block, opening a new one if needed. Called with the lock held.
+void *Arena::take(Block *&current, long bytes, bool kept) {
+    long need = roundUp(sizeof(Piece)) + roundUp(bytes);
+    Block *block;
+    if (need > blockSize / 4) {
+        block = newBlock(roundUp(sizeof(Block)) + need, kept);
+    } else {
+        if (current == NULL || current->free + need > current->end) {
+            if (current && current->live == 0)
+                freeBlock(current);
+            current = newBlock(blockSize, kept);
+        }
+        block = current;
+    }
+    Piece *piece = (Piece *) block->free;
+    block->free += need;
+    block->live++;
+    piece->block = block;
+    piece->bytes = bytes;
+    liveBytes += bytes;
+    return (char *) piece + roundUp(sizeof(Piece));
+}
+
+void *Arena::allocate(long bytes) {
+    std::lock_guard<std::mutex> guard(lock);
+    return take(levelBlock, bytes, false);
+}
+
+void *Arena::promote(void *ptr) {
+    if (ptr == NULL)
+        return NULL;
+    Piece *piece = (Piece *) ((char *) ptr - roundUp(sizeof(Piece)));
+    if (piece->block->kept)
+        return ptr;
+    std::lock_guard<std::mutex> guard(lock);
+    void *moved = take(keptBlock, piece->bytes, true);
+    memcpy(moved, ptr, piece->bytes);
+    releaseLocked(piece->block, piece->bytes);
+    return moved;
+}
+
+void Arena::release(void *ptr) {
+    if (ptr == NULL)
+        return;
+    Piece *piece = (Piece *) ((char *) ptr - roundUp(sizeof(Piece)));
+    Arena *arena = piece->block->arena;
+    std::lock_guard<std::mutex> guard(arena->lock);
+    arena->releaseLocked(piece->block, piece->bytes);
+}
+
+void Arena::releaseLocked(Block *block, long bytes) {
+    liveBytes -= bytes;
+    if (--block->live > 0)
+        return;
+    if (block == levelBlock || block == keptBlock)
+        block->free = (char *) block + roundUp(sizeof(Block));
+    else
+        freeBlock(block);
+}
+
+void Arena::newLevel() {
+    std::lock_guard<std::mutex> guard(lock);
+    if (levelBlock && levelBlock->live == 0)
+        freeBlock(levelBlock);
+    levelBlock = NULL;
+}
+
+long long Arena::getBlockBytes() {
+    std::lock_guard<std::mutex> guard(lock);
+    return blockBytes;
+}
+
+long long Arena::getLiveBytes() {
+    std::lock_guard<std::mutex> guard(lock);
+    return liveBytes;
+}
@@ -6,98 +6,260 @@
  */
 
 #include "AttributeList.h"
+#include "Arena.h"
+#include "attrDescs.h"
 #include "_Core.h"
 #include <assert.h>
+#include <ctype.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <atomic>
+#include <mutex>
 
 /**
- * AttributeList.cpp - implements an attribute list, a sequence of name/value
- * pairs attached to another object. Searching by name is supported, as well as
- * iterating over the attributes (get the count, then access by index)
+ * AttributeList.cpp - implements an attribute list, a set of name/value
+ * pairs attached to another object. Names are interned to IDs in a table shared
+ * by all lists, and each list stores its values in an array indexed by ID.
+ * Searching by name or ID is supported, as well as iterating over the attributes
+ * (the index of an attribute is its ID).
  */
 
-static int findName(const char **names, const char *name, int count)
-{
-    //-- if name contains "$", everything after that is formatting info, so don't compare that part.
-    const char *cp = strchr(name, '$');
-    int len = (cp == 0) ? strlen(name) : cp - name;
-    char *name2 = new char[len+1];
-    strncpy(name2, name, len);
-    name2[len] = '\0';
-    int match = -1;
-    for (int i = 0; i < count; i++) {
-	if (strcasecmp(name2, names[i]) == 0) {
-	    match = i;
-	    break;
-	}
-    }
-    delete [] name2;
-    return match;
+//-- the interned names. IDs are handed out in order and never reused. Lookups don't
+//-- lock: a slot is only published, with release order, after its name is stored.
+const int MAX_ATTRIBUTE_NAMES = 1024;
+const int NAME_SLOT_COUNT = 2 * MAX_ATTRIBUTE_NAMES; // must be a power of 2
+
+class AttributeNames {
+    public:
+        AttributeNames() {
+            count = 0;
+            for (int i = 0; i < NAME_SLOT_COUNT; i++)
+                slots[i] = 0;
+            for (const attrDesc &desc : attrDescriptions)
+                intern(desc.name);
+        }
+
+        int find(const char *name, int len, unsigned int code) {
+            for (int i = code & (NAME_SLOT_COUNT - 1);; i = (i + 1) & (NAME_SLOT_COUNT - 1)) {
+                int slot = slots[i].load(std::memory_order_acquire);
+                if (slot == 0)
+                    return -1;
+                const char *stored = names[slot - 1];
+                if (strncasecmp(stored, name, len) == 0 && stored[len] == '\0')
+                    return slot - 1;
+            }
+        }
+
+        int find(const char *name) {
+            int len;
+            unsigned int code = hash(name, &len);
+            return find(name, len, code);
+        }
+
+        int intern(const char *name) {
+            int len;
+            unsigned int code = hash(name, &len);
+            int id = find(name, len, code);
+            if (id >= 0)
+                return id;
+            std::lock_guard<std::mutex> guard(lock);
+            //-- look again, in case another thread added it
+            id = find(name, len, code);
+            if (id >= 0 || count >= MAX_ATTRIBUTE_NAMES)
+                return id;
+            char *copy = new char[len + 1];
+            strncpy(copy, name, len);
+            copy[len] = '\0';
+            id = count++;
+            names[id] = copy;
+            int i = code & (NAME_SLOT_COUNT - 1);
+            while (slots[i].load(std::memory_order_relaxed) != 0)
+                i = (i + 1) & (NAME_SLOT_COUNT - 1);
+            slots[i].store(id + 1, std::memory_order_release);
+            return id;
+        }
+
+        const char *name(int id) {
+            return (id >= 0 && id < count) ? names[id] : NULL;
+        }
+
+    private:
+        //-- FNV-1a over the lowercased name, up to any "$"
+        static unsigned int hash(const char *name, int *len) {
+            unsigned int code = 2166136261u;
+            const char *cp;
+            for (cp = name; *cp && *cp != '$'; cp++) {
+                code ^= (unsigned char) tolower((unsigned char) *cp);
+                code *= 16777619u;
+            }
+            *len = cp - name;
+            return code;
+        }
+
+        const char *names[MAX_ATTRIBUTE_NAMES];
+        std::atomic<int> slots[NAME_SLOT_COUNT]; // 0 if empty, else ID + 1
+        std::atomic<int> count;
+        std::mutex lock;
+};
+
+static AttributeNames &attributeNames()
+{
+    static AttributeNames names;
+    return names;
 }
 
+int AttributeList::getAttributeID(const char *name)
+{
+    return attributeNames().intern(name);
+}
 
-AttributeList::AttributeList(int size)
+int AttributeList::findAttributeID(const char *name)
 {
+    return attributeNames().find(name);
+}
+
+const char *AttributeList::getAttributeName(int id)
+{
+    return attributeNames().name(id);
+}
+
+//-- attribute lists of shared models and relations may be read and filled in by
+//-- several threads. Rather than give every list its own mutex, lists share a
+//-- small pool of locks, picked by address.
+const int ATTRIBUTE_LOCK_COUNT = 64;
+static std::mutex attributeLocks[ATTRIBUTE_LOCK_COUNT];
+
+static std::mutex &lockFor(const AttributeList *list)
+{
+    return attributeLocks[((size_t) list / sizeof(AttributeList)) % ATTRIBUTE_LOCK_COUNT];
+}
+
+const int PRESENT_BITS = 64;
+
+
+AttributeList::AttributeList(int size, Arena *arena)
+{
+    //-- storage is allocated on first use, sized by the largest ID set
+    this->arena = arena;
     attrCount = 0;
-    maxAttrCount = size;
-    names = new const char*[maxAttrCount];
-    values = new double[maxAttrCount];
-    memset(names,0,maxAttrCount*sizeof(char));
-    memset(values,0,maxAttrCount*sizeof(double));
+    maxAttrCount = 0;
+    values = NULL;
+    present = NULL;
 }
 
 
 AttributeList::~AttributeList()
 {
-    if (names) delete [] names;
-    if (values) delete [] values;
+    release(values);
+    release(present);
+}
+
+
+void *AttributeList::allocate(long bytes)
+{
+    return arena ? arena->allocate(bytes) : new char[bytes];
+}
+
+
+void AttributeList::release(void *ptr)
+{
+    if (ptr == NULL)
+        return;
+    if (arena)
+        Arena::release(ptr);
+    else
+        delete [] (char *) ptr;
+}
+
+
+void AttributeList::promote()
+{
+    if (arena == NULL)
+        return;
+    std::lock_guard<std::mutex> guard(lockFor(this));
+    values = (double *) arena->promote(values);
+    present = (unsigned long long *) arena->promote(present);
 }
 
 
 long AttributeList::size()
 {
-    return sizeof(AttributeList) * maxAttrCount * (sizeof(char*) + sizeof(double));
+    return sizeof(AttributeList) + maxAttrCount * sizeof(double) + maxAttrCount / PRESENT_BITS * sizeof(unsigned long long);
 }
 
 
 void AttributeList::reset()
 {
+    std::lock_guard<std::mutex> guard(lockFor(this));
+    if (present)
+        memset(present, 0, maxAttrCount / PRESENT_BITS * sizeof(unsigned long long));
     attrCount = 0;
 }
 
 
-void AttributeList::setAttribute(const char *name, double value)
+//-- make room for the given ID. Called with the lock held.
+void AttributeList::grow(int id)
 {
-    const int FACTOR = 2;
-
-    // if this attribute is already in the list, change it;
-    // otherwise, add a new one
-    int index = findName(names, name, attrCount);
-    if (index >= 0) values[index] = value;
-    else {
-	while (attrCount >= maxAttrCount) {
-	    names = (const char **) growStorage(names, maxAttrCount*sizeof(char*), FACTOR);
-	    values = (double*) growStorage(values, maxAttrCount*sizeof(double), FACTOR);
-	    maxAttrCount *=	FACTOR;
-	}
-	names[attrCount] = name;
-	values[attrCount++] = value;
+    int newMax = (id / PRESENT_BITS + 1) * PRESENT_BITS;
+    double *newValues = (double *) allocate(newMax * sizeof(double));
+    unsigned long long *newPresent = (unsigned long long *) allocate(newMax / PRESENT_BITS * sizeof(unsigned long long));
+    memset(newPresent, 0, newMax / PRESENT_BITS * sizeof(unsigned long long));
+    if (values) {
+        memcpy(newValues, values, maxAttrCount * sizeof(double));
+        memcpy(newPresent, present, maxAttrCount / PRESENT_BITS * sizeof(unsigned long long));
+        release(values);
+        release(present);
     }
+    values = newValues;
+    present = newPresent;
+    maxAttrCount = newMax;
 }
 
 
-int AttributeList::getAttributeIndex(const char *name)
+void AttributeList::setAttribute(int id, double value)
 {
-    return findName(names, name, attrCount);
+    if (id < 0) return;
+    std::lock_guard<std::mutex> guard(lockFor(this));
+    if (id >= maxAttrCount)
+        grow(id);
+    unsigned long long bit = 1ULL << (id % PRESENT_BITS);
+    if (!(present[id / PRESENT_BITS] & bit)) {
+        present[id / PRESENT_BITS] |= bit;
+        attrCount++;
+    }
+    values[id] = value;
+}
+
+
+double AttributeList::getAttribute(int id)
+{
+    std::lock_guard<std::mutex> guard(lockFor(this));
+    if (id < 0 || id >= maxAttrCount || !(present[id / PRESENT_BITS] & (1ULL << (id % PRESENT_BITS))))
+        return -1.0;
+    return values[id];
+}
+
+
+void AttributeList::setAttribute(const char *name, double value)
+{
+    setAttribute(getAttributeID(name), value);
 }
 
 
 double AttributeList::getAttribute(const char *name)
 {
-    int index = findName(names, name, attrCount);
-    return (index >= 0) ? values[index] : -1.0;
+    return getAttribute(findAttributeID(name));
+}
+
+
+int AttributeList::getAttributeIndex(const char *name)
+{
+    int id = findAttributeID(name);
+    std::lock_guard<std::mutex> guard(lockFor(this));
+    if (id < 0 || id >= maxAttrCount || !(present[id / PRESENT_BITS] & (1ULL << (id % PRESENT_BITS))))
+        return -1;
+    return id;
 }
 
 
@@ -109,7 +271,7 @@ int AttributeList::getAttributeCount()
 
 double AttributeList::getAttributeByIndex(int index)
 {
-    return (index < attrCount) ? values[index] : -1.0;
+    return getAttribute(index);
 }
 
 
@@ -117,8 +279,7 @@ void AttributeList::dump()
 {
     if (attrCount == 0) return;
     printf("\t\tAttributes: %d/%d", attrCount, maxAttrCount);
-    //for (int i = 0; i < attrCount; i++) {
-    //printf("\t%s: %lf", names[i], values[i]);
+    //for (int i = 0; i < maxAttrCount; i++) {
+    //printf("\t%s: %lf", getAttributeName(i), values[i]);
     //}
 }
-
@@ -0,0 +1,228 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#include "DataCache.h"
+#include "Options.h"
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+/**
+ * DataCache.cpp - reads and writes the binary data cache. The file is laid out as
+ * a header, then the value map of each variable (a count, followed by that many
+ * null-terminated value strings, in value index order), then the input tuples and
+ * the test tuples, as stored by Table: all the keys of a table, then all its values. Numbers are in native byte order, since a
+ * cache is only meant to be read on the machine that wrote it.
+ */
+
+const char CACHE_MAGIC[8] = { 'O', 'C', 'C', 'A', 'M', 'D', 'C', '\0' };
+const int CACHE_VERSION = 2;
+
+struct CacheHeader {
+        char magic[8];
+        int version;
+        int keysize;
+        unsigned long long sourceHash;
+        int varCount;
+        int dataLines;
+        int testLines;
+        long long valueBytes; // size of the value map section
+        long long tupleBytes; // size of one tuple
+        long long inputCount;
+        long long testCount; // -1 if there is no test data
+};
+
+
+unsigned long long ocHashFile(FILE *fd)
+{
+    //-- FNV-1a, over the whole file
+    unsigned long long hash = 0xcbf29ce484222325ULL;
+    long pos = ftell(fd);
+    unsigned char buf[65536];
+    size_t count;
+    rewind(fd);
+    while ((count = fread(buf, 1, sizeof(buf), fd)) > 0) {
+        for (size_t i = 0; i < count; i++) {
+            hash ^= buf[i];
+            hash *= 0x100000001b3ULL;
+        }
+    }
+    clearerr(fd);
+    fseek(fd, pos, SEEK_SET);
+    return hash;
+}
+
+
+unsigned long long ocHashParseOptions(Options *options, unsigned long long hash)
+{
+    //-- FNV-1a, continued over each definition and its terminating null
+    void *nextp = NULL;
+    const char *vardef;
+    while (options->getOptionString("nominal", &nextp, &vardef)) {
+        const unsigned char *cp = (const unsigned char *) vardef;
+        do {
+            hash ^= *cp;
+            hash *= 0x100000001b3ULL;
+        } while (*cp++);
+    }
+    return hash;
+}
+
+
+static Table *loadTable(const char *tuples, long long count, int keysize)
+{
+    Table *table = new Table(keysize, count > 0 ? count : 1);
+    table->setIndexed(true);
+    const char *values = tuples + count * keysize * sizeof(KeySegment);
+    table->setTupleData((const KeySegment *) tuples, (const ocTupleValue *) values, count);
+    return table;
+}
+
+
+/**
+ * loadCache - check the mapped cache against the source hash and the variables, and
+ * then load it. Nothing is changed unless the whole cache checks out.
+ */
+static bool loadCache(const char *base, long long size, unsigned long long sourceHash, VariableList *vars,
+        Table **indata, Table **testdata, int *dataLines, int *testLines)
+{
+    CacheHeader header;
+    memcpy(&header, base, sizeof(header));
+    int keysize = vars->getKeySize();
+    if (memcmp(header.magic, CACHE_MAGIC, sizeof(CACHE_MAGIC)) != 0 || header.version != CACHE_VERSION
+            || header.sourceHash != sourceHash || header.keysize != keysize
+            || header.varCount != vars->getVarCount()
+            || header.tupleBytes != (long long) (keysize * sizeof(KeySegment) + sizeof(ocTupleValue))
+            || header.inputCount < 0 || header.valueBytes < 0)
+        return false;
+    long long testCount = header.testCount > 0 ? header.testCount : 0;
+    if (size != (long long) sizeof(header) + header.valueBytes + (header.inputCount + testCount) * header.tupleBytes)
+        return false;
+
+    //-- check the value maps: the counts must fit the variables, and the strings the section
+    const char *values = base + sizeof(header);
+    const char *end = values + header.valueBytes;
+    const char *cp = values;
+    for (int i = 0; i < header.varCount; i++) {
+        Variable *var = vars->getVariable(i);
+        int count;
+        if (end - cp < (long) sizeof(count)) return false;
+        memcpy(&count, cp, sizeof(count));
+        cp += sizeof(count);
+        if (count < 0 || count > var->cardinality || var->valmap[0] != NULL) return false;
+        for (int v = 0; v < count; v++) {
+            const char *nul = (const char *) memchr(cp, '\0', end - cp);
+            if (nul == NULL) return false;
+            cp = nul + 1;
+        }
+    }
+    if (cp != end) return false;
+
+    //-- everything checks out; fill in the value maps, in index order, and the tables
+    cp = values;
+    for (int i = 0; i < header.varCount; i++) {
+        int count;
+        memcpy(&count, cp, sizeof(count));
+        cp += sizeof(count);
+        for (int v = 0; v < count; v++) {
+            vars->getVarValueIndex(i, cp);
+            cp += strlen(cp) + 1;
+        }
+    }
+    *indata = loadTable(end, header.inputCount, keysize);
+    if (header.testCount >= 0)
+        *testdata = loadTable(end + header.inputCount * header.tupleBytes, header.testCount, keysize);
+    *dataLines = header.dataLines;
+    *testLines = header.testLines;
+    return true;
+}
+
+
+bool ocLoadDataCache(const char *path, unsigned long long sourceHash, VariableList *vars,
+        Table **indata, Table **testdata, int *dataLines, int *testLines)
+{
+    int fd = open(path, O_RDONLY);
+    if (fd < 0) return false;
+    struct stat st;
+    if (fstat(fd, &st) != 0 || st.st_size < (off_t) sizeof(CacheHeader)) {
+        close(fd);
+        return false;
+    }
+    void *map = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (map == MAP_FAILED) return false;
+    bool loaded = loadCache((const char *) map, st.st_size, sourceHash, vars, indata, testdata, dataLines, testLines);
+    munmap(map, st.st_size);
+    return loaded;
+}
+
+
+static bool writeTuples(FILE *fd, Table *table)
+{
+    size_t count = table->getTupleCount();
+    return fwrite(table->getKeyData(), table->getKeySize() * sizeof(KeySegment), count, fd) == count
+            && fwrite(table->getValueData(), sizeof(ocTupleValue), count, fd) == count;
+}
+
+
+bool ocSaveDataCache(const char *path, unsigned long long sourceHash, VariableList *vars,
+        int dataLines, int testLines, Table *indata, Table *testdata)
+{
+    CacheHeader header;
+    memset(&header, 0, sizeof(header));
+    memcpy(header.magic, CACHE_MAGIC, sizeof(CACHE_MAGIC));
+    header.version = CACHE_VERSION;
+    header.keysize = vars->getKeySize();
+    header.sourceHash = sourceHash;
+    header.varCount = vars->getVarCount();
+    header.dataLines = dataLines;
+    header.testLines = testLines;
+    header.tupleBytes = header.keysize * sizeof(KeySegment) + sizeof(ocTupleValue);
+    header.inputCount = indata->getTupleCount();
+    header.testCount = testdata ? testdata->getTupleCount() : -1;
+    header.valueBytes = 0;
+    for (int i = 0; i < header.varCount; i++) {
+        Variable *var = vars->getVariable(i);
+        header.valueBytes += sizeof(int);
+        for (int v = 0; v < var->cardinality && var->valmap[v] != NULL; v++)
+            header.valueBytes += strlen(var->valmap[v]) + 1;
+    }
+
+    //-- write to a temporary file and rename it, so readers never see a partial cache
+    char *tmpPath = new char[strlen(path) + 32];
+    sprintf(tmpPath, "%s.%ld.tmp", path, (long) getpid());
+    FILE *fd = fopen(tmpPath, "wb");
+    if (fd == NULL) {
+        delete[] tmpPath;
+        return false;
+    }
+    bool ok = fwrite(&header, sizeof(header), 1, fd) == 1;
+    for (int i = 0; ok && i < header.varCount; i++) {
+        Variable *var = vars->getVariable(i);
+        int count = 0;
+        while (count < var->cardinality && var->valmap[count] != NULL)
+            count++;
+        ok = fwrite(&count, sizeof(count), 1, fd) == 1;
+        for (int v = 0; ok && v < count; v++)
+            ok = fwrite(var->valmap[v], strlen(var->valmap[v]) + 1, 1, fd) == 1;
+    }
+    if (ok && header.inputCount > 0)
+        ok = writeTuples(fd, indata);
+    if (ok && header.testCount > 0)
+        ok = writeTuples(fd, testdata);
+    ok = (fclose(fd) == 0) && ok;
+    if (ok)
+        ok = rename(tmpPath, path) == 0;
+    if (!ok)
+        unlink(tmpPath);
+    delete[] tmpPath;
+    return ok;
+}
@@ -0,0 +1,215 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#include "DenseTable.h"
+#include "Key.h"
+#include <float.h>
+#include <math.h>
+#include <string.h>
+
+/**
+ * DenseTable.cpp - the passes over the cell array walk the cells in index order, keeping
+ * the values of the variables in an odometer. The marginal cell of the current cell is
+ * kept up to date as the odometer turns, so no cell's variable values are ever decoded.
+ * The innermost loop runs along the last variable, which has stride 1.
+ */
+
+DenseTable::DenseTable(VariableList *vars) {
+    varList = vars;
+    varCount = vars->getVarCount();
+    keysize = vars->getKeySize();
+    card = new int[varCount];
+    stride = new long long[varCount];
+    cells = 1;
+    for (int v = varCount - 1; v >= 0; v--) {
+        card[v] = vars->getVariable(v)->cardinality;
+        stride[v] = cells;
+        cells *= card[v];
+    }
+    data = new double[cells];
+    memset(data, 0, cells * sizeof(double));
+    marginalMax = 0;
+    target = NULL;
+    marginal = NULL;
+}
+
+DenseTable::~DenseTable() {
+    delete[] card;
+    delete[] stride;
+    delete[] data;
+    if (target) delete[] target;
+    if (marginal) delete[] marginal;
+}
+
+long long DenseTable::size() {
+    int varCount = varList->getVarCount();
+    return sizeof(DenseTable) + varCount * (sizeof(int) + sizeof(long long)) + (cells + 2 * marginalMax) * sizeof(double);
+}
+
+long long DenseTable::cellCount(VariableList *vars, long long limit) {
+    long long count = 1;
+    for (int v = 0; v < vars->getVarCount(); v++) {
+        count *= vars->getVariable(v)->cardinality;
+        if (count > limit)
+            return -1;
+    }
+    return count;
+}
+
+long long DenseTable::relationStrides(Relation *rel, long long *relStride) {
+    memset(relStride, 0, varCount * sizeof(long long));
+    long long count = 1;
+    //-- relation variables are sorted, so this keeps the last one fastest
+    for (int i = rel->getVariableCount() - 1; i >= 0; i--) {
+        int v = rel->getVariable(i);
+        relStride[v] = count;
+        count *= card[v];
+    }
+    if (count > marginalMax) {
+        if (target) delete[] target;
+        if (marginal) delete[] marginal;
+        target = new double[count];
+        marginal = new double[count];
+        marginalMax = count;
+    }
+    return count;
+}
+
+long long DenseTable::marginalIndex(KeySegment *key, long long *relStride) {
+    long long index = 0;
+    for (int v = 0; v < varCount; v++) {
+        if (relStride[v])
+            index += Key::getKeyValue(key, keysize, varList, v) * relStride[v];
+    }
+    return index;
+}
+
+void DenseTable::expand(Relation *rel, Table *relTable) {
+    long long relStride[varCount];
+    long long relCells = relationStrides(rel, relStride);
+    memset(target, 0, relCells * sizeof(double));
+    for (long long i = 0; i < relTable->getTupleCount(); i++)
+        target[marginalIndex(relTable->getKey(i), relStride)] = relTable->getValue(i);
+
+    //-- like the sparse expansion, each state gets the full value of its marginal cell
+    int digit[varCount];
+    memset(digit, 0, sizeof(digit));
+    int last = varCount - 1;
+    long long r = 0;
+    for (long long c = 0; c < cells; c += card[last]) {
+        long long ri = r;
+        for (int d = 0; d < card[last]; d++, ri += relStride[last])
+            data[c + d] = target[ri];
+        for (int v = last - 1; v >= 0; v--) {
+            if (++digit[v] < card[v]) {
+                r += relStride[v];
+                break;
+            }
+            r -= (card[v] - 1) * relStride[v];
+            digit[v] = 0;
+        }
+    }
+}
+
+void DenseTable::load(Table *table) {
+    memset(data, 0, cells * sizeof(double));
+    for (long long i = 0; i < table->getTupleCount(); i++) {
+        KeySegment *key = table->getKey(i);
+        long long c = 0;
+        for (int v = 0; v < varCount; v++)
+            c += Key::getKeyValue(key, keysize, varList, v) * stride[v];
+        data[c] = table->getValue(i);
+    }
+}
+
+void DenseTable::store(Table *table) {
+    table->reset(keysize);
+    int digit[varCount];
+    memset(digit, 0, sizeof(digit));
+    KeySegment key[keysize];
+    Key::buildFullKey(key, keysize, varList, digit);
+    int last = varCount - 1;
+    for (long long c = 0; c < cells; c += card[last]) {
+        for (int d = 0; d < card[last]; d++) {
+            if (data[c + d] > 0) {
+                Key::setKeyValue(key, keysize, varList, last, d);
+                table->addTuple(key, data[c + d]);
+            }
+        }
+        for (int v = last - 1; v >= 0; v--) {
+            if (++digit[v] < card[v]) {
+                Key::setKeyValue(key, keysize, varList, v, digit[v]);
+                break;
+            }
+            digit[v] = 0;
+            Key::setKeyValue(key, keysize, varList, v, 0);
+        }
+    }
+    table->sort();
+}
+
+double DenseTable::fitRelation(Relation *rel, Table *relTable) {
+    long long relStride[varCount];
+    long long relCells = relationStrides(rel, relStride);
+    memset(target, 0, relCells * sizeof(double));
+    memset(marginal, 0, relCells * sizeof(double));
+    for (long long i = 0; i < relTable->getTupleCount(); i++)
+        target[marginalIndex(relTable->getKey(i), relStride)] = relTable->getValue(i);
+
+    int digit[varCount];
+    int last = varCount - 1;
+    long long lastStride = relStride[last];
+    long long r;
+
+    //-- sum the current cells into the marginal
+    memset(digit, 0, sizeof(digit));
+    r = 0;
+    for (long long c = 0; c < cells; c += card[last]) {
+        long long ri = r;
+        for (int d = 0; d < card[last]; d++, ri += lastStride)
+            marginal[ri] += data[c + d];
+        for (int v = last - 1; v >= 0; v--) {
+            if (++digit[v] < card[v]) {
+                r += relStride[v];
+                break;
+            }
+            r -= (card[v] - 1) * relStride[v];
+            digit[v] = 0;
+        }
+    }
+
+    //-- the error is taken over the marginal cells which have some nonzero state, as
+    //-- the sparse fit takes it over the tuples it holds
+    double error = 0.0;
+    for (long long i = 0; i < relCells; i++) {
+        if (target[i] > DBL_EPSILON && marginal[i] > 0)
+            error = fmax(error, fabs(target[i] - marginal[i]));
+        //-- cells under a zero marginal are zeroed
+        if (target[i] <= DBL_EPSILON || marginal[i] <= DBL_EPSILON)
+            target[i] = 0.0;
+    }
+
+    //-- scale each cell; the product is taken in the same order as the sparse fit's
+    memset(digit, 0, sizeof(digit));
+    r = 0;
+    for (long long c = 0; c < cells; c += card[last]) {
+        long long ri = r;
+        for (int d = 0; d < card[last]; d++, ri += lastStride) {
+            double value = target[ri] > 0.0 ? data[c + d] * target[ri] / marginal[ri] : 0.0;
+            data[c + d] = value > DBL_EPSILON ? value : 0.0;
+        }
+        for (int v = last - 1; v >= 0; v--) {
+            if (++digit[v] < card[v]) {
+                r += relStride[v];
+                break;
+            }
+            r -= (card[v] - 1) * relStride[v];
+            digit[v] = 0;
+        }
+    }
+    return error;
+}
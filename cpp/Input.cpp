@@ -7,6 +7,7 @@
 
 
 #include "Input.h"
+#include "DataCache.h"
 #include "Key.h"
 #include "Options.h"
 #include "VariableList.h"
@@ -14,6 +15,7 @@
 #include <string.h>
 #include <ctype.h>
 #include <stdlib.h>
+#include <time.h>
 
 struct LostVar {
         int num;
@@ -45,7 +47,13 @@ bool KeepVal(LostVar *lostvarpt, char * var) {
     return false;
 }
 
-/*ReadData - read data tuples, one per line; return number of lines read
+//-- tuples are appended to the table unsorted as they are read. Every READ_CHUNK_ROWS
+//-- rows the new ones are sorted and merged into the sorted tuples before them; this
+//-- bounds the memory used by repeated keys, without sorting the whole table again.
+const long READ_CHUNK_ROWS = 1 << 20;
+
+/*ReadData - read data tuples, one per line; return number of lines read.
+ * The table is left sorted, with the values of repeated keys added together.
  */
 long ocReadData(FILE *fin, VariableList *vars, Table *indata, LostVar *lostvarp) {
     char line[MAXLINE];
@@ -62,13 +70,14 @@ long ocReadData(FILE *fin, VariableList *vars, Table *indata, LostVar *lostvarp)
     int b_lostvar = 0;
     int flag = KEEP;
     char var[MAXLINE];
-    char newvalue[MAXLINE];
     bool keepval = true;
     values = new int[varCount];
     indices = new int[varCount];
     int j = 0;
     int value = 0;
     int l = 0;
+    long unmerged = 0;
+    long long merged = 0;   // tuples already sorted and summed
     gotLine = Options::getLine(fin, line, &lineno);
     if (!gotLine) {
         printf("No data\n");
@@ -78,8 +87,6 @@ long ocReadData(FILE *fin, VariableList *vars, Table *indata, LostVar *lostvarp)
         char *cp = line;
         l++;
         for (int i = 0; i < varCountDF; i++) { //Anjali
-            newvalue[0] = '\0';
-
             auto checkValue = [&](int resolvedvalue) {
                 if (resolvedvalue < 0) { // cardinality error
                         printf("Error in data, line %d: new value exceeds cardinality of variable #%d, \"%s\"\n",
@@ -100,8 +107,8 @@ long ocReadData(FILE *fin, VariableList *vars, Table *indata, LostVar *lostvarp)
 
             if (vars->isVarInUse(i)) { //Anjali
                 if ((vars->getVariable(j)->rebin == true) || (vars->getVariable(j)->exclude != NULL)) {
-                    vars->getNewValue(j, cp, newvalue);
-                    if (newvalue[0] != '\0') {
+                    const char *newvalue = vars->getNewValue(j, cp);
+                    if (newvalue != NULL) {
                         value = vars->getVarValueIndex(j, newvalue);
                         checkValue(value);
                     } else
@@ -156,7 +163,12 @@ long ocReadData(FILE *fin, VariableList *vars, Table *indata, LostVar *lostvarp)
         }
         if (flag == KEEP) {
             Key::buildKey(key, keysize, vars, indices, values, varCount);
-            indata->sumTuple(key, tupleValue);
+            indata->addTuple(key, tupleValue);
+            if (++unmerged >= READ_CHUNK_ROWS) {
+                indata->sortAndSum(merged);
+                merged = indata->getTupleCount();
+                unmerged = 0;
+            }
         }
         flag = KEEP;
 
@@ -169,6 +181,7 @@ long ocReadData(FILE *fin, VariableList *vars, Table *indata, LostVar *lostvarp)
             break;
         }
     }
+    indata->sortAndSum(merged);
     delete[] indices;
     delete[] values;
     delete[] key;
@@ -581,6 +594,7 @@ void ocRebinDefineVar(Options *options, VariableList *vars, LostVar ** lostvarp)
                             break;
                     } //end of while for tokenizing
                     Done: varpt->oldnew[NEW_ROW][index] = NULL; //marks end of mapping
+                    vars->compileRebin(num_var_actual - 1);
 
                 } //end of variable is kept
                 done1: rebin[0] = '\0';
@@ -607,6 +621,17 @@ void ocRebinDefineVar(Options *options, VariableList *vars, LostVar ** lostvarp)
     return;
 }
 
+/*
+ * reportReadRate - print the row count and read rate for a table just read
+ */
+static void reportReadRate(const char *what, long rows, Table *table, clock_t start) {
+    double seconds = (double) (clock() - start) / CLOCKS_PER_SEC;
+    printf("Read %ld %s rows (%lld distinct) in %.2f seconds", rows, what, table->getTupleCount(), seconds);
+    if (seconds > 0)
+        printf(", %.0f rows/sec", rows / seconds);
+    printf("\n");
+}
+
 /*
  * oldRead - read old format files.
  */
@@ -622,20 +647,45 @@ int ocReadFile(FILE *fd, Options *options, Table **indata, Table **testdata, Var
         options->readOptions(fd);
     }
     ocRebinDefineVar(options, varp, &lostvarp);
+    const char *option;
+    bool readStats = options->getOptionString("read-stats", NULL, &option);
+    clock_t start = clock();
+    //-- If a data cache is given, and it matches this file, load the data from it
+    const char *cachePath = NULL;
+    unsigned long long sourceHash = 0;
+    bool cached = false;
+    if (options->getOptionString("data-cache", NULL, &cachePath) && cachePath[0] == '\0')
+        cachePath = NULL;
+    if (cachePath) {
+        sourceHash = ocHashParseOptions(options, ocHashFile(fd));
+        cached = ocLoadDataCache(cachePath, sourceHash, varp, indata, testdata, &dataLines, &testLines);
+        if (cached && readStats) {
+            reportReadRate("cached data", dataLines, *indata, start);
+            if (*testdata)
+                reportReadRate("cached test", testLines, *testdata, start);
+        }
+    }
     //-- If not at end of file, there is data in this file
-    if (!feof(fd)) {
+    if (!cached && !feof(fd)) {
         *indata = indatap = new Table(varp->getKeySize(), 64);
+        indatap->setIndexed(true);
         dataLines = ocReadData(fd, varp, indatap, lostvarp);
-        indatap->sort();
+        if (readStats)
+            reportReadRate("data", dataLines, indatap, start);
     }
     //-- If there's still data, then it must be test data
-    if (!feof(fd)) {
+    if (!cached && !feof(fd)) {
+        start = clock();
         *testdata = testdatap = new Table(varp->getKeySize(), 64);
+        testdatap->setIndexed(true);
         testLines = ocReadData(fd, varp, testdatap, lostvarp);
-        testdatap->sort();
+        if (readStats)
+            reportReadRate("test", testLines, testdatap, start);
     }
     bool result = varp->checkCardinalities();
     if (result == false)
         exit(1);
+    if (cachePath && !cached && indatap && !ocSaveDataCache(cachePath, sourceHash, varp, dataLines, testLines, indatap, testdatap))
+        printf("Warning: couldn't write data cache %s\n", cachePath);
     return dataLines;
 }
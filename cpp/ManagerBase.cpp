@@ -10,6 +10,8 @@
 #include <gmp.h>
 #include <fenv.h>
 #include <math.h>
+#include "Arena.h"
+#include "DenseTable.h"
 #include "Input.h"
 #include "Key.h"
 #include "ManagerBase.h"
@@ -32,6 +34,7 @@
 #include <string.h>
 #include <unistd.h>
 #include <algorithm>
+#include <set>
 using std::min;
 using std::make_pair;
 using std::pair;
@@ -134,6 +137,35 @@ void logProjection(const char *name) {
 }
 #endif
 
+//-- Each thread remembers the managers it has a workspace in, and releases them when it
+//-- exits. Managers which have been deleted meanwhile are skipped; a manager leaves the
+//-- live set, under the same lock, before it deletes its workspaces.
+static std::mutex liveManagersLock;
+static std::set<ManagerBase*> liveManagers;
+
+struct WorkspaceOwner {
+        std::vector<ManagerBase*> managers;
+        ~WorkspaceOwner() {
+            std::lock_guard<std::mutex> guard(liveManagersLock);
+            for (ManagerBase *mgr : managers) {
+                if (liveManagers.count(mgr))
+                    mgr->releaseWorkspace();
+            }
+        }
+};
+
+static thread_local WorkspaceOwner workspaceOwner;
+
+static void rememberManager(ManagerBase *mgr) {
+    std::lock_guard<std::mutex> guard(liveManagersLock);
+    liveManagers.insert(mgr);
+}
+
+static void forgetManager(ManagerBase *mgr) {
+    std::lock_guard<std::mutex> guard(liveManagersLock);
+    liveManagers.erase(mgr);
+}
+
 ManagerBase::ManagerBase(VariableList *vars, Table *input) :
         varList(vars), inputData(input), keysize(vars ? vars->getKeySize() : 0) {
     signal(SIGSEGV, segfault_handler);
@@ -142,28 +174,33 @@ ManagerBase::ManagerBase(VariableList *vars, Table *input) :
 //    feenableexcept(FE_DIVBYZERO | FE_INVALID | FE_OVERFLOW);
 //    signal(SIGFPE, fpe_handler);
 
+    rememberManager(this);
     topRef = bottomRef = refModel = NULL;
     relCache = new RelCache;
     modelCache = new ModelCache;
+    modelArena = new Arena();
     sampleSize = 0;
     testSampleSize = 0;
     options = new Options();
     inputH = -1;
-    stateSpaceSize = 0;
     dataLines = 0;
-    fitTable1 = NULL;
-    fitTable2 = NULL;
-    projTable = NULL;
     inputData = testData = NULL;
     DVOrder = NULL;
     searchDirection = Direction::Ascending;
     useInverseNotation = 0;
     valuesAreFunctions = false;
-    intersectArray = NULL;
-    intersectCount = 0;
-    intersectMax = 1;
     functionConstant = 0;
     negativeConstant = 0;
+    tableBytes = 0;
+    tableBudget = 0;
+    tableClock = 0;
+    tableHits = 0;
+    tableMisses = 0;
+    tableEvictions = 0;
+    tableUsers = 0;
+    ipfWarmStart = false;
+    denseLimit = DEFAULT_DENSE_LIMIT;
+    denseFill = DEFAULT_DENSE_FILL;
     signal(SIGSEGV, segfault_handler);
 }
 
@@ -175,16 +212,59 @@ void ManagerBase::setAlphaThreshold(double thresh)
 
 
 ManagerBase::~ManagerBase() {
+    forgetManager(this);
     if (testData) delete testData;
-    if (fitTable1) delete fitTable1;
-    if (fitTable2) delete fitTable2;
-    if (projTable) delete projTable;
-    if (intersectArray) delete[] intersectArray;
+    for (auto it = workspaces.begin(); it != workspaces.end(); ++it)
+        delete it->second;
     if (DVOrder) delete[] DVOrder;
     delete options;
     delete modelCache;
     delete relCache;
     if (varList) delete varList;
+    delete modelArena;
+}
+
+ManagerWorkspace::ManagerWorkspace() {
+    fitTable1 = NULL;
+    fitTable2 = NULL;
+    projTable = NULL;
+    dense = NULL;
+    bpProcessor = NULL;
+}
+
+ManagerWorkspace::~ManagerWorkspace() {
+    if (fitTable1) delete fitTable1;
+    if (fitTable2) delete fitTable2;
+    if (projTable) delete projTable;
+    if (dense) delete dense;
+    if (bpProcessor) delete bpProcessor;
+}
+
+ManagerWorkspace *ManagerBase::workspace() {
+    std::lock_guard<std::mutex> guard(workspaceLock);
+    ManagerWorkspace *&ws = workspaces[std::this_thread::get_id()];
+    if (ws == NULL) {
+        ws = new ManagerWorkspace();
+        workspaceOwner.managers.push_back(this);
+    }
+    return ws;
+}
+
+void ManagerBase::releaseWorkspace() {
+    ManagerWorkspace *ws = NULL;
+    {
+        std::lock_guard<std::mutex> guard(workspaceLock);
+        auto it = workspaces.find(std::this_thread::get_id());
+        if (it == workspaces.end())
+            return;
+        ws = it->second;
+        workspaces.erase(it);
+    }
+    delete ws;
+}
+
+Table *ManagerBase::getFitTable() {
+    return workspace()->fitTable1;
 }
 
 // Anjali..
@@ -256,6 +336,7 @@ Relation *ManagerBase::getRelation(int *input_vars, int varcount, bool make_proj
     Relation::sort(varindices, varcount, stateindices);
     int keysize = getKeySize();
     Relation *rel;
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
     if (stateindices != NULL) {
         int *stateindices1 = new int[varcount];
         KeySegment* mask = new KeySegment[keysize];
@@ -271,10 +352,11 @@ Relation *ManagerBase::getRelation(int *input_vars, int varcount, bool make_proj
             rel->addVariable(varindices[i], stateindices[i]);
         }
         if (!relCache->addRelation(rel)) {
-            Relation *cached_rel = relCache->findRelation(rel->getPrintName());
+            Relation *cached_rel = relCache->findRelation(rel);
             delete rel;
             rel = cached_rel;
         } else {
+            rel->getMask();
             //make starting constraint
             for (int i = 0; i < varcount; i++) {
                 if (stateindices[i] == DONT_CARE) {
@@ -298,9 +380,12 @@ Relation *ManagerBase::getRelation(int *input_vars, int varcount, bool make_proj
             rel->addVariable(varindices[i]);
         }
         if (!relCache->addRelation(rel)) {
-            Relation *cached_rel = relCache->findRelation(rel->getPrintName());
+            Relation *cached_rel = relCache->findRelation(rel);
             delete rel;
             rel = cached_rel;
+        } else {
+            //-- build the mask now, while the relation is only visible to this thread
+            rel->getMask();
         }
     }
     if (make_project) {
@@ -330,8 +415,17 @@ Relation *ManagerBase::getChildRelation(Relation *rel, int skip, bool makeProjec
 // This function is a special case of the other makeProjection(), further below.
 // It projects the input data into the table for a relation.
 bool ManagerBase::makeProjection(Relation *rel) {
-    if (rel->getTable())
+    rel->setLastUse(++tableClock);
+    if (rel->getTable()) {
+        tableHits++;
         return true; // table already computed
+    }
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    if (rel->getTable()) {
+        tableHits++;
+        return true; // another thread computed it meanwhile
+    }
+    tableMisses++;
 
     //-- create the projection data for a given relation. Go through
     //-- the inputData, and for each tuple, sum it into the table for the relation.
@@ -341,8 +435,14 @@ bool ManagerBase::makeProjection(Relation *rel) {
     }
     //logProjection(rel->getPrintName());
     Table *table = new Table(keysize, start_size);
-    rel->setTable(table);
+    table->setIndexed(true);
     makeProjection(inputData, table, rel);
+    //-- publish the table only once it is filled, since other threads check it unlocked;
+    //-- setTable's release store pairs with the acquire load in getTable
+    rel->setTable(table);
+    ResidentTable resident = { rel, NULL, table->size() };
+    tableResident.push_back(resident);
+    tableBytes += resident.bytes;
     return true;
 }
 
@@ -350,19 +450,27 @@ bool ManagerBase::makeProjection(Relation *rel) {
 bool ManagerBase::makeProjection(Table *t1, Table *t2, Relation *rel) {
     //-- create the projection data for a given relation. Go through
     //-- the inputData, and for each tuple, sum it into the table for the relation.
+    //-- The sums are accumulated through a hash index, unsorted, and sorted once at the end.
     long long count = t1->getTupleCount();
     t2->reset(keysize); // reset the output table
     KeySegment *key = new KeySegment[keysize];
     KeySegment *mask = rel->getMask();
-    long i, j, k;
+    long long i;
+    int k;
     double value;
 
-    bool is_match = false;  // for state-based
     double remainder = 0;   // for state-based
-    long c_count;            // for state-based
-    KeySegment *const_k;  // for state-based
+    long c_count = 0;       // for state-based
+    Table *constraints = NULL;  // for state-based
     if (rel->isStateBased()) { // for state-based
-        c_count = rel->getStateConstraints()->getConstraintCount();
+        //-- the constraint keys, in a table of their own, so they can be looked up
+        StateConstraint *stateConstraints = rel->getStateConstraints();
+        c_count = stateConstraints->getConstraintCount();
+        constraints = new Table(keysize, c_count > 0 ? c_count : 1);
+        constraints->setIndexed(true);
+        for (long j = 0; j < c_count; j++)
+            constraints->addTuple(stateConstraints->getConstraint(j), 1.0);
+        constraints->sort();
         makeSbExpansion(rel, t2);
     }
     for (i = 0; i < count; i++) {
@@ -373,20 +481,12 @@ bool ManagerBase::makeProjection(Table *t1, Table *t2, Relation *rel) {
             key[k] |= mask[k];
         }
         if (!rel->isStateBased()) {
-            t2->sumTuple(key, value);
+            t2->accumulateTuple(key, value);
         } else {
             // state based, so if the key matches one of the constraints we keep it,
             // otherwise add it to the remainder to be split up later
-            for (j = 0; j < c_count; j++) {
-                is_match = false;
-                const_k = rel->getStateConstraints()->getConstraint(j);
-                if (Key::compareKeys(key, const_k, keysize) == 0) {
-                    is_match = true;
-                    break;
-                }
-            }
-            if (is_match) {
-                t2->sumTuple(key, value);
+            if (constraints->indexOf(key) >= 0) {
+                t2->accumulateTuple(key, value);
             } else {
                 remainder += value;
             }
@@ -397,18 +497,11 @@ bool ManagerBase::makeProjection(Table *t1, Table *t2, Relation *rel) {
         count = t2->getTupleCount();
         double spread = remainder / (count - c_count);
         for (i = 0; i < count; i++) {
-            is_match = false;
-            for (j = 0; j < c_count; j++) {
-                const_k = rel->getStateConstraints()->getConstraint(j);
-                if (Key::compareKeys(t2->getKey(i), const_k, keysize) == 0) {
-                    is_match = true;
-                    break;
-                }
-            }
-            if (is_match == false) {
+            if (constraints->indexOf(t2->getKey(i)) < 0) {
                 t2->setValue(i, spread);
             }
         }
+        delete constraints;
     }
     t2->sort();
     delete[] key;
@@ -561,16 +654,19 @@ int sortDV(const void *d1, const void *d2) {
 void ManagerBase::createDvOrder() {
     if (!varList->isDirected())
         return;
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
     if (DVOrder != NULL)
         return;
     sort_dv_var = varList->getVariable(varList->getDV());
     int dv_card = sort_dv_var->cardinality;
-    DVOrder = new int[dv_card];
+    //-- build the order before publishing it, since other threads check DVOrder unlocked
+    int *order = new int[dv_card];
     // Build an array of frequencies, taken from the dependent relation (from the bottom reference)
     long long k;
     Table *depTable;
     for (k = 0; k < bottomRef->getRelationCount(); ++k) {
         if (!bottomRef->getRelation(k)->isIndependentOnly()) {
+            makeProjection(bottomRef->getRelation(k));
             depTable = bottomRef->getRelation(k)->getTable();
             break;
         }
@@ -580,8 +676,9 @@ void ManagerBase::createDvOrder() {
         sort_freq[Key::getKeyValue(depTable->getKey(k), keysize, varList, varList->getDV())] = depTable->getValue(k);
     }
     for (int i = 0; i < dv_card; ++i)
-        DVOrder[i] = i;
-    qsort(DVOrder, dv_card, sizeof(int), sortDV);
+        order[i] = i;
+    qsort(order, dv_card, sizeof(int), sortDV);
+    DVOrder = order;
 }
 
 // Creates a product of the cardinalities of any variables missing from the model
@@ -663,6 +760,23 @@ Relation *ManagerBase::getIndRelation() {
     return NULL;
 }
 
+//-- the model's relation with all the IVs, if it has one and there is a single DV
+Relation *ManagerBase::findIndependentRelation(Model *model) {
+    int dvCount = 0;
+    for (int i = 0; i < varList->getVarCount(); i++) {
+        if (varList->getVariable(i)->dv)
+            dvCount++;
+    }
+    if (dvCount != 1)
+        return NULL;
+    for (int r = 0; r < model->getRelationCount(); r++) {
+        Relation *rel = model->getRelation(r);
+        if (rel->isIndependentOnly() && rel->getVariableCount() == varList->getVarCount() - 1)
+            return rel;
+    }
+    return NULL;
+}
+
 Relation *ManagerBase::getDepRelation() {
     // This function takes advantage of the fact that the bottom model has only two relations;
     // one is the IV relation, the other is the DV.
@@ -687,37 +801,140 @@ bool ManagerBase::makeProjections(Model *model) {
 }
 
 void ManagerBase::deleteTablesFromCache() {
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
     relCache->deleteTables();
+    //-- retained model fits are still held
+    for (ResidentTable &resident : tableResident)
+        tableBytes -= resident.bytes;
+    tableResident.clear();
+}
+
+void ManagerBase::setTableBudget(long long bytes) {
+    tableBudget = bytes > 0 ? bytes : 0;
+}
+
+void ManagerBase::getTableCacheStats(TableCacheStats &stats) {
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    stats.hits = tableHits;
+    stats.misses = tableMisses;
+    stats.evictions = tableEvictions;
+    stats.tables = tableResident.size() + retainedFits.size();
+    stats.bytes = tableBytes;
+    stats.budget = tableBudget;
+}
+
+//-- scopes which use projection tables nest, so only the outermost one on a thread counts
+static thread_local int tableUseDepth = 0;
+
+void ManagerBase::beginTableUse() {
+    if (tableUseDepth++ > 0)
+        return;
+    std::lock_guard<std::mutex> guard(tableUseLock);
+    tableUsers++;
+}
+
+void ManagerBase::endTableUse() {
+    if (--tableUseDepth > 0)
+        return;
+    std::lock_guard<std::mutex> guard(tableUseLock);
+    if (--tableUsers == 0 && tableBudget > 0)
+        trimTables();
+}
+
+//-- delete the least recently used projections until the rest fit in the budget.
+//-- Called with tableUseLock held and no users, so no thread is reading a table.
+void ManagerBase::trimTables() {
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    if (tableBytes <= tableBudget)
+        return;
+    std::vector<ResidentTable> resident(tableResident);
+    for (auto &entry : retainedFits) {
+        ResidentTable fit = { NULL, entry.first, entry.second };
+        resident.push_back(fit);
+    }
+    std::sort(resident.begin(), resident.end(), [](const ResidentTable &a, const ResidentTable &b) {
+        unsigned long long useA = a.rel ? a.rel->getLastUse() : a.model->getLastUse();
+        unsigned long long useB = b.rel ? b.rel->getLastUse() : b.model->getLastUse();
+        return useA < useB;
+    });
+    size_t evicted = 0;
+    while (evicted < resident.size() && tableBytes > tableBudget) {
+        ResidentTable &entry = resident[evicted++];
+        if (entry.rel) {
+            entry.rel->deleteTable();
+        } else {
+            entry.model->deleteFitTable();
+            retainedFits.erase(entry.model);
+        }
+        tableBytes -= entry.bytes;
+        tableEvictions++;
+    }
+    tableResident.clear();
+    for (size_t i = evicted; i < resident.size(); i++) {
+        if (resident[i].rel)
+            tableResident.push_back(resident[i]);
+    }
+}
+
+//-- the retained fits are looked up even if the model has no fit table, so that no
+//-- entry can be left behind for a model that is about to be deleted
+void ManagerBase::deleteFitTable(Model *model) {
+    if (model == NULL)
+        return;
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    auto found = retainedFits.find(model);
+    if (found != retainedFits.end()) {
+        tableBytes -= found->second;
+        retainedFits.erase(found);
+    }
+    model->deleteFitTable();
 }
 
 bool ManagerBase::deleteModelFromCache(Model *model) {
+    deleteFitTable(model);
     return modelCache->deleteModel(model);
 }
 
-//-- intersect two variable lists, producing a third. returns true if intersection
-//-- is not empty, and returns the list and count of common variables
-static bool intersect(Relation *rel1, Relation *rel2, int* &var, int &count) {
-    int *var1, *var2;
-    int count1, count2;
-    count1 = rel1->getVariableCount();
-    var1 = rel1->getVariables();
-    count2 = rel2->getVariableCount();
-    var2 = rel2->getVariables();
-
-    var = NULL;
-    count = 0;
-    for (int i = 0; i < count1; i++) {
-        for (int j = 0; j < count2; j++) {
-            if (var1[i] == var2[j]) {
-                if (var == NULL)
-                    var = new int[count1]; //this is sure to be large enough
-                var[count++] = var1[i];
-            }
+void ManagerBase::newSearchLevel() {
+    modelArena->newLevel();
+}
+
+void ManagerBase::promoteModel(Model *model) {
+    if (model != NULL)
+        model->promote();
+}
+
+void ManagerBase::getMemoryStats(MemoryStats &stats) {
+    long long relationAttributes, modelAttributes;
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    stats.input = (inputData ? inputData->size() : 0) + (testData ? testData->size() : 0);
+    relCache->getSizes(stats.projections, relationAttributes);
+    //-- the models made by this manager are counted whether cached or not, since models
+    //-- deleted from the cache may still be held by a report or by Python
+    Model::getLiveSizes(modelArena, stats.models, stats.fitTables, modelAttributes);
+    stats.models += modelCache->getTableSize();
+    stats.attributes = relationAttributes + modelAttributes;
+    stats.workspaces = 0;
+    {
+        std::lock_guard<std::mutex> workspaceGuard(workspaceLock);
+        for (auto &entry : workspaces) {
+            ManagerWorkspace *ws = entry.second;
+            if (ws->fitTable1) stats.workspaces += ws->fitTable1->size();
+            if (ws->fitTable2) stats.workspaces += ws->fitTable2->size();
+            if (ws->projTable) stats.workspaces += ws->projTable->size();
+            if (ws->dense) stats.workspaces += ws->dense->size();
         }
     }
-    return var != NULL;
+    stats.arenaUnused = modelArena->getBlockBytes() - modelArena->getLiveBytes();
+    stats.total = stats.input + stats.projections + stats.fitTables + stats.workspaces + stats.models
+            + stats.attributes + stats.arenaUnused;
 }
 
+long long ManagerBase::getMemUsage() {
+    MemoryStats stats;
+    getMemoryStats(stats);
+    return stats.total;
+}
 
 /**
  * compute the orthogonal expansion of a projection. This means taking every tuple in the projection, and
@@ -752,6 +969,7 @@ void ManagerBase::makeOrthoExpansion(Relation *rel, Table *outTable) {
     int varCount = rel->getVariableList()->getVarCount();
     int missingVars[varCount];
     int missingCount = rel->copyMissingVariables(missingVars, varCount);
+    makeProjection(rel);
     Table *relTable = rel->getTable();
 
     long long tupleCount = relTable->getTupleCount();
@@ -813,6 +1031,9 @@ double ManagerBase::computeDfSb(Model *model) {
     if (df < 0.0) { //-- not set yet
         df = ::ocDegreesOfFreedomStateBased(model);
         model->setAttribute(ATTRIBUTE_DF, df);
+    } else {
+        //-- a basis may be left from building the model (see Model::addRelation)
+        model->deleteStructRank();
     }
     return df;
 }
@@ -834,12 +1055,8 @@ double ManagerBase::computeH(Relation *rel) // uncertainty
         {
     double h = rel->getAttribute(ATTRIBUTE_H);
     if (h < 0) { //-- not set yet
-        Table *table = rel->getTable();
-        if (table == NULL) {
-            makeProjection(rel);
-            table = rel->getTable();
-        }
-        h = ocEntropy(table);
+        makeProjection(rel);
+        h = ocEntropy(rel->getTable());
         rel->setAttribute(ATTRIBUTE_H, h);
     }
     return h;
@@ -862,7 +1079,7 @@ double ManagerBase::computeH(Model *model, HMethod method, int SB) {
         h = model->getAttribute(ATTRIBUTE_FIT_H);
         if (h < 0) {
             makeFitTable(model);
-            h = ocEntropy(fitTable1);
+            h = ocEntropy(workspace()->fitTable1);
             model->setAttribute(ATTRIBUTE_FIT_H, h);
             model->setAttribute(ATTRIBUTE_H, h);
         }
@@ -919,106 +1136,190 @@ struct DFAndHProc: public ocIntersectProcessor {
 void ManagerBase::calculateDfAndEntropy(Model *model) {
     if ((model->getAttribute(ATTRIBUTE_DF) < 0) || (model->getAttribute(ATTRIBUTE_ALG_H) < 0)) {
         DFAndHProc processor(this);
-        if (intersectArray != NULL) {
-            delete[] intersectArray;
-            intersectCount = 0;
-            intersectMax = model->getRelationCount();
-            intersectArray = NULL;
-        }
-        doIntersectionProcessing(model, &processor);
+        if (model->isStateBased() || hasLoops(model) || !processJunctionTree(model, &processor))
+            doIntersectionProcessing(model, &processor);
         model->setAttribute(ATTRIBUTE_DF, processor.df);
         model->setAttribute(ATTRIBUTE_ALG_H, processor.h);
     }
 }
 
-void ManagerBase::doIntersectionProcessing(Model *model, ocIntersectProcessor *proc) {
-    //-- allocate intersect storage; this grows later if needed
-    if (intersectArray == NULL) {
-        intersectMax = model->getRelationCount();
-        intersectArray = new VarIntersect[intersectMax];
+//-- The junction tree is found by removing leaves: a relation is a leaf if all it shares
+//-- with the other remaining relations lies within one of them, and that shared part is
+//-- its separator. The variable sets are kept as bitsets, one row of words per relation.
+bool ManagerBase::processJunctionTree(Model *model, ocIntersectProcessor *proc) {
+    int relCount = model->getRelationCount();
+    int words = (varList->getVarCount() + 63) / 64;
+    std::vector<unsigned long long> sets(relCount * words, 0);
+    for (int r = 0; r < relCount; r++) {
+        Relation *rel = model->getRelation(r);
+        for (int i = 0; i < rel->getVariableCount(); i++) {
+            int v = rel->getVariable(i);
+            sets[r * words + v / 64] |= 1ULL << (v % 64);
+        }
     }
-    int count = model->getRelationCount();
-    VariableList *varList = model->getRelation(0)->getVariableList();
+    std::vector<bool> removed(relCount, false);
+    std::vector<unsigned long long> shared(words);
+    std::vector<Relation*> separators;
+    ManagerWorkspace *ws = workspace();
+    for (int remaining = relCount; remaining > 1; remaining--) {
+        int leaf = -1;
+        for (int r = 0; r < relCount && leaf < 0; r++) {
+            if (removed[r])
+                continue;
+            unsigned long long *rset = &sets[r * words];
+            std::fill(shared.begin(), shared.end(), 0);
+            for (int o = 0; o < relCount; o++) {
+                if (o == r || removed[o])
+                    continue;
+                for (int w = 0; w < words; w++)
+                    shared[w] |= rset[w] & sets[o * words + w];
+            }
+            for (int o = 0; o < relCount && leaf < 0; o++) {
+                if (o == r || removed[o])
+                    continue;
+                bool within = true;
+                for (int w = 0; w < words && within; w++)
+                    within = (shared[w] & ~sets[o * words + w]) == 0;
+                if (within)
+                    leaf = r;
+            }
+        }
+        if (leaf < 0)
+            return false;
+        removed[leaf] = true;
+        //-- an empty separator joins disconnected parts, and adds nothing
+        bool empty = true;
+        for (int w = 0; w < words && empty; w++)
+            empty = shared[w] == 0;
+        if (!empty)
+            separators.push_back(getIntersectRelation(ws, shared.data(), words));
+    }
+    for (int r = 0; r < relCount; r++)
+        proc->process(true, model->getRelation(r), 1);
+    for (Relation *sep : separators)
+        proc->process(false, sep, 1);
+    return true;
+}
+
+Relation *ManagerBase::getIntersectRelation(ManagerWorkspace *ws, const unsigned long long *bits, int words) {
+    std::string key((const char *) bits, words * sizeof(unsigned long long));
+    auto found = ws->intersectRelations.find(key);
     Relation *rel;
-    int i, j, k;
-    //-- go through the relations in the model and create VarIntersect entries
-    for (i = 0; i < count; i++) {
-        rel = model->getRelation(i);
-        while (intersectCount >= intersectMax) {
-            intersectArray = (VarIntersect*) growStorage(intersectArray, sizeof(VarIntersect)*intersectMax, 2);
-            intersectMax *= 2;
+    if (found != ws->intersectRelations.end()) {
+        rel = found->second;
+        makeProjection(rel);
+    } else {
+        int vars[varList->getVarCount()];
+        int count = 0;
+        for (int v = 0; v < varList->getVarCount(); v++) {
+            if (bits[v / 64] & (1ULL << (v % 64)))
+                vars[count++] = v;
         }
-        VarIntersect *intersect = intersectArray + (intersectCount++);
-        intersect->rel = rel;
-        intersect->startIndex = i;
-        intersect->sign = true;
-        intersect->count = 1;
-        proc->process(intersect->sign, intersect->rel, intersect->count);
-    }
-    int level0end = intersectCount;
-    bool sign = true;
-    bool match;
+        rel = getRelation(vars, count, true);
+        ws->intersectRelations[key] = rel;
+    }
+    return rel;
+}
+
+//-- Each level's terms are the intersections of the previous level's terms with the
+//-- relations after them. Variable sets are kept as bitsets, so an intersection is a few
+//-- word ANDs, and its relation is found in the workspace's memo; a term met again at
+//-- the next level is found by hash. Since the terms depend only on the relations, those
+//-- of the last model processed are kept, and replayed for a model with the same ones.
+void ManagerBase::doIntersectionProcessing(Model *model, ocIntersectProcessor *proc) {
+    ManagerWorkspace *ws = workspace();
+    int count = model->getRelationCount();
+    bool same = (int) ws->termRelations.size() == count;
+    for (int i = 0; i < count && same; i++)
+        same = ws->termRelations[i] == model->getRelation(i);
+    if (same) {
+        for (size_t t = 0; t < ws->terms.size(); t++) {
+            VarIntersect &term = ws->terms[t];
+            if (t >= (size_t) count)
+                makeProjection(term.rel);
+            proc->process(term.sign, term.rel, term.count);
+        }
+        return;
+    }
+    ws->termRelations.clear();
+    ws->terms.clear();
+
+    int words = (varList->getVarCount() + 63) / 64;
+    std::vector<VarIntersect> &level = ws->intersectLevel;
+    std::vector<VarIntersect> &next = ws->nextLevel;
+    std::vector<unsigned long long> &levelBits = ws->levelBits;
+    std::vector<unsigned long long> &nextBits = ws->nextBits;
+    std::vector<unsigned long long> &baseBits = ws->baseBits;
+    std::vector<unsigned long long> &bits = ws->intersectBits;
+    level.clear();
+    baseBits.assign(count * words, 0);
+    bits.resize(words);
+
+    //-- the relations in the model are the first level
+    for (int i = 0; i < count; i++) {
+        Relation *rel = model->getRelation(i);
+        for (int k = 0; k < rel->getVariableCount(); k++) {
+            int v = rel->getVariable(k);
+            baseBits[i * words + v / 64] |= 1ULL << (v % 64);
+        }
+        VarIntersect term;
+        term.rel = rel;
+        term.startIndex = i;
+        term.sign = true;
+        term.count = 1;
+        level.push_back(term);
+        ws->terms.push_back(term);
+        ws->termRelations.push_back(rel);
+        proc->process(term.sign, term.rel, term.count);
+    }
+    levelBits = baseBits;
 
     //-- given the previous level of intersection terms, construct the next level from
     //-- all intersections among the previous level. When an intersection is found, we
     //-- need to check the new intersections. If there is a match, we update its
     //-- include count; if there is no match, we create a new one. This process
     //-- terminates when no new terms have been added.
-    VarIntersect *ip, *jp, *newp;
-    VarIntersect *currentArray, *nextArray;
-    int currentCount, nextCount;
-    int nextMax;
-    int *newvars, newcount;
-    currentArray = intersectArray;
-    currentCount = intersectCount;
-    while (currentCount > 0) {
+    bool sign = true;
+    while (!level.empty()) {
         sign = !sign;
-        nextArray = new VarIntersect[intersectMax];
-        nextCount = 0;
-        nextMax = intersectMax;
-        for (i = 0; i < currentCount; i++) {
-            for (j = currentArray[i].startIndex + 1; j < level0end; j++) {
-                ip = currentArray + i;
-                jp = intersectArray + j;
-                if (intersect(ip->rel, jp->rel, newvars, newcount)) {
-                    rel = getRelation(newvars, newcount, true);
-                    proc->process(sign, rel, ip->count);
-                    // only add the relation to the intersect array if it has any potential for overlap.
-                    // (when j==(level0end-1), that relation can be part of no further overlaps)
-                    if (j < (level0end - 1)) {
-                        match = false;
-                        for (k = 0; k < nextCount; k++) {
-                            if ((nextArray[k].rel == rel) && (nextArray[k].startIndex == j)) {
-                                match = true;
-                                nextArray[k].count += ip->count;
-                                break;
-                            }
-                        }
-                        if (!match) {
-                            while (nextCount >= nextMax) {
-                                nextArray = (VarIntersect*) growStorage(nextArray, sizeof(VarIntersect)*nextMax, 2);
-                                nextMax *= 2;
-                            }
-                            newp = nextArray + (nextCount++);
-                            newp->rel = rel;
-                            newp->startIndex = j;
-                            newp->sign = sign;
-                            newp->count = ip->count;
-                        }
+        next.clear();
+        nextBits.clear();
+        ws->nextIndex.clear();
+        for (size_t i = 0; i < level.size(); i++) {
+            for (int j = level[i].startIndex + 1; j < count; j++) {
+                bool empty = true;
+                for (int w = 0; w < words; w++) {
+                    bits[w] = levelBits[i * words + w] & baseBits[j * words + w];
+                    if (bits[w])
+                        empty = false;
+                }
+                if (empty)
+                    continue;
+                Relation *rel = getIntersectRelation(ws, bits.data(), words);
+                int termCount = level[i].count;
+                proc->process(sign, rel, termCount);
+                VarIntersect term;
+                term.rel = rel;
+                term.startIndex = j;
+                term.sign = sign;
+                term.count = termCount;
+                ws->terms.push_back(term);
+                // only add the relation to the next level if it has any potential for overlap.
+                // (when j==(count-1), that relation can be part of no further overlaps)
+                if (j < count - 1) {
+                    auto found = ws->nextIndex.find(std::make_pair(rel, j));
+                    if (found != ws->nextIndex.end()) {
+                        next[found->second].count += termCount;
+                    } else {
+                        ws->nextIndex[std::make_pair(rel, j)] = next.size();
+                        next.push_back(term);
+                        nextBits.insert(nextBits.end(), bits.begin(), bits.end());
                     }
-                    delete[] newvars;
                 }
             }
         }
-        if (currentArray != intersectArray) {
-            delete[] currentArray;
-        }
-        currentArray = nextArray;
-        nextArray = NULL;
-        currentCount = nextCount;
-    }
-    if (currentArray != intersectArray) {
-        delete[] currentArray;
+        level.swap(next);
+        levelBits.swap(nextBits);
     }
 }
 
@@ -1214,7 +1515,7 @@ Model *ManagerBase::makeModel(const char *name, bool makeProject) {
             cp++;
     }
     cp = name;
-    Model *model = new Model(relCount);
+    Model *model = new Model(relCount, modelArena);
     char *relname = new char[(1 + varList->getMaxAbbrevLen()) * varList->getVarCount()];
     int varcount, notCount;
     int *vars = new int[varList->getVarCount()];
@@ -1307,7 +1608,7 @@ Model *ManagerBase::makeModel(const char *name, bool makeProject) {
     //-- put it in the cache; return the cached one if present
     if (!modelCache->addModel(model)) {
         //-- already exists in cache; return that one
-        Model *cachedModel = modelCache->findModel(model->getPrintName());
+        Model *cachedModel = modelCache->findModel(model);
         delete model;
         model = cachedModel;
     }
@@ -1326,7 +1627,7 @@ Model *ManagerBase::makeSbModel(const char *name, bool makeProject) {
             cp++;
     }
     cp = name;
-    Model *model = new Model(relCount);
+    Model *model = new Model(relCount, modelArena);
     // This estimate for maximum relation name length is questionable [jsf]
     char *relName = new char[(1 + varList->getMaxAbbrevLen()) * varList->getVarCount() * 2 * MAXSTATENAME];
     int varCount;
@@ -1375,7 +1676,7 @@ Model *ManagerBase::makeSbModel(const char *name, bool makeProject) {
     //-- put it in the cache; return the cached one if present
     if (!modelCache->addModel(model)) {
         //-- already exists in cache; return that one
-        Model *cachedModel = modelCache->findModel(model->getPrintName());
+        Model *cachedModel = modelCache->findModel(model);
         delete model;
         model = cachedModel;
     }
@@ -1402,6 +1703,13 @@ void ManagerBase::printSizes() {
     printf("Rel-cache: %ld; ", size);
     size = modelCache->size();
     printf("Model cache: %ld; ", size);
+    CacheStats stats;
+    relCache->getStats(stats);
+    printf("\nRel-cache: %ld of %ld slots (load %.2f), %.2f probes per lookup, max probe %ld",
+            stats.count, stats.capacity, stats.loadFactor, stats.averageProbes, stats.maxProbe);
+    modelCache->getStats(stats);
+    printf("\nModel cache: %ld of %ld slots (load %.2f), %.2f probes per lookup, max probe %ld\n",
+            stats.count, stats.capacity, stats.loadFactor, stats.averageProbes, stats.maxProbe);
     //	relCache->dump();
     modelCache->dump();
 }
@@ -1410,39 +1718,13 @@ void ManagerBase::dumpRelations() {
     relCache->dump();
 }
 
-void ManagerBase::fitTestAlgebraic(Model* model, Table* algTable, double missingCard, const FitIntersectMap& fitIs) {
-    long long inSize = testData->getTupleCount();
-
-    // for every tuple in test:
-    for (long long ti = 0; ti < inSize; ti++) {
-        KeySegment* tupleKey = testData->getKey(ti);
-        
-        // if this tuple wasn't in inputData:
-        if (inputData->indexOf(tupleKey) == -1) {
-            double outValue = 1;
-            
-            // for each item in intersectArray
-            for (auto it=fitIs.begin(); it != fitIs.end(); ++it) {
-                // get value from relation for masked key
-                double value = it->first->getMatchingTupleValue(tupleKey);
-
-                // if value is ever zero:
-                // set outValue to zero and end for-loop
-                if (fabs(value) < DBL_EPSILON) {
-                    outValue = 0;
-                    break;
-                }
-
-                double vp = pow(value, it->second);
-                // mult/div value into outValue
-                outValue *= vp;
-            }
-            // put outvalue into fitted table
-            algTable->sumTuple(tupleKey, outValue / missingCard);
-        }
-    }
-}
-
+//-- The algebraic fit of a tuple is the product, over the terms of the intersect map, of
+//-- the term's marginal value raised to the term's count. The terms are applied one at a
+//-- time to all the tuples being fit, so the power of each marginal value is taken once,
+//-- rather than for each tuple. For a neutral system, the tuples fit are the training data,
+//-- then the test tuples which aren't in it. For a directed one, they are each IV state in
+//-- the data with each DV value, so the conditional DV distributions are complete; these
+//-- are the tuples IPF would fit, and the fit is the same.
 bool ManagerBase::makeFitTableAlgebraic(Model* model) {
     FitIntersectMap fitIs = computeIntersectLevels(model);
 
@@ -1451,62 +1733,124 @@ bool ManagerBase::makeFitTableAlgebraic(Model* model) {
     }
 
     double missingCard = getMissingCardinalityFactor(model);
-    
+
     long long inSize = inputData->getTupleCount();
-    Table *algTable = new Table(keysize, inSize);
-
-    // for every tuple in training data:
-    for (long long ti = 0; ti < inSize; ti++) {
-        KeySegment* tupleKey = inputData->getKey(ti);
-       
-        double outValue = 1;    
-        // for each item in fitIntersectArray:
-        for (auto it=fitIs.begin(); it != fitIs.end(); ++it) {
-            
-            double v = it->first->getMatchingTupleValue(tupleKey);
-            
-            if (v <= DBL_EPSILON) {
-                outValue = 0;
-                break;
+    long long testSize = testData ? testData->getTupleCount() : 0;
+    long long *testIndex = new long long[testSize > 0 ? testSize : 1];
+    long long testCount = 0;
+    Table *directedKeys = NULL;
+    if (varList->isDirected()) {
+        Relation *indRel = findIndependentRelation(model);
+        makeProjection(indRel);
+        Table *indTable = indRel->getTable();
+        int dv = varList->getDV();
+        int dvCard = varList->getVariable(dv)->cardinality;
+        directedKeys = new Table(keysize, indTable->getTupleCount() * dvCard + 1);
+        KeySegment *key = new KeySegment[keysize];
+        for (long long i = 0; i < indTable->getTupleCount(); i++) {
+            indTable->copyKey(i, key);
+            for (int d = 0; d < dvCard; d++) {
+                Key::setKeyValue(key, keysize, varList, dv, d);
+                directedKeys->addTuple(key, 0);
             }
-            double vp = pow(v, it->second); 
-            outValue *= vp;
-        } 
-    
-        algTable->sumTuple(tupleKey, outValue / missingCard);
-    } 
+        }
+        delete[] key;
+        inSize = directedKeys->getTupleCount();
+    } else {
+        for (long long ti = 0; ti < testSize; ti++) {
+            if (inputData->indexOf(testData->getKey(ti)) == -1)
+                testIndex[testCount++] = ti;
+        }
+    }
+    Table *fitData = directedKeys ? directedKeys : inputData;
+    long long fitCount = inSize + testCount;
+    double *outValues = new double[fitCount > 0 ? fitCount : 1];
+    for (long long i = 0; i < fitCount; i++)
+        outValues[i] = 1;
 
-    if (testData) { fitTestAlgebraic(model, algTable, missingCard, fitIs); }
+    KeySegment *key = new KeySegment[keysize];
+    for (auto it=fitIs.begin(); it != fitIs.end(); ++it) {
+        Relation *rel = it->first;
+        Table *table = rel->getTable();
+        if (table == NULL) {
+            //-- no projection; as with getMatchingTupleValue, every tuple fits to zero
+            for (long long i = 0; i < fitCount; i++)
+                outValues[i] = 0;
+            break;
+        }
+        KeySegment *mask = rel->getMask();
+        long long cellCount = table->getTupleCount();
+        double *powers = new double[cellCount > 0 ? cellCount : 1];
+        for (long long j = 0; j < cellCount; j++) {
+            double v = table->getValue(j);
+            powers[j] = v > 0 ? pow(v, it->second) : 0;
+        }
+        for (long long i = 0; i < fitCount; i++) {
+            //-- once a tuple's product is zero, it stays zero
+            if (outValues[i] == 0)
+                continue;
+            KeySegment *tupleKey = i < inSize ? fitData->getKey(i) : testData->getKey(testIndex[i - inSize]);
+            for (int k = 0; k < keysize; k++)
+                key[k] = tupleKey[k] | mask[k];
+            long long j = table->indexOf(key);
+            //-- a cell missing from the marginal counts as 1, as in getMatchingTupleValue;
+            //-- but a directed state which isn't in the data is missing, and fits to zero
+            if (j < 0) {
+                if (directedKeys)
+                    outValues[i] = 0;
+                continue;
+            }
+            double v = table->getValue(j);
+            bool zero = i < inSize ? v <= DBL_EPSILON : fabs(v) < DBL_EPSILON;
+            outValues[i] = zero ? 0 : outValues[i] * powers[j];
+        }
+        delete[] powers;
+    }
+
+    //-- the keys fit are all distinct. Like IPF, a directed fit keeps only nonzero tuples.
+    Table *algTable = new Table(keysize, fitCount > 0 ? fitCount : 1);
+    for (long long i = 0; i < fitCount; i++) {
+        KeySegment *tupleKey = i < inSize ? fitData->getKey(i) : testData->getKey(testIndex[i - inSize]);
+        double value = outValues[i] / missingCard;
+        if (directedKeys == NULL || value > DBL_EPSILON)
+            algTable->addTuple(tupleKey, value);
+    }
+    delete[] key;
+    delete[] outValues;
+    delete[] testIndex;
+    if (directedKeys) delete directedKeys;
 
     algTable->sort();
-    if (fitTable1) delete fitTable1;
-    fitTable1 = algTable;
+    ManagerWorkspace *ws = workspace();
+    if (ws->fitTable1) delete ws->fitTable1;
+    ws->fitTable1 = algTable;
  
     return true;
 }
 
 bool ManagerBase::makeFitTableIPF(Model* model) {
     // For looped & SB models, proceed to solve with IPF.
-    stateSpaceSize = (unsigned long long) ocDegreesOfFreedom(varList) + 1;
-    if (!fitTable1) {
+    ManagerWorkspace *ws = workspace();
+    unsigned long long stateSpaceSize = (unsigned long long) ocDegreesOfFreedom(varList) + 1;
+    if (!ws->fitTable1) {
         //-- for large state spaces, start with less space and let it grow.
         if (stateSpaceSize > 1000000)
             stateSpaceSize = 1000000;
-        fitTable1 = new Table(keysize, stateSpaceSize);
+        ws->fitTable1 = new Table(keysize, stateSpaceSize);
     }
-    if (!fitTable2) {
+    if (!ws->fitTable2) {
         if (stateSpaceSize > 1000000)
             stateSpaceSize = 1000000;
-        fitTable2 = new Table(keysize, stateSpaceSize);
+        ws->fitTable2 = new Table(keysize, stateSpaceSize);
     }
-    if (!projTable) {
+    if (!ws->projTable) {
         if (stateSpaceSize > 1000000)
             stateSpaceSize = 1000000;
-        projTable = new Table(keysize, stateSpaceSize);
+        ws->projTable = new Table(keysize, stateSpaceSize);
     }
-    fitTable1->reset(keysize);
-    fitTable2->reset(keysize);
-    projTable->reset(keysize);
+    ws->fitTable1->reset(keysize);
+    ws->fitTable2->reset(keysize);
+    ws->projTable->reset(keysize);
     KeySegment *key = new KeySegment[keysize];
     int k;
     double error = 0;
@@ -1534,7 +1878,6 @@ bool ManagerBase::makeFitTableIPF(Model* model) {
             expsize = newexpsize;
         }
     }
-    makeOrthoExpansion(relList[startRel], fitTable1);
 
     // configurable fitting parameters:  convergence error. This is approximately in units of samples.
     // if initial data was probabilities, an artificial scale of 1000 is used.
@@ -1549,7 +1892,6 @@ bool ManagerBase::makeFitTableIPF(Model* model) {
     if (hasLoops(model) || (model->isStateBased() && (model->getRelationCount() > 1))) {
         getOptionFloat("ipf-maxit", NULL, &maxiter);
     }
-
     int iter, r;
     long long i, j;
     long long tupleCount;
@@ -1557,63 +1899,219 @@ bool ManagerBase::makeFitTableIPF(Model* model) {
     Relation *rel;
     Table *table;
     KeySegment *mask;
-    for (iter = 0; iter < maxiter; iter++) {
-        error = 0.0; // absolute difference between original projection and computed values
-        for (r = 0; r < relCount; r++) {
-            rel = relList[r];
-            table = tableList[r];
-            mask = maskList[r];
-            // create a projection of the computed data, based on the variables in the relation
-            projTable->reset(keysize);
-            makeProjection(fitTable1, projTable, rel);
-            // for each tuple in fitTable1, create a scaled tuple in fitTable2, scaled by the
-            // ratio of the projection from the input data, and the computed projection
-            // from the previous iteration.  In any cases where the input marginal is
-            // zero, or where the computed marginal is zero, skip this tuple (equivalent
-            // to setting it to zero, but conserves space).
-            tupleCount = fitTable1->getTupleCount();
-            fitTable2->reset(keysize);
-            for (i = 0; i < tupleCount; i++) {
-                newValue = 0.0;
-                fitTable1->copyKey(i, key);
-                value = fitTable1->getValue(i);
-                for (k = 0; k < keysize; k++)
-                    key[k] |= mask[k];
-                j = table->indexOf(key);
-                if (j >= 0) {
-                    relValue = table->getValue(j);
-                    if (relValue > DBL_EPSILON) {
-                        j = projTable->indexOf(key);
+    //-- a small state space, mostly filled by the expansion, is fit as a dense array instead
+    long long cells = model->isStateBased() ? -1 : DenseTable::cellCount(varList, denseLimit);
+    if (cells > 0 && expsize >= denseFill * cells) {
+        iter = makeFitTableDense(model, relList, tableList, relCount, startRel, maxiter, delta2, error);
+    } else {
+        //-- a single pass is only exact from the expansion, so warm starts are kept for models
+        //-- which iterate to convergence anyway
+        if (maxiter <= 1 || !copyProgenitorFit(model, ws->fitTable1))
+            makeOrthoExpansion(relList[startRel], ws->fitTable1);
+
+        //-- variable-based relations are projected by masking alone, so their marginals can
+        //-- be mapped once; state-based ones are projected anew each time
+        if (!model->isStateBased()) {
+            iter = makeFitTableMapped(tableList, maskList, relCount, maxiter, delta2, error);
+        } else {
+            for (iter = 0; iter < maxiter; iter++) {
+                error = 0.0; // absolute difference between original projection and computed values
+                for (r = 0; r < relCount; r++) {
+                    rel = relList[r];
+                    table = tableList[r];
+                    mask = maskList[r];
+                    // create a projection of the computed data, based on the variables in the relation
+                    ws->projTable->reset(keysize);
+                    makeProjection(ws->fitTable1, ws->projTable, rel);
+                    // for each tuple in fitTable1, create a scaled tuple in fitTable2, scaled by the
+                    // ratio of the projection from the input data, and the computed projection
+                    // from the previous iteration.  In any cases where the input marginal is
+                    // zero, or where the computed marginal is zero, skip this tuple (equivalent
+                    // to setting it to zero, but conserves space).
+                    tupleCount = ws->fitTable1->getTupleCount();
+                    ws->fitTable2->reset(keysize);
+                    for (i = 0; i < tupleCount; i++) {
+                        newValue = 0.0;
+                        ws->fitTable1->copyKey(i, key);
+                        value = ws->fitTable1->getValue(i);
+                        for (k = 0; k < keysize; k++)
+                            key[k] |= mask[k];
+                        j = table->indexOf(key);
                         if (j >= 0) {
-                            projValue = projTable->getValue(j);
-                            if (projValue > DBL_EPSILON) {
-                                newValue = value * relValue / projValue;
+                            relValue = table->getValue(j);
+                            if (relValue > DBL_EPSILON) {
+                                j = ws->projTable->indexOf(key);
+                                if (j >= 0) {
+                                    projValue = ws->projTable->getValue(j);
+                                    if (projValue > DBL_EPSILON) {
+                                        newValue = value * relValue / projValue;
+                                    }
+                                    error = fmax(error, fabs(relValue - projValue));
+                                } else {
+                                    error = fmax(error, relValue);
+                                }
                             }
-                            error = fmax(error, fabs(relValue - projValue));
-                        } else {
-                            error = fmax(error, relValue);
+                        }
+                        if (newValue > DBL_EPSILON) {
+                            ws->fitTable1->copyKey(i, key);
+                            ws->fitTable2->addTuple(key, newValue);
                         }
                     }
+                    Table *ftswap = ws->fitTable1;        // swap fitTable1 and fitTable2 for next pass
+                    ws->fitTable1 = ws->fitTable2;
+                    ws->fitTable2 = ftswap;
                 }
-                if (newValue > DBL_EPSILON) {
-                    fitTable1->copyKey(i, key);
-                    fitTable2->addTuple(key, newValue);
-                }
+                if (error < delta2)         // check convergence
+                    break;
             }
-            Table *ftswap = fitTable1;        // swap fitTable1 and fitTable2 for next pass
-            fitTable1 = fitTable2;
-            fitTable2 = ftswap;
         }
-        if (error < delta2)         // check convergence
-            break;
+        ws->fitTable1->sort();
     }
-    fitTable1->sort();
     model->setAttribute(ATTRIBUTE_IPF_ITERATIONS, (double) iter);
     model->setAttribute(ATTRIBUTE_IPF_ERROR, error);
+    if (ipfWarmStart)
+        retainFit(model, ws->fitTable1);
     delete[] key;
     return true;
 }
 
+//-- the IPF loop of makeFitTableIPF for variable-based models, over flat arrays. A tuple
+//-- scaled to zero is kept in its place (and skipped, as if dropped), so the fit's tuples
+//-- never move, and the marginal cell of each tuple in each relation's table is looked up
+//-- just once. Each projection is then a scatter-add of the values into the cells, and
+//-- each scaling a gather from them. Returns the number of iterations; the fit is left in
+//-- the workspace's fitTable1.
+int ManagerBase::makeFitTableMapped(Table **tableList, KeySegment **maskList, int relCount, double maxiter,
+        double delta2, double &error) {
+    ManagerWorkspace *ws = workspace();
+    long long tupleCount = ws->fitTable1->getTupleCount();
+    double *values = new double[tupleCount];
+    long long *cellList = new long long[relCount * tupleCount];
+    KeySegment *key = new KeySegment[keysize];
+    long long marginalCount = 1;
+    long long i;
+    for (i = 0; i < tupleCount; i++)
+        values[i] = ws->fitTable1->getValue(i);
+    for (int r = 0; r < relCount; r++) {
+        long long *cells = cellList + r * tupleCount;
+        for (i = 0; i < tupleCount; i++) {
+            ws->fitTable1->copyKey(i, key);
+            for (int k = 0; k < keysize; k++)
+                key[k] |= maskList[r][k];
+            cells[i] = tableList[r]->indexOf(key);
+        }
+        if (tableList[r]->getTupleCount() > marginalCount)
+            marginalCount = tableList[r]->getTupleCount();
+    }
+    double *marginal = new double[marginalCount];
+
+    int iter;
+    for (iter = 0; iter < maxiter; iter++) {
+        error = 0.0;
+        for (int r = 0; r < relCount; r++) {
+            Table *table = tableList[r];
+            long long *cells = cellList + r * tupleCount;
+            //-- project the fit onto the relation's cells; tuples outside them don't matter
+            memset(marginal, 0, table->getTupleCount() * sizeof(double));
+            for (i = 0; i < tupleCount; i++) {
+                if (cells[i] >= 0)
+                    marginal[cells[i]] += values[i];
+            }
+            //-- then scale as in the sparse loop; every tuple left is in its own marginal
+            for (i = 0; i < tupleCount; i++) {
+                if (values[i] == 0.0)
+                    continue;
+                double newValue = 0.0;
+                if (cells[i] >= 0) {
+                    double relValue = table->getValue(cells[i]);
+                    if (relValue > DBL_EPSILON) {
+                        double projValue = marginal[cells[i]];
+                        if (projValue > DBL_EPSILON)
+                            newValue = values[i] * relValue / projValue;
+                        error = fmax(error, fabs(relValue - projValue));
+                    }
+                }
+                values[i] = newValue > DBL_EPSILON ? newValue : 0.0;
+            }
+        }
+        if (error < delta2)
+            break;
+    }
+
+    //-- keep the tuples left; they are still in the order of fitTable1
+    ws->fitTable2->reset(keysize);
+    for (i = 0; i < tupleCount; i++) {
+        if (values[i] > 0.0) {
+            ws->fitTable1->copyKey(i, key);
+            ws->fitTable2->addTuple(key, values[i]);
+        }
+    }
+    Table *ftswap = ws->fitTable1;
+    ws->fitTable1 = ws->fitTable2;
+    ws->fitTable2 = ftswap;
+    delete[] values;
+    delete[] cellList;
+    delete[] marginal;
+    delete[] key;
+    return iter;
+}
+
+//-- the IPF loop of makeFitTableIPF, run over a dense array of the whole state space.
+//-- Returns the number of iterations; the fit is stored into the workspace's fitTable1.
+int ManagerBase::makeFitTableDense(Model *model, Relation **relList, Table **tableList, int relCount, int startRel,
+        double maxiter, double delta2, double &error) {
+    ManagerWorkspace *ws = workspace();
+    if (!ws->dense)
+        ws->dense = new DenseTable(varList);
+    if (maxiter > 1 && copyProgenitorFit(model, ws->fitTable1))
+        ws->dense->load(ws->fitTable1);
+    else
+        ws->dense->expand(relList[startRel], tableList[startRel]);
+    int iter;
+    for (iter = 0; iter < maxiter; iter++) {
+        error = 0.0;
+        for (int r = 0; r < relCount; r++) {
+            double relError = ws->dense->fitRelation(relList[r], tableList[r]);
+            error = fmax(error, relError);     // fmax is a macro; don't fit twice
+        }
+        if (error < delta2)
+            break;
+    }
+    ws->dense->store(ws->fitTable1);
+    return iter;
+}
+
+//-- keep a copy of a model's IPF fit, so its children can start from it
+void ManagerBase::retainFit(Model *model, Table *fit) {
+    if (model->isStateBased())
+        return;
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    if (model->getFitTable() != NULL)
+        return;
+    Table *retained = new Table(keysize, fit->getTupleCount() > 0 ? fit->getTupleCount() : 1);
+    retained->copy(fit);
+    model->setLastUse(++tableClock);
+    model->setFitTable(retained);
+    retainedFits[model] = retained->size();
+    tableBytes += retained->size();
+}
+
+//-- start an IPF fit from the retained fit of the model's progenitor, if that is allowed.
+//-- The progenitor must lie below the model in the lattice; otherwise its fit may have
+//-- interactions the model doesn't, and IPF would converge to something else.
+bool ManagerBase::copyProgenitorFit(Model *model, Table *fit) {
+    Model *progen = model->getProgenitor();
+    if (!ipfWarmStart || progen == NULL || progen == model || model->isStateBased() || progen->isStateBased())
+        return false;
+    std::lock_guard<std::recursive_mutex> guard(sharedLock);
+    Table *progenFit = progen->getFitTable();
+    if (progenFit == NULL || !model->containsModel(progen))
+        return false;
+    progen->setLastUse(++tableClock);
+    fit->copy(progenFit);
+    return true;
+}
+
 bool ManagerBase::makeFitTable(Model *model) {
     
     if (model == nullptr) { return false; }
@@ -1623,97 +2121,44 @@ bool ManagerBase::makeFitTable(Model *model) {
 
     else if (!hasLoops(model) 
           && !model->isStateBased() 
-          && !getVariableList()->isDirected()) 
+          && (!getVariableList()->isDirected() || findIndependentRelation(model) != NULL))
         { return makeFitTableAlgebraic(model); }
     else 
         { return makeFitTableIPF(model); }
 }
 
-FitIntersectMap ManagerBase::computeIntersectLevels(Model* model) {
-
-    // Allocate new workspace array
-    int fitIntersectCount = 0;
-    long fitIntersectMax = model->getRelationCount();
-    VarIntersect *fitIntersectArray = new VarIntersect[fitIntersectMax];
-
-
-    // Initialize the VarIntersects in the work array. 
-    for (int i = 0; i < fitIntersectMax; i++) {
-        Relation* rel = model->getRelation(i);
-        VarIntersect *intersect = fitIntersectArray + (fitIntersectCount++);
-        intersect->rel = rel;
-        intersect->startIndex = i;
-        intersect->sign = true;
-    }
-
-    // Do all of the work of figuring out the intersects.
-    // Then we'll do a pass over the work array to
-    // represent the intersects in a more compressed way.
-    // Much of the work in the below section can probably be elided.
-    int levelstart = 0;
-    int levelend = fitIntersectCount;
-    int level0end = fitIntersectCount;
-    bool sign = true;
-    int *newvars, newcount;
-
-    while (levelend > levelstart) {
-        sign = !sign;
-        for (int i = levelstart; i < levelend; i++) {
-            for (int j = fitIntersectArray[i].startIndex + 1; j < level0end; j++) {
-                VarIntersect* ip = fitIntersectArray + i;
-                VarIntersect* jp = fitIntersectArray + j;
-
-                if (intersect(ip->rel, jp->rel, newvars, newcount)) {
-
-                    Relation* rel = getRelation(newvars, newcount, true);
-                    //-- add this intersection term to the DF, and append to list
-                    while (fitIntersectCount >= fitIntersectMax) {
-                        fitIntersectArray =
-                                (VarIntersect*) growStorage(fitIntersectArray, sizeof(VarIntersect)*fitIntersectMax, 2);
-                        fitIntersectMax *= 2;
-                    }
-                    VarIntersect* newp = fitIntersectArray + (fitIntersectCount++);
-                    newp->rel = rel;
-                    newp->startIndex = j;
-                    newp->sign = sign;
-                    delete[] newvars;
-                }
-            }
+struct FitIntersectProc: public ocIntersectProcessor {
+        FitIntersectMap levels;
+        void process(bool sign, Relation *rel, int count) {
+            // NOTE: C++ std::map has the following behavior for operator[]:
+            // when the key does not yet exist, a new element is inserted using the default constructor -- 0, in the case of `long long`.
+            levels[rel] += (sign ? 1 : -1) * count;
         }
-        levelstart = levelend;
-        levelend = fitIntersectCount;
-    }
-
-    // Allocate the map of intersect levels,
-    //  which is what is actually of interest
-    FitIntersectMap out;
-    // Iterate over the work array and add everything to the map.
-    for(long long ri = 0; ri < fitIntersectCount; ++ri) {
-        VarIntersect fi = fitIntersectArray[ri];
-    
-        // NOTE: C++ std::map has the following behavior for operator[]:
-        // when the key does not yet exist, a new element is inserted using the default constructor -- 0, in the case of `long long`.
-        out[fi.rel] += fi.sign ? 1 : -1;
-    }
+};
 
-    delete[] fitIntersectArray;
-    return out;
+FitIntersectMap ManagerBase::computeIntersectLevels(Model* model) {
+    //-- each relation's power is its net count over the inclusion-exclusion terms
+    FitIntersectProc processor;
+    doIntersectionProcessing(model, &processor);
+    return processor.levels;
 }
 
 
 Table* ManagerBase::disownTable() {
-    Table* ret = fitTable1;
-    fitTable1 = nullptr;
+    ManagerWorkspace *ws = workspace();
+    Table* ret = ws->fitTable1;
+    ws->fitTable1 = nullptr;
     return ret;
 }
 
 Table* ManagerBase::getIndepTable() {
+    ManagerWorkspace *ws = workspace();
     Table* oldFitTable1 = disownTable();
 
     makeFitTable(bottomRef);
-    Table* table = fitTable1;
+    Table* table = ws->fitTable1;
 
-    fitTable1 = oldFitTable1;
+    ws->fitTable1 = oldFitTable1;
     return table;}
 
 
@@ -1729,9 +2174,10 @@ Table* ManagerBase::getIndepTable() {
 Table* ManagerBase::projectedFit(Relation* projectTo, Model* fitModel) {
 
     // save the work tables; also zero out the fitTable1.
-    Table* oldFitTable = fitTable1;
+    ManagerWorkspace *ws = workspace();
+    Table* oldFitTable = ws->fitTable1;
     Table* oldData = inputData;
-    fitTable1 = nullptr;
+    ws->fitTable1 = nullptr;
 
 //    printf("<br>");
 //    printf("OLD FIT TABLE:");
@@ -1743,6 +2189,7 @@ Table* ManagerBase::projectedFit(Relation* projectTo, Model* fitModel) {
     // project inputData into new table based on projectTo
     int keysize = oldData->getKeySize();
     inputData = new Table(keysize, oldData->getTupleCount());
+    inputData->setIndexed(true);
     makeProjection(oldData, inputData, projectTo);
 
 //    printf("PROJECTED DATA TABLE:");
@@ -1754,8 +2201,8 @@ Table* ManagerBase::projectedFit(Relation* projectTo, Model* fitModel) {
     makeFitTable(fitModel);
 
     // get out the result and reset the work tables
-    Table* result = fitTable1;
-    fitTable1 = oldFitTable;
+    Table* result = ws->fitTable1;
+    ws->fitTable1 = oldFitTable;
     inputData = oldData;
 
 
@@ -70,6 +70,24 @@ bool ManagerBase::initFromCommandLine(int argc, char **argv) {
         setValuesAreFunctions(1);
     }
 
+    if (getOptionString("no-table-index", NULL, &option)) {
+        Table::setIndexing(false);
+    }
+
+    if (getOptionString("ipf-warm-start", NULL, &option)) {
+        setIPFWarmStart(true);
+    }
+
+    double denseCells;
+    if (getOptionFloat("dense-cells", NULL, &denseCells)) {
+        setDenseLimit((long long) denseCells);
+    }
+
+    double tableMemory;
+    if (getOptionFloat("table-memory", NULL, &tableMemory)) {
+        setTableBudget((long long) (tableMemory * 1024 * 1024));
+    }
+
     // check for negative values in the data
     negativeConstant = input->getLowestValue();
     if (test) {
@@ -10,11 +10,14 @@
 #include "Math.h"
 #include "Model.h"
 #include "Relation.h"
+#include "SparseRank.h"
 #include "_Core.h"
 
 #include <stdio.h>
 #include <string.h>
 #include <float.h>
+#include <algorithm>
+#include <vector>
 #include "Constants.h"
 
 double ocEntropy(Table *p) {
@@ -138,68 +141,67 @@ bool ocHasOverlaps(Model *model) {
     return false;
 }
 
-//-- these definitions are used in loop checking
-struct VarList {
-        int varCount;
-        int *vars;
-        VarList() :
-                varCount(0), vars(0) {
-        }
-        ~VarList() {
-            if (vars)
-                delete[] vars;
-        }
-        void setVars(int *newVars) {
-            if (vars)
-                delete[] vars;
-            vars = newVars;
+//-- Loops are found by GYO reduction over bitsets, one row of 64-bit words per relation:
+//-- the bits set in only one row are dropped, then the rows which are empty or within
+//-- another row, until nothing changes. If more than one row is left, there is a loop.
+static bool bitsetHasLoops(std::vector<unsigned long long> &rows, int rowCount, int words) {
+    std::vector<unsigned long long> once(words), twice(words);
+    std::vector<bool> cleared(rowCount, false);
+    int remaining = rowCount;
+    bool changed = true;
+    while (changed && remaining > 1) {
+        changed = false;
+        std::fill(once.begin(), once.end(), 0);
+        std::fill(twice.begin(), twice.end(), 0);
+        for (int i = 0; i < rowCount; i++) {
+            if (cleared[i])
+                continue;
+            unsigned long long *row = &rows[i * words];
+            for (int w = 0; w < words; w++) {
+                twice[w] |= once[w] & row[w];
+                once[w] |= row[w];
+            }
         }
-};
-
-//-- copy a VarList
-static void VLCopy(VarList &from, VarList &to) {
-    if (to.varCount < from.varCount) {
-        to.setVars(new int[from.varCount]);
-    }
-    to.varCount = from.varCount;
-    if (to.varCount > 0)
-        memcpy(to.vars, from.vars, to.varCount * sizeof(int));
-}
-
-//-- remove variables from v1 which are present in v2
-static void VLComplement(VarList &v1, VarList &v2) {
-    if (v1.varCount == 0 || v1.varCount == 0)
-        return;
-    int *newvars = new int[v1.varCount];
-    int count = 0, i, j;
-    for (i = 0; i < v1.varCount; i++) {
-        for (j = 0; j < v2.varCount; j++) {
-            if (v2.vars[j] == v1.vars[i])
-                break;
+        for (int i = 0; i < rowCount; i++) {
+            if (cleared[i])
+                continue;
+            unsigned long long *row = &rows[i * words];
+            for (int w = 0; w < words; w++) {
+                unsigned long long unique = row[w] & ~twice[w];
+                if (unique) {
+                    row[w] &= ~unique;
+                    changed = true;
+                }
+            }
         }
-        if (j >= v2.varCount) { // not found; add it to result
-            newvars[count++] = v1.vars[i];
+        for (int i = 0; i < rowCount; i++) {
+            if (cleared[i])
+                continue;
+            unsigned long long *row = &rows[i * words];
+            bool empty = true;
+            for (int w = 0; w < words && empty; w++)
+                empty = row[w] == 0;
+            bool within = false;
+            for (int j = 0; j < rowCount && !empty && !within; j++) {
+                if (j == i || cleared[j])
+                    continue;
+                unsigned long long *other = &rows[j * words];
+                within = true;
+                for (int w = 0; w < words && within; w++)
+                    within = (row[w] & ~other[w]) == 0;
+            }
+            if (empty || within) {
+                cleared[i] = true;
+                remaining--;
+                changed = true;
+            }
         }
     }
-    v1.setVars(newvars);
-    v1.varCount = count;
-}
-
-//-- check for containment (v1 contains v2)
-static bool VLContains(VarList &v1, VarList &v2) {
-    if (v1.varCount < v2.varCount)
-        return false; // quick check for impossibility
-    return ocContainsVariables(v1.varCount, v1.vars, v2.varCount, v2.vars);
-}
-
-// returns true if first boolean array is a superset of (or equal to) second
-bool isSuperset(bool *first, bool *second, int length) {
-    for (int i = 0; i < length; i++)
-        if (second[i] && !first[i])
-            return false;
-    return true;
+    return remaining > 1;
 }
 
+//-- for state-based models, each row has a bit for each state of each variable; a
+//-- relation has the bits of its constrained states, and of all states of the others
 bool ocSbHasLoops(Model *model) {
     if (model == NULL) {
         fprintf(stdout, "ocSbHasLoops(): Error. Model is NULL.\n");
@@ -207,7 +209,6 @@ bool ocSbHasLoops(Model *model) {
         exit(1);
     }
     int rel_count = model->getRelationCount();
-//    if (rel_count > 3) return false;
     VariableList *var_list;
     if (rel_count > 0) {
         var_list = model->getRelation(0)->getVariableList();
@@ -216,128 +217,32 @@ bool ocSbHasLoops(Model *model) {
         fflush(stdout);
         exit(1);
     }
-    int i, j, k;
     int var_count = var_list->getVarCount();
-    int *card_array = new int[var_count];
     int *card_offsets = new int[var_count];
     int total_card = 0;
-    // Make a list of all variable cardinalities, and also the total cardinality.
-    // Also we make an offset list, to make it easier to reference where variables
-    // will start in the boolean arrays below.
-    for (i = 0; i < var_count; i++) {
-        card_array[i] = var_list->getVariable(i)->cardinality;
-        if (i == 0) {
-            card_offsets[i] = 0;
-        } else {
-            card_offsets[i] = card_array[i - 1] + card_offsets[i - 1];
-        }
-        total_card += card_array[i];
-    }
-    // Make a boolean array of rel_count * total_card, to hold flags of which var states
-    // are in which relations.
-    bool **state_flags = new bool *[rel_count];
-    //StateConstraint *constraints;
-    int *var_indices, *state_indices;
-    for (i = 0; i < rel_count; i++) {
-        state_flags[i] = new bool[total_card];
-        memset(state_flags[i], 0, total_card * sizeof(bool));
-        // Now we populate the array from the relation's constraints.
-        var_indices = model->getRelation(i)->getVariables();
-        state_indices = model->getRelation(i)->getStateIndices();
-        for (j = 0; j < model->getRelation(i)->getVariableCount(); j++) {
-            if (state_indices[j] != DONT_CARE) {
-                state_flags[i][state_indices[j] + card_offsets[var_indices[j]]] = true;
-            } else {
-                for (k = 0; k < card_array[var_indices[j]]; k++) {
-                    state_flags[i][k + card_offsets[var_indices[j]]] = true;
-                }
+    for (int i = 0; i < var_count; i++) {
+        card_offsets[i] = total_card;
+        total_card += var_list->getVariable(i)->cardinality;
+    }
+    int words = (total_card + 63) / 64;
+    std::vector<unsigned long long> rows(rel_count * words, 0);
+    for (int i = 0; i < rel_count; i++) {
+        Relation *rel = model->getRelation(i);
+        int *var_indices = rel->getVariables();
+        int *state_indices = rel->getStateIndices();
+        unsigned long long *row = &rows[i * words];
+        for (int j = 0; j < rel->getVariableCount(); j++) {
+            int var = var_indices[j];
+            int first = state_indices[j] != DONT_CARE ? state_indices[j] : 0;
+            int last = state_indices[j] != DONT_CARE ? state_indices[j] : var_list->getVariable(var)->cardinality - 1;
+            for (int k = first; k <= last; k++) {
+                int bit = card_offsets[var] + k;
+                row[bit / 64] |= 1ULL << (bit % 64);
             }
         }
     }
-    // We now have a set of boolean arrays that represent which states are present or not.
-    // We can proceed with the standard loop-finding algorithm now, where we drop variables (states)
-    // that are unique to one relation, and then drop any relations that are subsets of other
-    // relations, continuing until we can't make a change. When done, if anything remains, there
-    // was a loop.
     delete[] card_offsets;
-    delete[] card_array;
-    bool changed = true;
-    int count, found_at;
-    bool *cleared = new bool[rel_count];
-    int clear_count = 0;
-    memset(cleared, 0, rel_count * sizeof(bool));
-    while (changed) {
-        changed = false;
-        // check for var states that only exist in one key (key masked by var) (and eliminate)
-        for (i = 0; i < total_card; i++) {
-            count = 0;
-            for (j = 0; j < rel_count; j++) {
-                if (state_flags[j][i]) {
-                    count++;
-                    if (count > 1)
-                        break;
-                    found_at = j;
-                }
-            }
-            if (count == 1) {
-                state_flags[found_at][i] = false;
-                changed = true;
-            }
-        }
-        // check for var combos that are subsets of another (and eliminate)
-        for (i = 0; i < rel_count; i++) {
-            if (cleared[i])
-                continue;
-            for (j = i + 1; j < rel_count; j++) {
-                if (cleared[j])
-                    continue;
-                if (isSuperset(state_flags[i], state_flags[j], total_card)) {
-                    // clear subset row j
-                    for (k = 0; k < total_card; k++)
-                        state_flags[j][k] = false;
-                    changed = true;
-                    cleared[j] = true;
-                    clear_count++;
-                } else if (isSuperset(state_flags[j], state_flags[i], total_card)) {
-                    // clear subset row i
-                    for (k = 0; k < total_card; k++)
-                        state_flags[i][k] = false;
-                    changed = true;
-                    cleared[i] = true;
-                    clear_count++;
-                }
-            }
-        }
-        // If we ever know that we've cleared all rows, there is no loop and we can return false immediately.
-        if (clear_count == rel_count) {
-            for (int d = 0; d < rel_count; d++) {
-                delete[] state_flags[d];
-            }
-            delete[] state_flags;
-            delete[] cleared;
-            return false;
-        }
-    }
-    // Once all changes are complete, check if anything is left.  If so, there is a loop.
-    for (i = 0; i < rel_count; i++) {
-        if (cleared[i])
-            continue;
-        for (j = 0; j < total_card; j++)
-            if (state_flags[i][j]) {
-                for (int d = 0; d < rel_count; d++) {
-                    delete[] state_flags[d];
-                }
-                delete[] state_flags;
-                delete[] cleared;
-                return true;
-            }
-    }
-    for (int d = 0; d < rel_count; d++) {
-        delete[] state_flags[d];
-    }
-    delete[] state_flags;
-    delete[] cleared;
-    return false;
+    return bitsetHasLoops(rows, rel_count, words);
 }
 
 bool ocHasLoops(Model *model) {
@@ -348,54 +253,25 @@ bool ocHasLoops(Model *model) {
     }
     if (model->isStateBased())
         return ocSbHasLoops(model);
-    int i, j, relcount;
-    relcount = model->getRelationCount();
-    VarList *rels = new VarList[relcount];
-    //-- copy variable lists from relations
-    for (i = 0; i < relcount; i++) {
+    int relcount = model->getRelationCount();
+    int varcount = 0;
+    for (int i = 0; i < relcount; i++) {
         Relation *relation = model->getRelation(i);
-        rels[i].varCount = relation->getVariableCount();
-        rels[i].setVars(new int[rels[i].varCount]);
-        relation->copyVariables(rels[i].vars, rels[i].varCount);
-    }
-
-    for (;;) {
-        bool change = false;
-        //-- repeat until no further change:
-        //-- first eliminate variables occuring in only one relation.
-        //-- then eliminate relations which are subsets of others
-        for (i = 0; i < relcount; i++) {
-            VarList newList;
-            VLCopy(rels[i], newList);
-            for (j = 0; j < relcount; j++) {
-                if (j != i)
-                    VLComplement(newList, rels[j]);
-            }
-            if (newList.varCount > 0) {
-                VLComplement(rels[i], newList);
-                change = true;
-            }
-        }
-        for (i = 0; i < relcount; i++) {
-            for (j = 0; j < relcount; j++) {
-                if (i != j && rels[i].varCount > 0 && rels[j].varCount > 0 && VLContains(rels[i], rels[j])) {
-                    change = true;
-                    rels[j].varCount = 0;
-                }
-            }
+        for (int j = 0; j < relation->getVariableCount(); j++) {
+            if (relation->getVariable(j) >= varcount)
+                varcount = relation->getVariable(j) + 1;
         }
-        if (!change)
-            break;
     }
-
-    //-- do cleanup, and also see if there are any relations left.
-    int remaining = 0;
-    for (i = 0; i < relcount; i++) {
-        if (rels[i].varCount > 0)
-            remaining++;
+    int words = (varcount + 63) / 64;
+    std::vector<unsigned long long> rows(relcount * words, 0);
+    for (int i = 0; i < relcount; i++) {
+        Relation *relation = model->getRelation(i);
+        for (int j = 0; j < relation->getVariableCount(); j++) {
+            int var = relation->getVariable(j);
+            rows[i * words + var / 64] |= 1ULL << (var % 64);
+        }
     }
-    delete[] rels;
-    return remaining > 1;
+    return bitsetHasLoops(rows, relcount, words);
 }
 
 double ocLR(double sample, double df, double h) {
@@ -994,97 +870,11 @@ unsigned chistat(unsigned ntab, double* obs, double* fit, double* g2_ptr, double
     return nz;
 }
 
-// Gaussian elimination method to calculate rank
-// source: http://www.wikipedia.org/wiki/Gauss_elimination_method
+// The rank of the structure matrix, found from its sparse rows modulo two large primes
+// (see SparseRank.h)
 double ocDegreesOfFreedomStateBased(Model *model) {
-    int nrows = 0, ncols = 0;
-    int i = 0, j = 0;
-    double **matrix = NULL;
-    int **struct_matrix = model->getStructMatrix(&ncols, &nrows);
-    if (struct_matrix == NULL) {
-        fprintf(stdout, "ocDegreesOfFreedomStateBased(): Error. Model %s: struct matrix not found.\n", model->getPrintName());
-        fflush(stdout);
-        exit(1);
-    }
-    // create a copy of the matrix to manipulate
-    matrix = new double *[nrows];
-    for (i = 0; i < nrows; i++) {
-        matrix[i] = new double[ncols];
-    }
-    for (i = 0; i < nrows; i++) {
-        if (i < nrows - 1) {
-            for (j = 0; j < ncols; j++) {
-                matrix[i + 1][j] = (double)struct_matrix[i][j];
-            }
-        } else {
-            for (j = 0; j < ncols; j++) {
-                matrix[0][j] = (double)struct_matrix[i][j];
-            }
-        }
-    }
+    double rank = model->getStructRank()->getRank();
     model->deleteStructMatrix();
-    int irow, jrow, icol, jcol;
-    bool have_pivot = false;
-    int rowmax = 0;
-    icol = 0;
-    int i1, j1;
-    double *temp_ptr;
-    for (irow = 0; irow < nrows; irow++) {    // Find pivot in column j, starting in row i:
-        have_pivot = false;
-        do {
-            rowmax = irow;
-            if (icol >= ncols) break;
-            for (jrow = irow + 1; jrow < nrows; jrow++) {
-                if (fabs(matrix[jrow][icol]) > fabs(matrix[rowmax][icol])) {
-                    rowmax = jrow;
-                }
-            }
-            if (fabs(matrix[rowmax][icol]) > DBL_EPSILON) {
-                have_pivot = true;
-                if (rowmax != irow) {   //switch rows irow and rowmax
-                    temp_ptr = matrix[irow];
-                    matrix[irow] = matrix[rowmax];
-                    matrix[rowmax] = temp_ptr;
-                }
-            } else {
-                matrix[rowmax][icol] = 0.0;
-                icol = icol + 1;
-            }
-        } while ((!have_pivot) && (icol < ncols));
-        if (icol >= ncols) {
-            break;
-        }
-        double factor;
-        if (fabs(matrix[irow][icol]) > DBL_EPSILON) {
-            for (jrow = irow+1; jrow < nrows; jrow++) {
-                factor = matrix[jrow][icol] / matrix[irow][icol];
-                for (jcol = icol+1; jcol < ncols; jcol++) {
-                    matrix[jrow][jcol] -= matrix[irow][jcol] * factor;
-                }
-                matrix[jrow][icol] = 0.0;
-            }
-        }
-        icol++;
-    }
-    double rank = 0;
-    double limit = pow(FLT_RADIX, DBL_MANT_DIG);
-    for (i = 0; i < nrows; i++) {
-        for (j = i; j < ncols; j++) {
-            if (fabs(matrix[i][j]) > DBL_EPSILON) {
-                if (rank >= limit) {
-                    fprintf(stdout, "ocDegreesOfFreedomStateBased(): Error. DF exceeds current limits of State-based OCCAM.\n");
-                    fflush(stdout);
-                    exit(1);
-                } else {
-                    rank++;
-                    break;
-                }
-            }
-        }
-    }
-    for (i = 0; i < nrows; i++) {
-        delete[] matrix[i];
-    }
-    delete[] matrix;
+    model->deleteStructRank();
     return rank - 1;
 }
@@ -7,15 +7,18 @@
 
 #include <math.h>
 #include "ManagerBase.h"
+#include "Arena.h"
 #include "AttributeList.h"
 #include "Math.h"
 #include "Model.h"
 #include "ModelCache.h"
 #include "Relation.h"
+#include "SparseRank.h"
 #include "StateConstraint.h"
 #include "_Core.h"
 
 #include <assert.h>
+#include <mutex>
 #include <float.h>
 #include <stdio.h>
 #include <stdlib.h>
@@ -28,37 +31,62 @@
  * data (e.g., computed via IPF).
  */
 
+//-- every live model, so that memory is counted for models held outside the cache
+static std::mutex liveModelsLock;
+static Model *liveModels = NULL;
+
 // initialize the model, and allocate storage for the relation pointers.
-Model::Model(int size) {
+// The relation pointers, names, signature and attribute values are kept in the
+// model arena, in the blocks of the current search level, until promote().
+Model::Model(int size, Arena *arena) {
+    this->arena = arena;
     maxRelationCount = size;
     relationCount = 0;
     stateSpaceSize = 0;
     totalConstraints = 0;
-    relations = new Relation*[size];
+    relations = (Relation **) allocate(size * sizeof(Relation*));
     fitTable = NULL;
-    attributeList = new AttributeList(6);
+    lastUse = 0;
+    attributeList = new AttributeList(6, arena);
     printName = NULL;
     inverseName = NULL;
-    hashNext = NULL;
     progenitor = NULL;
     ID = 0;
     structMatrix = NULL;
+    structRank = NULL;
+    signature = NULL;
+    signatureHash = 0;
+    std::lock_guard<std::mutex> guard(liveModelsLock);
+    livePrev = NULL;
+    liveNext = liveModels;
+    if (liveModels)
+        liveModels->livePrev = this;
+    liveModels = this;
 }
 
 Model::~Model() {
-    if (structMatrix) {
-        this->deleteStructMatrix();
+    {
+        std::lock_guard<std::mutex> guard(liveModelsLock);
+        if (livePrev)
+            livePrev->liveNext = liveNext;
+        else
+            liveModels = liveNext;
+        if (liveNext)
+            liveNext->livePrev = livePrev;
     }
+    deleteStructMatrix();
+    deleteStructRank();
+    deleteSignature();
     if (printName) {
-        delete printName;
+        release(printName);
         printName = NULL;
     }
     if (inverseName) {
-        delete inverseName;
+        release(inverseName);
         inverseName = NULL;
     }
     if (relations)
-        delete[] relations;     // only pointers; actual relations deleted by the relCache
+        release(relations);     // only pointers; actual relations deleted by the relCache
     if (fitTable) {
         delete fitTable;
         fitTable = NULL;
@@ -68,15 +96,64 @@ Model::~Model() {
 }
 
 void Model::deleteStructMatrix() {
-    for (int i = 0; i < totalConstraints; i++) {
-        delete[] structMatrix[i];
+    if (structMatrix) {
+        for (int i = 0; i < totalConstraints; i++) {
+            delete[] structMatrix[i];
+        }
+        delete[] structMatrix;
+        structMatrix = NULL;
     }
-    delete[] structMatrix;
-    structMatrix = NULL;
+    std::vector<std::vector<int> >().swap(structRows);
+}
+
+void Model::deleteStructRank() {
+    if (structRank) {
+        delete structRank;
+        structRank = NULL;
+    }
+}
+
+void *Model::allocate(long bytes) {
+    return arena ? arena->allocate(bytes) : new char[bytes];
+}
+
+void Model::release(void *ptr) {
+    if (ptr == NULL)
+        return;
+    if (arena)
+        Arena::release(ptr);
+    else
+        delete [] (char *) ptr;
+}
+
+void Model::promote() {
+    if (arena == NULL)
+        return;
+    relations = (Relation **) arena->promote(relations);
+    printName = (char *) arena->promote(printName);
+    inverseName = (char *) arena->promote(inverseName);
+    signature = (KeySegment *) arena->promote(signature);
+    if (attributeList)
+        attributeList->promote();
 }
 
 long Model::size() {
     long size = sizeof(Model) + maxRelationCount * sizeof(Relation*);
+    if (printName)
+        size += strlen(printName) + 1;
+    if (inverseName)
+        size += strlen(inverseName) + 1;
+    if (signature) {
+        int keysize = relationCount > 0 ? relations[0]->getKeySize() : 0;
+        size += (relationCount * keysize + 1) * sizeof(KeySegment);
+    }
+    size += structRows.capacity() * sizeof(std::vector<int>);
+    for (auto &row : structRows)
+        size += row.capacity() * sizeof(int);
+    if (structMatrix)
+        size += totalConstraints * (sizeof(int*) + stateSpaceSize * sizeof(int));
+    if (structRank)
+        size += structRank->size();
     if (fitTable)
         size += fitTable->size();
     if (attributeList)
@@ -84,6 +161,20 @@ long Model::size() {
     return size;
 }
 
+void Model::getLiveSizes(Arena *arena, long long &models, long long &fitTables, long long &attributes) {
+    models = fitTables = attributes = 0;
+    std::lock_guard<std::mutex> guard(liveModelsLock);
+    for (Model *model = liveModels; model; model = model->liveNext) {
+        if (model->arena != arena)
+            continue;
+        long long fit = model->fitTable ? model->fitTable->size() : 0;
+        long long attrs = model->attributeList ? model->attributeList->size() : 0;
+        models += model->size() - fit - attrs;
+        fitTables += fit;
+        attributes += attrs;
+    }
+}
+
 bool Model::isStateBased() {
     for (int i = 0; i < relationCount; i++) {
         if (relations[i]->isStateBased())
@@ -115,78 +206,69 @@ double Model::getAttribute(const char *name) {
     return attributeList->getAttribute(name);
 }
 
-//state space array
-int * Model::getIndicesFromKey(KeySegment *key, VariableList *vars, int statespace, int **stateSpaceArr,
-        int *counter) {
+void Model::setAttribute(int id, double value) {
+    attributeList->setAttribute(id, value);
+}
+
+double Model::getAttribute(int id) {
+    return attributeList->getAttribute(id);
+}
+
+//-- the states covered by a constraint, in ascending order. A state's index is the
+//-- mixed-radix number formed from the variables' values, with the last one fastest.
+int * Model::getIndicesFromKey(KeySegment *key, VariableList *vars, int *counter) {
     int varcount = vars->getVarCount();
-    int *value_l = new int[varcount];
-    //maximum number of states that can constrained by a relation
-    int *indices = new int[statespace];
-    for (int i = 0; i < varcount; i++) {
+    int value_l[varcount];
+    int stride[varcount];
+    int digit[varcount];
+    int count = 1, base = 0;
+    for (int i = varcount - 1; i >= 0; i--) {
         Variable *var = vars->getVariable(i);
-        KeySegment mask = var->mask;
-        int segment = var->segment;
-        int value = 0;
-        KeySegment mask1;
-        if ((mask1 = (mask & key[segment])) == mask)
+        stride[i] = i == varcount - 1 ? 1 : stride[i + 1] * vars->getVariable(i + 1)->cardinality;
+        if ((var->mask & key[var->segment]) == var->mask) {
             value_l[i] = DONT_CARE;
-        else {
-            value = (key[segment] & mask) >> var->shift;
-            value_l[i] = value;
+            count *= var->cardinality;
+        } else {
+            value_l[i] = (key[var->segment] & var->mask) >> var->shift;
+            base += value_l[i] * stride[i];
         }
-    }
-    *counter = 0;
-    int not_a_match = -1;
-    for (int i = 0; i < statespace; i++) {
-        for (int j = 0; j < varcount; j++) {
-            if (value_l[j] == DONT_CARE)
+        digit[i] = 0;
+    }
+    int *indices = new int[count];
+    //-- count through the unconstrained variables like an odometer
+    int index = base;
+    for (int n = 0; n < count; n++) {
+        indices[n] = index;
+        for (int i = varcount - 1; i >= 0; i--) {
+            if (value_l[i] != DONT_CARE)
                 continue;
-            if (value_l[j] != stateSpaceArr[i][j]) {
-                not_a_match = 1;
+            if (++digit[i] < vars->getVariable(i)->cardinality) {
+                index += stride[i];
                 break;
-            } else {
-                not_a_match = 0;
             }
+            index -= (digit[i] - 1) * stride[i];
+            digit[i] = 0;
         }
-        if (not_a_match == 0) {
-            indices[(*counter)] = i;
-            (*counter)++;
-
-        }
-        not_a_match = -1;
-
     }
-    delete[] value_l;
+    *counter = count;
     return indices;
 }
 
-// State-Based Structure matrix generation
-void Model::makeStructMatrix(int statespace, VariableList *vars, int **stateSpaceArr) {
-    if (structMatrix != NULL) return;
+// State-Based Structure matrix generation: the states covered by each constraint, then
+// by the default constraint, which covers them all
+void Model::makeStructMatrix(VariableList *vars) {
+    if (!structRows.empty()) return;
     int relCount = getRelationCount();
     long constraintCount = 0;
-    long i = 0;
-    for (i = 0; i < relCount; i++) {
+    for (int i = 0; i < relCount; i++) {
         Relation *rel = getRelation(i);
         StateConstraint *sc = rel->getStateConstraints();
         if (sc != NULL)
             constraintCount += sc->getConstraintCount();
     }
     totalConstraints = constraintCount + 1;
-    stateSpaceSize = statespace;
-    structMatrix = new int *[constraintCount + 1];
-    for (i = 0; i <= constraintCount; i++) {
-        structMatrix[i] = new int[statespace];
-    }
-    for (i = 0; i < statespace; i++) {
-        for (int j = 0; j < constraintCount; j++) {
-            structMatrix[j][i] = 0;
-        }
-        structMatrix[constraintCount][i] = 1; //the default constraint
-    }
-    constraintCount = 0;
-    int totalConstraintCount = 0;
-    for (i = 0; i < relCount; i++) {
+    structRows.reserve(totalConstraints);
+    for (int i = 0; i < relCount; i++) {
         Relation *rel = getRelation(i);
         StateConstraint *sc = rel->getStateConstraints();
         if (sc == NULL) {
@@ -205,14 +287,15 @@ void Model::makeStructMatrix(int statespace, VariableList *vars, int **stateSpac
                 exit(1);
             }
             int counter;
-            int *indices = getIndicesFromKey(key, vars, statespace, stateSpaceArr, &counter);
-            for (int k = 0; k < counter; k++) {
-                structMatrix[totalConstraintCount + j][indices[k]] = 1;
-            }
+            int *indices = getIndicesFromKey(key, vars, &counter);
+            structRows.push_back(std::vector<int>(indices, indices + counter));
             delete[] indices;
         }
-        totalConstraintCount += constraintCount;
     }
+    std::vector<int> all(stateSpaceSize);
+    for (int i = 0; i < stateSpaceSize; i++)
+        all[i] = i;
+    structRows.push_back(all);
 }
 
 void Model::completeSbModel() {
@@ -221,59 +304,25 @@ void Model::completeSbModel() {
         fflush(stdout);
         exit(1);
     }
-    if (structMatrix != NULL) return;
     VariableList *varList = getRelation(0)->getVariableList();
-    int stateSpace = (int) ocDegreesOfFreedom(varList) + 1; // ought to be using something longer than int
-    int **stateSpaceArray = Model::makeStateSpaceArray(varList, stateSpace);
-    this->makeStructMatrix(stateSpace, varList, stateSpaceArray);
-    for (int i=0; i < stateSpace; i++) {
-        delete[] stateSpaceArray[i];
-    }
-    delete[] stateSpaceArray;
+    stateSpaceSize = (int) ocDegreesOfFreedom(varList) + 1; // ought to be using something longer than int
 }
 
-int** Model::makeStateSpaceArray(VariableList *varList, int statespace) {
-    int **stateSpaceArray = new int *[statespace];
-    int varCount = varList->getVarCount();
-    for (int i = 0; i < statespace; i++) {
-        stateSpaceArray[i] = new int[varCount];
-    }
-
-    for (int i = 0; i < statespace; i++) {
-        for (int j = 0; j < varCount; j++) {
-            stateSpaceArray[i][j] = 0;
-        }
-    }
-    for (int k = 0; k < varCount; k++) {
-        stateSpaceArray[0][k] = 0;
-    }
-    int l = varCount - 1;
-    int i = 0;
-    int loop1 = 0;
-    while (i < statespace - 1) {    // first copy from previous state
-        for (int j = 0; j < varCount; j++) {
-            stateSpaceArray[i + 1][j] = stateSpaceArray[i][j];
-        }
-        rap: if (i + 1 == statespace)
-            break;
-        Variable *var = varList->getVariable(l);
-        int card = var->cardinality;
-        if (stateSpaceArray[i][l] == (card - 1)) {
-            stateSpaceArray[i + 1][l] = 0;
-            l--;
-            if (l < 0)
-                break;
-            goto rap;
-        } else {
-            stateSpaceArray[i + 1][l]++;
-            l = varCount - 1;
-        }
-        i++;
-    }
-    return stateSpaceArray;
+//-- the rows are only made when the rank or the dense matrix needs them, and freed
+//-- once that is made, since they include a row over the whole state space
+SparseRank *Model::getStructRank() {
+    if (structRank == NULL) {
+        completeSbModel();
+        makeStructMatrix(getRelation(0)->getVariableList());
+        structRank = new SparseRank();
+        //-- the default constraint first, as it is the densest
+        for (long i = structRows.size() - 1; i >= 0; i--)
+            structRank->addRow(structRows[i].data(), structRows[i].size());
+        std::vector<std::vector<int> >().swap(structRows);
+    }
+    return structRank;
 }
 
-
 void Model::addRelation(Relation *newRelation, bool normalize, ModelCache *cache) {
     if (newRelation == NULL)
         return;
@@ -300,9 +349,15 @@ void Model::addRelation(Relation *newRelation, bool normalize, ModelCache *cache
             }
         }
     }
-    while (relationCount >= maxRelationCount) {     //-- grow storage if needed
-        relations = (Relation**) growStorage(relations, maxRelationCount*sizeof(Relation*), FACTOR);
-        maxRelationCount *= FACTOR;
+    if (relationCount >= maxRelationCount) {     //-- grow storage if needed
+        int newMax = maxRelationCount > 0 ? maxRelationCount : 1;
+        while (relationCount >= newMax)
+            newMax *= FACTOR;
+        Relation **newRelations = (Relation **) allocate(newMax * sizeof(Relation*));
+        memcpy(newRelations, relations, relationCount * sizeof(Relation*));
+        release(relations);
+        relations = newRelations;
+        maxRelationCount = newMax;
     }
     for (i = 0; i < relationCount; i++) {       // now find the spot for this newRelation and add it in
         if (newRelation->compare(relations[i]) < 0)
@@ -313,28 +368,24 @@ void Model::addRelation(Relation *newRelation, bool normalize, ModelCache *cache
     }
     relations[i] = newRelation;
     relationCount++;
+    deleteSignature();
     if (printName) {
-        delete printName;
+        release(printName);
         printName = NULL;
     }
     if (inverseName) {
-        delete inverseName;
+        release(inverseName);
         inverseName = NULL;
     }
-    if (structMatrix) {
-        for (int i = 0; i < totalConstraints; i++) {
-            delete[] structMatrix[i];
-        }
-        delete[] structMatrix;
-        structMatrix = NULL;
-    }
+    deleteStructMatrix();
+    deleteStructRank();
     if (fitTable) {
         delete fitTable;
         fitTable = NULL;
     }
     if (attributeList) {
         delete attributeList;
-        attributeList = new AttributeList(6);
+        attributeList = new AttributeList(6, arena);
     }
 }
 
@@ -355,30 +406,42 @@ bool Model::containsRelation(Relation *relation, ModelCache *cache) {
             if (relations[i] == relation)
                 return true;
         }
-        Model *new_model = new Model(this->getRelationCount() + 1);
+        Model *new_model = new Model(this->getRelationCount() + 1, arena);
         new_model->copyRelations(*this);
         new_model->addRelation(relation,false);
         Model *temp_old = NULL;
         Model *temp_new = NULL;
         double new_df;
         if (cache) {
-            temp_new = cache->findModel(new_model->getPrintName());
+            temp_new = cache->findModel(new_model);
         }
-        if (temp_new) {
+        if (temp_new && temp_new->getAttribute(ATTRIBUTE_DF) >= 0.0) {
             new_df = temp_new->getAttribute(ATTRIBUTE_DF);
-            if (new_df < 0.0) {
-                temp_new->completeSbModel();
-                new_df = ::ocDegreesOfFreedomStateBased(temp_new);
-                temp_new->setAttribute(ATTRIBUTE_DF, new_df);
-            }
-        } else {
+        } else if (relation->getStateConstraints() == NULL) {
             new_model->completeSbModel();
             new_df = ::ocDegreesOfFreedomStateBased(new_model);
+        } else {
+            //-- the rows of this model are already reduced; only the relation's are added.
+            //-- The basis is kept on this model, since it's asked about many relations.
+            //-- The rank is taken modulo two primes (see SparseRank.h), so it could, very
+            //-- rarely, come out short, and a relation not contained would be taken as one.
+            SparseRank rank(*getStructRank());
+            StateConstraint *sc = relation->getStateConstraints();
+            VariableList *varList = relation->getVariableList();
+            for (long j = 0; j < sc->getConstraintCount(); j++) {
+                int counter;
+                int *indices = getIndicesFromKey(sc->getConstraint(j), varList, &counter);
+                rank.addRow(indices, counter);
+                delete[] indices;
+            }
+            new_df = rank.getRank() - 1;
+            if (temp_new)
+                temp_new->setAttribute(ATTRIBUTE_DF, new_df);
         }
         double df = this->getAttribute(ATTRIBUTE_DF);
         if (df < 0.0) { //-- not set yet
             if (cache) {
-                temp_old = cache->findModel(this->getPrintName());
+                temp_old = cache->findModel(this);
             }
             if (temp_old) {
                 df = temp_old->getAttribute(ATTRIBUTE_DF);
@@ -417,9 +480,16 @@ bool Model::containsModel(Model *other) {
 }
 
 bool Model::isEquivalentTo(Model *other) {
+    if (this == other) {
+        return true;
+    }
+    //-- equivalent models always have the same signature hash, so this rules most out
+    if (getSignatureHash() != other->getSignatureHash()) {
+        return false;
+    }
     if (this->isStateBased() || other->isStateBased()) {
         // might be good to check if DFs are equal first, as a faster check
-        if ((this == other) || strcmp(this->getPrintName(),other->getPrintName()) == 0) {
+        if (strcmp(this->getPrintName(),other->getPrintName()) == 0) {
             return true;
         }
         if (this->containsModel(other) && other->containsModel(this)) {
@@ -427,11 +497,95 @@ bool Model::isEquivalentTo(Model *other) {
         }
         return false;
     } else {
-        if (this == other) {
-            return true;
+        return sameSignature(other);
+    }
+}
+
+void Model::makeSignature() {
+    int keysize = relationCount > 0 ? relations[0]->getKeySize() : 0;
+    size_t keybytes = keysize * sizeof(KeySegment);
+    //-- sort the relation masks (insertion sort; models have few relations)
+    KeySegment **masks = new KeySegment*[relationCount + 1];
+    for (int i = 0; i < relationCount; i++) {
+        KeySegment *mask = relations[i]->getMask();
+        int j = i;
+        while (j > 0 && memcmp(masks[j - 1], mask, keybytes) > 0) {
+            masks[j] = masks[j - 1];
+            j--;
         }
+        masks[j] = mask;
     }
-    return false;
+    signature = (KeySegment *) allocate((relationCount * keysize + 1) * sizeof(KeySegment));
+    for (int i = 0; i < relationCount; i++) {
+        memcpy(signature + i * keysize, masks[i], keybytes);
+    }
+    delete[] masks;
+    //-- FNV-1a over the signature, or over the union of the masks for state-based models
+    bool stateBased = isStateBased();
+    int hashCount = stateBased ? keysize : relationCount * keysize;
+    signatureHash = 0xcbf29ce484222325ULL;
+    for (int k = 0; k < hashCount; k++) {
+        KeySegment segment = signature[k];
+        if (stateBased) {
+            for (int i = 1; i < relationCount; i++)
+                segment |= signature[i * keysize + k];
+        }
+        signatureHash ^= segment;
+        signatureHash *= 0x100000001b3ULL;
+    }
+    if (stateBased) {
+        //-- every state-based model covers all the variables, so the union alone tells
+        //-- them apart hardly at all. Equivalent models share the span of the rows of
+        //-- their structure matrices, so that is hashed too.
+        bool hadRank = structRank != NULL;
+        SparseRank *rank = getStructRank();
+        signatureHash ^= rank->getSpanHash();
+        signatureHash *= 0x100000001b3ULL;
+        if (!hadRank)
+            deleteStructRank();
+    }
+}
+
+void Model::deleteSignature() {
+    if (signature) {
+        release(signature);
+        signature = NULL;
+    }
+}
+
+const KeySegment *Model::getSignature() {
+    if (signature == NULL) {
+        makeSignature();
+    }
+    return signature;
+}
+
+unsigned long long Model::getSignatureHash() {
+    getSignature();
+    return signatureHash;
+}
+
+bool Model::sameSignature(Model *other) {
+    if (relationCount != other->relationCount) {
+        return false;
+    }
+    if (getSignatureHash() != other->getSignatureHash()) {
+        return false;
+    }
+    int keysize = relationCount > 0 ? relations[0]->getKeySize() : 0;
+    return memcmp(getSignature(), other->getSignature(), relationCount * keysize * sizeof(KeySegment)) == 0;
+}
+
+unsigned long long Model::getCacheHash() {
+    if (isStateBased())
+        return cacheHashName(getPrintName());
+    return getSignatureHash();
+}
+
+bool Model::sameCacheKey(Model *other) {
+    if (isStateBased() || other->isStateBased())
+        return strcmp(getPrintName(), other->getPrintName()) == 0;
+    return sameSignature(other);
 }
 
 int Model::getRelationCount() {
@@ -481,7 +635,7 @@ const char * Model::getPrintName(int useInverse) {
             len += 3 + 1;
         else if (useIVI == 1)
             len += notUsingIVI;
-        char *tempName = new char[len + 1];
+        char *tempName = (char *) allocate(len + 1);
         char *cp = tempName;
         *cp = '\0';
 
@@ -535,6 +689,16 @@ void Model::printStructMatrix() {
 int **Model::getStructMatrix(int *statespace, int *totalConst) {
     if (structMatrix == NULL) {
         this->completeSbModel();
+        makeStructMatrix(getRelation(0)->getVariableList());
+        //-- the dense matrix is only made on request, for display
+        structMatrix = new int *[totalConstraints];
+        for (long i = 0; i < totalConstraints; i++) {
+            structMatrix[i] = new int[stateSpaceSize];
+            memset(structMatrix[i], 0, stateSpaceSize * sizeof(int));
+            for (int index : structRows[i])
+                structMatrix[i][index] = 1;
+        }
+        std::vector<std::vector<int> >().swap(structRows);
     }
     *statespace = stateSpaceSize;
     *totalConst = totalConstraints;
@@ -129,6 +129,8 @@ static void setStandardOptions(Options *opts) {
     opts->addOptionValue(def, "lr", "Chi-squared likelihood ratio");
     def = opts->addOptionName("optimize-search-width", "w", "Max models to keep at each level");
     opts->addOptionValue(def, "#", "");
+    def = opts->addOptionName("search-workers", "", "Threads used to evaluate the models of a search level");
+    opts->addOptionValue(def, "#", "");
     def = opts->addOptionName("reference-model", "f",
             "Specify reference model (default undirected=top, directed=bottom)");
     opts->addOptionValue(def, "top", "reference is saturated model");
@@ -149,6 +151,9 @@ static void setStandardOptions(Options *opts) {
     def = opts->addOptionName("zero-value", "", "Set replacment value for zero tuples");
     opts->addOptionValue(def, "#", "");
     def = opts->addOptionName("dump-data", "", "Dump loaded data");
+    def = opts->addOptionName("read-stats", "", "Print the number of data rows read, and the read rate");
+    def = opts->addOptionName("data-cache", "", "Binary cache of the parsed data; used if it matches the data file, else rewritten");
+    opts->addOptionValue(def, "$", "");
     def = opts->addOptionName("palpha", "p", "Set alpha for power computation");
     opts->addOptionValue(def, "#", "");
     def = opts->addOptionName("limit", "l", "Show only COUNT best reports");
@@ -177,6 +182,12 @@ static void setStandardOptions(Options *opts) {
     def = opts->addOptionName("no-parse", "", "Assume the input is pure data");
     def = opts->addOptionName("verbose", "v", "Print variable and interaction lists");
     def = opts->addOptionName("re-bin", "B", "Re-binning of data required");
+    def = opts->addOptionName("no-table-index", "", "Use binary search instead of hash index for table lookups");
+    def = opts->addOptionName("ipf-warm-start", "", "Start IPF for a model with loops from its progenitor's fit");
+    def = opts->addOptionName("dense-cells", "", "Fit by IPF over a dense array when the state space has at most this many cells, mostly nonzero (0 = never)");
+    opts->addOptionValue(def, "#", "");
+    def = opts->addOptionName("table-memory", "", "Megabytes of relation projections to keep; least recently used are dropped (0 = no limit)");
+    opts->addOptionValue(def, "#", "");
 
     //-- default option (if no command line switch) - can also be used explicitly
     def = opts->defaultOptDef = opts->addOptionName("datafile", "", "Specify data file");
@@ -432,7 +443,8 @@ bool Options::setOptionString(ocOptionDef *def, const char *value) {
         else
             val = val->next;
     }
-    if (val == NULL && toupper(value[0]) != 'Y') {
+    //-- a boolean is set as "" from the command line, and "Y" from a datafile
+    if (val == NULL && def->values != NULL && toupper(value[0]) != 'Y') {
         //-- no match on option value, and it's not a boolean
         printf("Error, value '%s' not legal for option '%s'\n", value, def->name);
     } else {
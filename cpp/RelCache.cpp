@@ -5,6 +5,7 @@
  * distribution of this software for license terms.
  */
 
+#include "AttributeList.h"
 #include "Relation.h"
 #include "RelCache.h"
 
@@ -14,93 +15,74 @@
 #include <memory.h>
 #include <string.h>
 
-static int hashcode(const char *name, int hashsize) {
-    unsigned int key = 0;
-    for (const char *cp = name; *cp; cp++)
-        key = (key << 1) + *cp;
-    return key % hashsize;
-}
-
 RelCache::RelCache() {
-    hash = new Relation*[RELCACHE_HASHSIZE];
-    memset(hash, 0, RELCACHE_HASHSIZE * sizeof(Relation*));
+    table = new CacheTable<Relation>();
 }
 
 //-- destroy relation cache.  This also deletes all the relations held in the cache.
 RelCache::~RelCache() {
-    Relation *r1, *r2;
-    int i;
-    for (i = 0; i < RELCACHE_HASHSIZE; i++) {
-        r1 = hash[i];
-        while (r1) {
-            r2 = r1->getHashNext();
-            delete r1;
-            r1 = r2;
-        }
+    for (long i = 0; i < table->getCapacity(); i++) {
+        delete table->getSlot(i);
     }
-    delete hash;
+    delete table;
 }
 
 long RelCache::size() {
-    long size = RELCACHE_HASHSIZE * sizeof(Relation*);
-    Relation *r1;
-    int i;
-    for (i = 0; i < RELCACHE_HASHSIZE; i++) {
-        r1 = hash[i];
-        while (r1) {
-            size += r1->size();
-            r1 = r1->getHashNext();
-        }
+    long size = table->size();
+    for (long i = 0; i < table->getCapacity(); i++) {
+        Relation *rel = table->getSlot(i);
+        if (rel)
+            size += rel->size();
     }
     return size;
 }
 
+void RelCache::getSizes(long long &relations, long long &attributes) {
+    relations = table->size();
+    attributes = 0;
+    for (long i = 0; i < table->getCapacity(); i++) {
+        Relation *rel = table->getSlot(i);
+        if (rel == NULL)
+            continue;
+        relations += rel->size();
+        if (rel->getAttributeList())
+            attributes += rel->getAttributeList()->size();
+    }
+}
+
 //-- delete tables from all relations
 void RelCache::deleteTables() {
-    Relation *r1;
-    int i;
-    for (i = 0; i < RELCACHE_HASHSIZE; i++) {
-        r1 = hash[i];
-        while (r1) {
-            r1->deleteTable();
-            r1 = r1->getHashNext();
-        }
+    for (long i = 0; i < table->getCapacity(); i++) {
+        Relation *rel = table->getSlot(i);
+        if (rel)
+            rel->deleteTable();
     }
 }
 
 //-- addRelation - put a new relation in the cache. If a matching relation already
 //-- exists, an error is returned.
-// [JSF] This doesn't seem to check for matches, or return errors.
 bool RelCache::addRelation(class Relation *rel) {
-    if (findRelation(rel->getPrintName()) != NULL)
-        return false; //error; exists
-    KeySegment *mask = rel->getMask();
-    int hashindex = hashcode(rel->getPrintName(), RELCACHE_HASHSIZE);
-    rel->setHashNext(hash[hashindex]);
-    hash[hashindex] = rel;
-    return true;
+    return table->insert(rel);
 }
 
-//-- findRelation - find a relation in the cache.  Null is returned if the given
-//-- relation doesn't exist.
-class Relation *RelCache::findRelation(const char *name) {
-    int hashindex = hashcode(name, RELCACHE_HASHSIZE);
-    Relation *rp = hash[hashindex];
-    while (rp && strcmp(name, rp->getPrintName()) != 0)
-        rp = rp->getHashNext();
-    return rp; // either NULL, or the matching one
+//-- findRelation - find the relation in the cache with the same variables (and
+//-- states) as the given one.  Null is returned if there is none.
+class Relation *RelCache::findRelation(class Relation *rel) {
+    return table->find(rel);
+}
+
+void RelCache::getStats(CacheStats &stats) {
+    table->getStats(stats);
 }
 
 //-- dump - print out all relations in the cache
 void RelCache::dump() {
     printf("\nDumping RelCache:\n");
-    for (int i = 0; i < RELCACHE_HASHSIZE; i++) {
-        if (hash[i]) {
-            printf("hash chain [%d]:\n", i);
-            for (Relation *rel = hash[i]; rel; rel = rel->getHashNext()) {
-                rel->dump();
-            }
+    for (long i = 0; i < table->getCapacity(); i++) {
+        Relation *rel = table->getSlot(i);
+        if (rel) {
+            printf("slot [%ld]:\n", i);
+            rel->dump();
         }
     }
 }
-
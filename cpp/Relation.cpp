@@ -6,6 +6,7 @@
  */
 
 #include "AttributeList.h"
+#include "CacheTable.h"
 #include "Key.h"
 #include "Relation.h"
 #include "StateConstraint.h"
@@ -22,6 +23,7 @@ Relation::Relation(VariableList *list, int size, int keysz, long stateconstsz) {
     varCount = 0;
     vars = new int[size];
     table = NULL;
+    lastUse = 0;
     stateConstraints = NULL;
     states = NULL;
     if (stateconstsz >= 0) {
@@ -30,7 +32,6 @@ Relation::Relation(VariableList *list, int size, int keysz, long stateconstsz) {
         stateConstraints = new StateConstraint(keysz, stateconstsz);
     }
     mask = NULL;
-    hashNext = NULL;
     attributeList = new AttributeList(2);
     printName = NULL;
     inverseName = NULL;
@@ -50,16 +51,16 @@ Relation::~Relation() {
         delete vars;
     if (stateConstraints)
         delete stateConstraints;
-    if (table)
-        delete table;
+    delete table.load();
     if (mask)
         delete[] mask;
 }
 
 long Relation::size() {
     long size = sizeof(Relation);
-    if (table)
-        size += table->size();
+    Table *tbl = table.load();
+    if (tbl)
+        size += tbl->size();
     if (vars)
         size += maxVarCount * sizeof(int);
     return size;
@@ -218,22 +219,21 @@ double Relation::getExpansionSize() {
     return size;
 
 }
-// sets a pointer to the table in the relation object
+// sets a pointer to the table in the relation object. The store releases the table's
+// contents, so a thread that finds the pointer in getTable sees the table filled.
 void Relation::setTable(Table *tbl) {
-    table = tbl;
+    table.store(tbl, std::memory_order_release);
 }
 
 // returns a reference to the table for this relation, NULL if none computed yet.
 Table *Relation::getTable() {
-    return table;
+    return table.load(std::memory_order_acquire);
 }
 
 // deletes projection table
 void Relation::deleteTable() {
-    if (table) {
-        delete table;
-        table = NULL;
-    }
+    Table *tbl = table.exchange(NULL);
+    delete tbl;
 }
 
 // sets/gets the state constraints for the relation
@@ -316,11 +316,30 @@ KeySegment *Relation::getMask() {
     return mask;
 }
 
+unsigned long long Relation::getCacheHash() {
+    if (isStateBased())
+        return cacheHashName(getPrintName());
+    KeySegment *msk = getMask();
+    int keysize = getKeySize();
+    unsigned long long code = 0xcbf29ce484222325ULL;
+    for (int k = 0; k < keysize; k++) {
+        code ^= msk[k];
+        code *= 0x100000001b3ULL;
+    }
+    return code;
+}
+
+bool Relation::sameCacheKey(Relation *other) {
+    if (isStateBased() || other->isStateBased())
+        return strcmp(getPrintName(), other->getPrintName()) == 0;
+    return memcmp(getMask(), other->getMask(), getKeySize() * sizeof(KeySegment)) == 0;
+}
+
 static int sortCompare(const void *k1, const void *k2) {
     return *((int*) k1) - *((int*) k2);
 }
 
-static int *sorting_vars;
+static thread_local int *sorting_vars;
 //static int sbSortCompare(void *thunk, const void *k1, const void *k2) {
 static int sbSortCompare(const void *k1, const void *k2) {
     //int* vars = (int *) thunk;
@@ -369,6 +388,14 @@ double Relation::getAttribute(const char *name) {
     return attributeList->getAttribute(name);
 }
 
+void Relation::setAttribute(int id, double value) {
+    attributeList->setAttribute(id, value);
+}
+
+double Relation::getAttribute(int id) {
+    return attributeList->getAttribute(id);
+}
+
 const char* Relation::getPrintName(int useInverse) {
     if (useInverse == 0 || states != NULL) {
         if (printName == NULL) {
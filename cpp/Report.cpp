@@ -7,6 +7,7 @@
 
 #include <math.h>
 #include "attrDescs.h"
+#include "AttributeList.h"
 #include "_Core.h"
 #include "Report.h"
 #include "ManagerBase.h"
@@ -24,8 +25,8 @@ int Report::maxNameLength;
 
 Report::Report(class ManagerBase *mgr) {
     manager = mgr;
-    extern int searchDir;
-    searchDir = -1;
+    extern thread_local Direction searchDir;
+    searchDir = Direction::Ascending;
     maxModelCount = 10;
     models = new Model*[maxModelCount];
     memset(models, 0, maxModelCount * sizeof(Model*));
@@ -96,19 +97,19 @@ void Report::setAttributes(const char *attrlist) {
 }
 
 void Report::sort(const char *attr, Direction dir) {
-    extern const char *sortAttr;
-    extern Direction sortDir;
-    extern Direction searchDir;
-    sortAttr = attr;
+    extern thread_local int sortAttrID;
+    extern thread_local Direction sortDir;
+    extern thread_local Direction searchDir;
+    sortAttrID = AttributeList::findAttributeID(attr);
     sortDir = dir;
     searchDir = manager->getSearchDirection();
     qsort(models, modelCount, sizeof(Model*), sortCompare);
 }
 
 void Report::sort(class Model** models, long modelCount, const char *attr, Direction dir) {
-    extern const char *sortAttr;
-    extern Direction sortDir;
-    sortAttr = attr;
+    extern thread_local int sortAttrID;
+    extern thread_local Direction sortDir;
+    sortAttrID = AttributeList::findAttributeID(attr);
     sortDir = dir;
     qsort(models, modelCount, sizeof(Model*), sortCompare);
 }
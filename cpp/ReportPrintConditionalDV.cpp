@@ -68,7 +68,7 @@ void Report::printConditional_DV(FILE *fd, Model *model, Relation *rel, bool cal
         iv_rel = predRelWithDV;
     } else {        // Else, if we are working with a relation, make projections of the input and test tables.
         if (rel->isStateBased()) {
-            relModel = new Model(3);            // make a model of IV and the relation and the DV
+            relModel = new Model(3, manager->getModelArena());            // make a model of IV and the relation and the DV
             relModel->addRelation(manager->getIndRelation());
             relModel->addRelation(rel);
             relModel->addRelation(manager->getDepRelation());
@@ -90,6 +90,7 @@ void Report::printConditional_DV(FILE *fd, Model *model, Relation *rel, bool cal
                 manager->makeProjection(test_data, test_table, predRelWithDV);
             iv_rel = predRelWithDV;
         } else {
+            manager->makeProjection(rel);
             fit_table = rel->getTable();
             manager->makeProjection(input_data, input_table, rel);
             if (test_sample_size > 0.0)
@@ -878,12 +879,7 @@ void Report::printConditional_DV(FILE *fd, Model *model, Relation *rel, bool cal
         key_order[i] = i;
     
     
-    sort_var_list = var_list;
-    sort_count = iv_count;
-    sort_vars = ind_vars;
-    sort_keys = fit_key;
-    
-    qsort(key_order, iv_statespace, sizeof(int), sortKeys);
+    orderKeys(key_order, iv_statespace, var_list, iv_count, ind_vars, fit_key, nullptr);
 
     // Prep for P-MARGIN, P-RULE
     // Make table containing univorm distribution of DV cardinality
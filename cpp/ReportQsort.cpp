@@ -5,23 +5,20 @@
  * distribution of this software for license terms.
  */
 
+#include "AttributeList.h"
 #include "Key.h"
 #include "Model.h"
 #include <cctype>
 #include <cstring>
 //-- support routines for quicksort. The static variables
-//-- are used to communicate between the sort and compare routines
+//-- are used to communicate between the sort and compare routines.
+//-- They are thread-local, so separate threads can sort at the same time.
 // The "levelPref" variable is used to sub-sort during a search,
 // preferring to keep the models sorted in the order of the search.
 
-VariableList *sort_var_list;
-int sort_count;
-int *sort_vars;
-KeySegment **sort_keys;
-Table *sort_table;
-const char *sortAttr;
-Direction sortDir;
-Direction searchDir;
+thread_local int sortAttrID;
+thread_local Direction sortDir;
+thread_local Direction searchDir;
 
 
 int allNumeric(const char* s) {
@@ -43,48 +40,93 @@ int strcmpAccountingForNumbers(const char* s1, const char* s2) {
 int sortCompare(const void *k1, const void *k2) {
     Model *m1 = *((Model**) k1);
     Model *m2 = *((Model**) k2);
-    double a1 = m1->getAttribute(sortAttr);
-    double a2 = m2->getAttribute(sortAttr);
-    double l1 = m1->getAttribute("Level");
-    double l2 = m2->getAttribute("Level");
+    static const int levelID = AttributeList::getAttributeID(ATTRIBUTE_LEVEL);
+    double a1 = m1->getAttribute(sortAttrID);
+    double a2 = m2->getAttribute(sortAttrID);
+    double l1 = m1->getAttribute(levelID);
+    double l2 = m2->getAttribute(levelID);
     int levelPref = 0;
     if      (searchDir == Direction::Ascending)  { levelPref = (l1 > l2) ? -1 : (l1 < l2) ? 1 : 0; } 
     else if (searchDir == Direction::Descending) { levelPref = (l1 < l2) ? -1 : (l1 > l2) ? 1 : 0; }
     if (sortDir == Direction::Descending) { return (a1 > a2) ? -1 : (a1 < a2) ? 1 : levelPref; }
     else                       { return (a1 < a2) ? -1 : (a1 > a2) ? 1 : levelPref; }
 }
-int sortKeys(const void *d1, const void *d2) {
-    int keysize = sort_var_list->getKeySize();
-    KeySegment *k1, *k2;
-    if (sort_keys == NULL) {
-        k1 = sort_table->getKey((long long)*(int*) d1);
-        k2 = sort_table->getKey((long long)*(int*) d2);
-    } else {
-        k1 = sort_keys[*(int*) d1];
-        k2 = sort_keys[*(int*) d2];
-    }
-    const char *s1, *s2;
-    int test;
-    int v;
+//-- the display ranks of one key each, for orderKeys. Keys whose ranks fit in 64 bits
+//-- are packed into a single number; otherwise each has an array of ranks.
+struct PackedRank {
+    unsigned long long rank;
+    int index;
+};
+
+static int comparePackedRanks(const void *r1, const void *r2) {
+    const PackedRank *p1 = (const PackedRank*) r1;
+    const PackedRank *p2 = (const PackedRank*) r2;
+    if (p1->rank != p2->rank)
+        return (p1->rank < p2->rank) ? -1 : 1;
+    return p1->index - p2->index;
+}
+
+static thread_local int *sort_ranks;
+static thread_local int sort_count;
+
+static int compareRanks(const void *d1, const void *d2) {
+    int i1 = *(const int*) d1;
+    int i2 = *(const int*) d2;
+    const int *r1 = sort_ranks + (long long) i1 * sort_count;
+    const int *r2 = sort_ranks + (long long) i2 * sort_count;
     for (int j = 0; j < sort_count; j++) {
-        if (sort_vars == NULL) {
-            v = j;
-        } else {
-            v = sort_vars[j];
+        if (r1[j] != r2[j])
+            return r1[j] - r2[j];
+    }
+    return i1 - i2;
+}
+
+void orderKeys(int *order, long long count, VariableList *vars, int varCount, int *varIndices,
+        KeySegment **keys, Table *table) {
+    int keysize = vars->getKeySize();
+    const int **ranks = new const int*[varCount + 1];
+    int *varList = new int[varCount + 1];
+    int bits = 0;
+    for (int j = 0; j < varCount; j++) {
+        varList[j] = (varIndices == NULL) ? j : varIndices[j];
+        ranks[j] = vars->getDisplayRanks(varList[j]);
+        bits += vars->getVariable(varList[j])->size;
+    }
+    //-- ties are broken by position, so the order is the same as a stable sort
+    if (bits <= 64) {
+        PackedRank *packed = new PackedRank[count];
+        for (long long i = 0; i < count; i++) {
+            KeySegment *key = (keys == NULL) ? table->getKey(order[i]) : keys[order[i]];
+            unsigned long long rank = 0;
+            for (int j = 0; j < varCount; j++) {
+                int v = varList[j];
+                rank = (rank << vars->getVariable(v)->size) | ranks[j][Key::getKeyValue(key, keysize, vars, v)];
+            }
+            packed[i].rank = rank;
+            packed[i].index = order[i];
         }
-        s1 = sort_var_list->getVarValue(v, Key::getKeyValue(k1, keysize, sort_var_list, v));
-        s2 = sort_var_list->getVarValue(v, Key::getKeyValue(k2, keysize, sort_var_list, v));
-        test = strcmpAccountingForNumbers(s1, s2);
-        if (test != 0) {
-            return test;
+        qsort(packed, count, sizeof(PackedRank), comparePackedRanks);
+        for (long long i = 0; i < count; i++)
+            order[i] = packed[i].index;
+        delete[] packed;
+    } else {
+        //-- the rank arrays are indexed by the original order entries, which are 0..count-1
+        int *rowRanks = new int[count * varCount];
+        for (long long i = 0; i < count; i++) {
+            KeySegment *key = (keys == NULL) ? table->getKey(i) : keys[i];
+            for (int j = 0; j < varCount; j++)
+                rowRanks[i * varCount + j] = ranks[j][Key::getKeyValue(key, keysize, vars, varList[j])];
         }
+        sort_ranks = rowRanks;
+        sort_count = varCount;
+        qsort(order, count, sizeof(int), compareRanks);
+        delete[] rowRanks;
     }
-    return 0;
+    delete[] varList;
+    delete[] ranks;
 }
 
 
-
-
 void orderIndices(const char **stringArray, int len, int *order) {
     // Find the last value in the order list, to initialize the other searches with
     int last = 0;
@@ -101,7 +101,7 @@ void SBMManager::verifyStateBasedNaming() {
 }
 
 void SBMManager::makeReferenceModels(Relation *top) {
-    Model *model = new Model(1);
+    Model *model = new Model(1, modelArena);
     model->addRelation(top, false);
     model->completeSbModel();
     topRef = model;
@@ -116,7 +116,7 @@ void SBMManager::makeReferenceModels(Relation *top) {
     int i;
     if (varList->isDirected()) {
         //-- first, make a relation with all the independent variables
-        model = new Model(2); // typical case: one dep variable
+        model = new Model(2, modelArena); // typical case: one dep variable
         int pos = 0;
         Variable *var;
         for (i = 0; i < varCount; i++) {
@@ -142,7 +142,7 @@ void SBMManager::makeReferenceModels(Relation *top) {
     } else {
         //this needs to change since in SB the bottom reference is uniform model and
         //not independence model
-        model = new Model(varCount);
+        model = new Model(varCount, modelArena);
         int *state = new int[1];
         state[0] = DONT_CARE;
         for (i = 0; i < varCount; i++) {
@@ -178,7 +178,7 @@ void SBMManager::makeReferenceModels(Relation *top) {
     }
     bottomRef = model;
     if (!modelCache->addModel(bottomRef)) {
-        Model *cached_model = modelCache->findModel(bottomRef->getPrintName());
+        Model *cached_model = modelCache->findModel(bottomRef);
         delete bottomRef;
         bottomRef = cached_model;
     }
@@ -357,12 +357,14 @@ void SBMManager::computePearsonStatistics(Model *model) {
         return;
     makeFitTable(model);
 
-    Table *modelFitTable = new Table(keysize, fitTable1->getTupleCount());
+    Table *fitTable = getFitTable();
+    Table *modelFitTable = new Table(keysize, fitTable->getTupleCount());
 
-    modelFitTable->copy(fitTable1);
+    modelFitTable->copy(fitTable);
     makeFitTable(bottomRef);
+    fitTable = getFitTable();
     double modelP2 = ocPearsonChiSquared(inputData, modelFitTable, (long) round(sampleSize));
-    double refP2 = ocPearsonChiSquared(inputData, fitTable1, (long) round(sampleSize));
+    double refP2 = ocPearsonChiSquared(inputData, fitTable, (long) round(sampleSize));
 
     int errcode;
     double modelDF = computeDfSb(model);
@@ -458,27 +460,29 @@ void SBMManager::computeBPStatistics(Model *model) {
             }
 
             void process(bool sign, Relation *rel, int count) {
-                for (int counter = 0; counter < count; counter++) {
-                    KeySegment *key = new KeySegment[keysize];
-                    double qi, q;
-                    //-- get the orthogonal dimension of the relation (the number of states
-                    //-- projected into one substate)
-                    long relDimension = fullDimension / ((long) ocDegreesOfFreedom(rel) + 1);
-                    //-- add the scaled contribution to each q
-                    for (int i = 0; i < qData->getTupleCount(); i++) {
-                        qData->copyKey(i, key);
+                KeySegment key[keysize];
+                double qi, q;
+                //-- get the orthogonal dimension of the relation (the number of states
+                //-- projected into one substate)
+                long relDimension = fullDimension / ((long) ocDegreesOfFreedom(rel) + 1);
+                KeySegment *mask = rel->getMask();
+                //-- add the scaled contribution to each q, once for each time the term
+                //-- occurs. The tuple is looked up once, but the additions are made one
+                //-- at a time.
+                for (int i = 0; i < qData->getTupleCount(); i++) {
+                    qData->copyKey(i, key);
+                    for (int k = 0; k < keysize; k++)
+                        key[k] |= mask[k];
+                    int j = rel->getTable()->indexOf(key);
+                    if (j >= 0) {
                         q = qData->getValue(i);
-                        KeySegment *mask = rel->getMask();
-                        for (int k = 0; k < keysize; k++)
-                            key[k] |= mask[k];
-                        int j = rel->getTable()->indexOf(key);
-                        if (j >= 0) {
-                            qi = (sign ? 1 : -1) * (rel->getTable()->getValue(j) / relDimension);
-                            qData->setValue(i, qi + q);
-                        }
+                        qi = (sign ? 1 : -1) * (rel->getTable()->getValue(j) / relDimension);
+                        for (int counter = 0; counter < count; counter++)
+                            q = qi + q;
+                        qData->setValue(i, q);
                     }
-                    originTerms += (sign ? 1 : -1);
                 }
+                originTerms += (sign ? 1 : -1) * count;
             }
 
             double getTransmission() {
@@ -516,15 +520,9 @@ void SBMManager::computeBPStatistics(Model *model) {
 
     long fullDimension = (long) ocDegreesOfFreedom(topRef->getRelation(0)) + 1;
 
+    //-- the projections may have been evicted from the cache, so make sure they exist
+    makeProjections(model);
     BPIntersectProcessor processor(inputData, model->getRelationCount(), fullDimension);
-    if (intersectArray != NULL) {
-        delete[] intersectArray;
-        intersectCount = 0;
-        intersectMax = model->getRelationCount();
-        ;
-        intersectArray = NULL;
-    }
-
     doIntersectionProcessing(model, &processor);
     double t = processor.getTransmission();
     model->setAttribute(ATTRIBUTE_BP_T, t);
@@ -543,7 +541,7 @@ void SBMManager::computePercentCorrect(Model *model) {
         printf("ERROR: Failed to create state-based fit table. Terminating.\n");
         exit(1);
     }
-    Table *modelTable = fitTable1;
+    Table *modelTable = getFitTable();
     Table *maxTable = new Table(modelTable->getKeySize(), modelTable->getTupleCount());
 
     int maxCount = varList->getVarCount();
@@ -5,7 +5,6 @@
  * distribution of this software for license terms.
  */
 
-#include "unistd.h"
 #include <math.h>
 #include <stdlib.h>
 #include <stdio.h>
@@ -285,13 +284,13 @@ void SearchFullUp::makeCandidate(SearchStackEntry *stack, int top, Model *start)
     }
     Relation::sort(vars, varcount);
     Relation *rel = manager->getRelation(vars, varcount, true);
-    Model *newModel = new Model(start->getRelationCount() + 1);
+    Model *newModel = new Model(start->getRelationCount() + 1, manager->getModelArena());
     newModel->copyRelations(*start);
     newModel->addRelation(rel, true);
     ModelCache *cache = manager->getModelCache();
     if (!cache->addModel(newModel)) {
         //-- already exists in cache; return that one
-        Model *cachedModel = cache->findModel(newModel->getPrintName());
+        Model *cachedModel = cache->findModel(newModel);
         delete newModel;
         newModel = cachedModel;
         //-- since all models come from the cache, we can do pointer compares to see if
@@ -382,7 +381,7 @@ void SearchSbFullUp::recurseDirected(Model *start, int cur_var, int cur_index, i
             for (int i = 0; i < start->getRelationCount(); i++)
                 if (start->getRelation(i) == new_relation)
                     return;
-            Model *model = new Model(start->getRelationCount() + 1);
+            Model *model = new Model(start->getRelationCount() + 1, manager->getModelArena());
             model->copyRelations(*start);
             model->addRelation(new_relation, true, manager->getModelCache()); // may not need to normalize here, or if so, may need to check if it did anything
             if (model->getRelationCount() > start->getRelationCount()) {
@@ -412,7 +411,7 @@ bool SearchSbFullUp::addToCache(Model *model, int &models_found, Model **model_l
     ModelCache* cache = manager->getModelCache();
     // put the model in the cache, or use the cached one if already there
     if (!cache->addModel(model)) {
-        Model *cached_model = cache->findModel(model->getPrintName());
+        Model *cached_model = cache->findModel(model);
         delete model;
         model = cached_model;
     }
@@ -569,13 +568,13 @@ Model **SearchLooplessDown::search(Model *start) {
             // create a child relation minus that IV
             newRel = manager->getChildRelation(rel, indices[i]);
             // create a model with the IV-only relation, and the new relation
-            model = new Model(2);
+            model = new Model(2, manager->getModelArena());
             model->addRelation(ivRel);
             model->addRelation(newRel);
             // put in cache, or use the cached one if already there
             ModelCache *cache = manager->getModelCache();
             if (!cache->addModel(model)) {
-                Model *cachedModel = cache->findModel(model->getPrintName());
+                Model *cachedModel = cache->findModel(model);
                 delete model;
                 model = cachedModel;
             }
@@ -615,7 +614,7 @@ Model **SearchLooplessDown::search(Model *start) {
                 }
                 //-- did we get a hit? If so, construct the child model
                 if (includeCount == 1) {
-                    model = new Model(relCount + 1);
+                    model = new Model(relCount + 1, manager->getModelArena());
                     model->copyRelations(*start, includeID);
                     rel = start->getRelation(includeID);
                     model->addRelation(manager->getChildRelation(rel, i));
@@ -624,7 +623,7 @@ Model **SearchLooplessDown::search(Model *start) {
                     //-- put in cache, or use the cached one if already there
                     ModelCache *cache = manager->getModelCache();
                     if (!cache->addModel(model)) {
-                        Model *cachedModel = cache->findModel(model->getPrintName());
+                        Model *cachedModel = cache->findModel(model);
                         delete model;
                         model = cachedModel;
                     }
@@ -642,7 +641,7 @@ void SearchSbLooplessUp::recurseDirected(int cur_var, int cur_index, int *var_in
     VariableList *var_list = manager->getVariableList();
     if (cur_var >= var_list->getVarCount()) {
         if (cur_index >= 2) { // make sure enough variables have been added
-            Model *model = new Model(3);
+            Model *model = new Model(3, manager->getModelArena());
             model->addRelation(manager->getIndRelation(), false);
             model->addRelation(manager->getDepRelation(), false);
             Relation *new_relation = manager->getRelation(var_indices, cur_index, true, state_indices);
@@ -670,7 +669,7 @@ bool SearchSbLooplessUp::addToCache(Model *model, int &models_found, Model **mod
     Model* cached_model = NULL;
     // put the model in the cache, or use the cached one if already there
     if (!cache->addModel(model)) {
-        Model *cached_model = cache->findModel(model->getPrintName());
+        Model *cached_model = cache->findModel(model);
         delete model;
         model = cached_model;
     }
@@ -798,7 +797,7 @@ Model **SearchSbLooplessUp::search(Model *start) {
                     if (new_relation == manager->getTopRefModel()->getRelation(0))
                         break;
                     new_rel_count++;
-                    model = new Model(3);
+                    model = new Model(3, manager->getModelArena());
                     model->addRelation(manager->getIndRelation(), false);
                     model->addRelation(manager->getDepRelation(), false);
                     model->addRelation(new_relation, false, manager->getModelCache());
@@ -820,7 +819,7 @@ Model **SearchSbLooplessUp::search(Model *start) {
                 if (new_relation == manager->getTopRefModel()->getRelation(0))
                     break;
                 new_rel_count++;
-                model = new Model(3);
+                model = new Model(3, manager->getModelArena());
                 model->addRelation(manager->getIndRelation(), false);
                 model->addRelation(manager->getDepRelation(), false);
                 model->addRelation(new_relation, false, manager->getModelCache());
@@ -829,7 +828,7 @@ Model **SearchSbLooplessUp::search(Model *start) {
             // If the relation has all of the variables possible, and no new relations are found, then
             // the next step is the top model.
             if (rel_var_count == manager->getVariableList()->getVarCount() && new_rel_count == 0) {
-                model = new Model(1);
+                model = new Model(1, manager->getModelArena());
                 model->addRelation(manager->getTopRefModel()->getRelation(0), false);
                 addToCache(model, models_found, model_list);
             }
@@ -907,14 +906,14 @@ Model **SearchLooplessUp::search(Model *start) {
                                         newRelVarCount++;
                                     }
                                 }
-                                model = new Model(relcount+1);
+                                model = new Model(relcount+1, manager->getModelArena());
                                 model->copyRelations(*start);
                                 newRel = manager->getRelation(newRelVars, newRelVarCount, true);
                                 model->addRelation(newRel, true);
                                 // put the model in the cache, or use the cached one if already there
                                 ModelCache *cache = manager->getModelCache();
                                 if (!cache->addModel(model)) {
-                                    cachedModel = cache->findModel(model->getPrintName());
+                                    cachedModel = cache->findModel(model);
                                     delete model;
                                     model = cachedModel;
                                 }
@@ -974,7 +973,7 @@ Model **SearchLooplessUp::search(Model *start) {
                 continue;
             Relation *rel = start->getRelation(r);
             if (-1 == rel->findVariable(i)) {
-                model = new Model(relcount + 1);
+                model = new Model(relcount + 1, manager->getModelArena());
                 model->copyRelations(*start, r);
                 int relvarcount = rel->getVariableCount();
                 int *relvars = new int[relvarcount + 1];
@@ -985,7 +984,7 @@ Model **SearchLooplessUp::search(Model *start) {
                 //-- put in cache, or use the cached one if already there
                 ModelCache *cache = manager->getModelCache();
                 if (!cache->addModel(model)) {
-                    Model *cachedModel = cache->findModel(model->getPrintName());
+                    Model *cachedModel = cache->findModel(model);
                     delete model;
                     model = cachedModel;
                 }
@@ -1070,7 +1069,7 @@ Model **SearchDisjointUp::search(Model *start) {
                 }
             }
             if (!varfound) {
-                model = new Model(relcount + 1);
+                model = new Model(relcount + 1, manager->getModelArena());
                 model->copyRelations(*start);
                 int *relvars = new int[2];
                 relvars[0] = i;
@@ -1080,7 +1079,7 @@ Model **SearchDisjointUp::search(Model *start) {
                 //-- put in cache, or use the cached one if already there
                 ModelCache *cache = manager->getModelCache();
                 if (!cache->addModel(model)) {
-                    Model *cachedModel = cache->findModel(model->getPrintName());
+                    Model *cachedModel = cache->findModel(model);
                     delete model;
                     model = cachedModel;
                 }
@@ -1098,7 +1097,7 @@ Model **SearchDisjointUp::search(Model *start) {
         for (r2 = r + 1; r2 < relcount; r2++) {
             if (r2 == indOnlyRel)
                 continue;
-            model = new Model(relcount + 1);
+            model = new Model(relcount + 1, manager->getModelArena());
             model->copyRelations(*start, r, r2);
             rel = start->getRelation(r);
             rel2 = start->getRelation(r2);
@@ -1116,7 +1115,7 @@ Model **SearchDisjointUp::search(Model *start) {
             //-- put in cache, or use the cached one if already there
             ModelCache *cache = manager->getModelCache();
             if (!cache->addModel(model)) {
-                Model *cachedModel = cache->findModel(model->getPrintName());
+                Model *cachedModel = cache->findModel(model);
                 delete model;
                 model = cachedModel;
             }
@@ -1180,7 +1179,7 @@ bool SearchChain::makeChainModels() {
             relCount++;
             relVarCount++;
         }
-        Model *model = new Model(relCount);
+        Model *model = new Model(relCount, manager->getModelArena());
         if (isDirected)
             model->addRelation(indOnlyRel, false);
         for (int i = 0; i < indVarCount - 1; i++) {
@@ -1194,12 +1193,8 @@ bool SearchChain::makeChainModels() {
 
         //-- put in cache, or use the cached one if already there
         ModelCache *cache = manager->getModelCache();
-        static char *oldBrk = 0;
-        if (oldBrk == 0)
-            oldBrk = (char*) sbrk(0);
-        double used = ((char*) sbrk(0)) - oldBrk;
         if (!cache->addModel(model)) {
-            Model *cachedModel = cache->findModel(model->getPrintName());
+            Model *cachedModel = cache->findModel(model);
             delete model;
             model = cachedModel;
         }
@@ -1321,13 +1316,13 @@ Model **SearchDisjointDown::search(Model *start) {
          // create a child relation minus that IV
          newRel = manager->getChildRelation(rel, indices[i]);
          // create a model with the IV-only relation, and the new relation
-         model = new Model(2);
+         model = new Model(2, manager->getModelArena());
          model->addRelation(ivRel);
          model->addRelation(newRel);
          // put in cache, or use the cached one if already there
          ModelCache *cache = manager->getModelCache();
          if (!cache->addModel(model)) {
-         Model *cachedModel = cache->findModel(model->getPrintName());
+         Model *cachedModel = cache->findModel(model);
          delete model;
          model = cachedModel;
          }
@@ -1350,7 +1345,7 @@ Model **SearchDisjointDown::search(Model *start) {
                 rel->copyVariables(varList, relvarcnt, -1);
                 for (int vi = 0; vi < relvarcnt; vi++) {
 
-                    Model* m = new Model(relCount + 1);
+                    Model* m = new Model(relCount + 1, manager->getModelArena());
                     //first copy all the relations except for the ri
                     for (int rii = 0; rii < relCount; rii++) {
                         if (rii != ri) {
@@ -1367,7 +1362,7 @@ Model **SearchDisjointDown::search(Model *start) {
                     // add the model if it is not in the cache
                     ModelCache *cache = manager->getModelCache();
                     if (!cache->addModel(m)) {
-                        Model *cachedModel = cache->findModel(m->getPrintName());
+                        Model *cachedModel = cache->findModel(m);
                         delete m;
                         m = cachedModel;
                     }
@@ -1380,7 +1375,7 @@ Model **SearchDisjointDown::search(Model *start) {
                     for (int rii = 0; rii < relCount; rii++) {
                         if (rii != ri) {
                             //cout << "vi: " << vi << " ri:"<<ri << " rii:"<< rii<<endl;
-                            Model* m1 = new Model(relCount);
+                            Model* m1 = new Model(relCount, manager->getModelArena());
                             Relation* crel1 = manager->getChildRelation(rel, varList[vi]);
                             Relation* nrel1 = start->getRelation(rii);
                             int vnum = nrel1->getVariableCount() + 1;
@@ -1411,7 +1406,7 @@ Model **SearchDisjointDown::search(Model *start) {
                             ModelCache *cache = manager->getModelCache();
                             if (!cache->addModel(m1)) {
 
-                                Model *cachedModel = cache->findModel(m1->getPrintName());
+                                Model *cachedModel = cache->findModel(m1);
                                 delete m1;
                                 m1 = cachedModel;
                             }
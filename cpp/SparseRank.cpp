@@ -0,0 +1,160 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#include "SparseRank.h"
+#include <algorithm>
+#include <cstddef>
+
+/**
+ * SparseRank.cpp - a new row is reduced by the basis row with its leading column, for as
+ * long as there is one; if the row doesn't vanish, it joins the basis under the leading
+ * column it ends up with. Only the leading column is cleared, so basis rows stay sparse.
+ * Each row is reduced by both bases; a row that vanishes modulo one prime but not the
+ * other is independent of the rows before it, since a dependence with integer
+ * coefficients would hold modulo both.
+ */
+
+//-- both primes are 2^61 - c, for a small c
+static const unsigned long long PRIME = (1ULL << 61) - 1;
+static const unsigned long long CHECK_PRIME = (1ULL << 61) - 31;
+
+static unsigned long long mulMod(unsigned long long a, unsigned long long b, unsigned long long prime = PRIME) {
+    //-- 2^61 = c modulo the prime, so the bits above 61 fold onto the low ones, times c
+    unsigned long long c = (1ULL << 61) - prime;
+    unsigned __int128 product = (unsigned __int128) a * b;
+    product = (product & PRIME) + (product >> 61) * c;
+    product = (product & PRIME) + (product >> 61) * c;
+    unsigned long long sum = (unsigned long long) product;
+    return sum >= prime ? sum - prime : sum;
+}
+
+static unsigned long long invMod(unsigned long long a, unsigned long long prime) {
+    //-- a^(p-2), by Fermat
+    unsigned long long result = 1, power = a;
+    for (unsigned long long e = prime - 2; e > 0; e >>= 1) {
+        if (e & 1)
+            result = mulMod(result, power, prime);
+        power = mulMod(power, power, prime);
+    }
+    return result;
+}
+
+SparseRank::SparseRank() {
+    rank = 0;
+}
+
+bool SparseRank::addRow(const int *cols, int count) {
+    Row row;
+    row.reserve(count);
+    for (int i = 0; i < count; i++)
+        row.push_back(std::make_pair(cols[i], 1ULL));
+    Row check(row);
+
+    bool raised = reduce(row, pivots, PRIME);
+    if (reduce(check, checkPivots, CHECK_PRIME))
+        raised = true;
+    if (raised)
+        rank++;
+    return raised;
+}
+
+//-- reduce a row by a basis modulo a prime, and add what is left to the basis. The row
+//-- is consumed. Returns true if it didn't vanish.
+bool SparseRank::reduce(Row &row, Basis &basis, unsigned long long prime) {
+    Row reduced;
+    while (!row.empty()) {
+        auto found = basis.find(row[0].first);
+        if (found == basis.end()) {
+            unsigned long long scale = invMod(row[0].second, prime);
+            for (auto &entry : row)
+                entry.second = mulMod(entry.second, scale, prime);
+            basis[row[0].first].swap(row);
+            return true;
+        }
+        //-- row -= factor * pivot, which clears the leading column
+        const Row &pivot = found->second;
+        unsigned long long factor = row[0].second;
+        reduced.clear();
+        std::size_t i = 1, j = 1;
+        while (i < row.size() || j < pivot.size()) {
+            if (j >= pivot.size() || (i < row.size() && row[i].first < pivot[j].first)) {
+                reduced.push_back(row[i++]);
+            } else {
+                unsigned long long sub = mulMod(factor, pivot[j].second, prime);
+                if (i < row.size() && row[i].first == pivot[j].first) {
+                    unsigned long long value = row[i].second >= sub ? row[i].second - sub : row[i].second + prime - sub;
+                    if (value != 0)
+                        reduced.push_back(std::make_pair(row[i].first, value));
+                    i++;
+                } else if (sub != 0) {
+                    reduced.push_back(std::make_pair(pivot[j].first, prime - sub));
+                }
+                j++;
+            }
+        }
+        row.swap(reduced);
+    }
+    return false;
+}
+
+long SparseRank::size() {
+    long size = sizeof(SparseRank) + (pivots.bucket_count() + checkPivots.bucket_count()) * sizeof(void*);
+    for (auto &entry : pivots)
+        size += sizeof(entry) + sizeof(void*) + entry.second.capacity() * sizeof(Row::value_type);
+    for (auto &entry : checkPivots)
+        size += sizeof(entry) + sizeof(void*) + entry.second.capacity() * sizeof(Row::value_type);
+    return size;
+}
+
+//-- a fixed pseudorandom weight for each column
+static unsigned long long columnWeight(int col) {
+    unsigned long long z = (unsigned long long) col + 0x9e3779b97f4a7c15ULL;
+    z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+    return (z ^ (z >> 31)) % PRIME;
+}
+
+/**
+ * getSpanHash - the reduced echelon form isn't built, since clearing the columns above
+ * each pivot fills the rows in. Instead each of its rows is summed against fixed column
+ * weights: with the pivots taken from the last one back, the sum for a reduced row is
+ * the sum for the basis row, less the sums already found for the later pivot columns
+ * it has entries in, times those entries. The pivot columns and these sums are hashed.
+ */
+unsigned long long SparseRank::getSpanHash() {
+    std::vector<int> cols;
+    cols.reserve(pivots.size());
+    for (auto &entry : pivots)
+        cols.push_back(entry.first);
+    std::sort(cols.begin(), cols.end());
+    std::unordered_map<int, unsigned long long> sums;
+    sums.reserve(cols.size());
+    for (std::size_t k = cols.size(); k-- > 0;) {
+        const Row &row = pivots[cols[k]];
+        unsigned long long sum = 0;
+        for (std::size_t i = 0; i < row.size(); i++) {
+            unsigned long long weight = columnWeight(row[i].first);
+            if (i > 0) {
+                auto reduced = sums.find(row[i].first);
+                if (reduced != sums.end())
+                    weight = weight >= reduced->second ? weight - reduced->second : weight + PRIME - reduced->second;
+            }
+            sum += mulMod(row[i].second, weight);
+            if (sum >= PRIME)
+                sum -= PRIME;
+        }
+        sums[cols[k]] = sum;
+    }
+    unsigned long long hash = 0xcbf29ce484222325ULL;
+    for (int col : cols) {
+        hash ^= (unsigned long long) col;
+        hash *= 0x100000001b3ULL;
+        hash ^= sums[col];
+        hash *= 0x100000001b3ULL;
+    }
+    return hash;
+}
@@ -13,32 +13,67 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <algorithm>
+#include <vector>
 
 const long long GROWTH_FACTOR = 2;
 
+//-- tables smaller than this aren't worth hashing; the binary search is just as fast
+const long long INDEX_MIN_TUPLES = 16;
+
+bool Table::indexing = true;
+
 
 /*
  * Table - initialize the table. The given keysize and number of tuples are used
  * to allocate storage.  The max number of tuples can be changed after creation, but
  * the keysize cannot.
  *
- * The data storage consists of {[keyseg 0]..[keyseg n][value]}..., in a contiguous
- * array. The macros below provide indexed access to this storage. Note that in order
- * for quicksort to work, the key must be first
+ * The keys and the values are stored in two contiguous arrays: keysize segments per
+ * tuple in one, and a value per tuple in the other. The functions below provide indexed
+ * access to this storage.
  */
 
-#define TupleBytes (sizeof(ocTupleValue) + keysize * sizeof(KeySegment))
+static inline KeySegment *KeyPtr(KeySegment *keys, int keysize, long long index)
+{
+    return keys + keysize * index;
+}
+
 
+/*
+ * The key loops are templates on the number of key segments. Tables with keys of 1, 2
+ * or 4 segments get their own copies, in which the loops are unrolled, so comparing two
+ * one-segment keys is a single integer compare. Other sizes share a copy (N = 0) which
+ * loops over the runtime keysize. BY_KEYSIZE calls the copy for this table's keysize.
+ */
+#define BY_KEYSIZE(function, ...) \
+    (keysize == 1 ? function<1>(__VA_ARGS__) : keysize == 2 ? function<2>(__VA_ARGS__) \
+     : keysize == 4 ? function<4>(__VA_ARGS__) : function<0>(__VA_ARGS__))
 
-static ocTupleValue *ValuePtr(void *data, int keysize, long long index)
+template <int N>
+static inline int compareFixed(const KeySegment *key1, const KeySegment *key2, int keysize)
 {
-    return ((ocTupleValue*) ( ((char*) data) + (keysize * sizeof(KeySegment)) + TupleBytes * (index) ));
+    const int segments = N ? N : keysize;
+    for (int i = 0; i < segments; i++) {
+        if (key1[i] != key2[i]) return key1[i] < key2[i] ? -1 : 1;
+    }
+    return 0;
 }
 
 
-static KeySegment *KeyPtr(void *data, int keysize, long long index)
+/**
+ * hashKey - mix the key segments into a slot hash.
+ */
+template <int N>
+static inline unsigned long long hashKey(const KeySegment *key, int keysize)
 {
-    return ((KeySegment*) ( ((char*) data) + TupleBytes * (index) ));
+    const int segments = N ? N : keysize;
+    unsigned long long hash = 0;
+    for (int i = 0; i < segments; i++) {
+        hash = (hash ^ key[i]) * 0x9e3779b97f4a7c15ULL;
+        hash ^= hash >> 29;
+    }
+    return hash;
 }
 
 
@@ -48,31 +83,50 @@ Table::Table(int keysz, long long maxTuples, TableType typ)
     type = typ;
     maxTupleCount = maxTuples;
     tupleCount = 0;
-    data = new char[TupleBytes * maxTuples];
-    memset(data, 0, TupleBytes * maxTuples * sizeof(char));
+    hashSlots = NULL;
+    hashMask = 0;
+    indexed = false;
+    keys = new KeySegment[keysize * maxTuples];
+    memset(keys, 0, keysize * maxTuples * sizeof(KeySegment));
+    values = new ocTupleValue[maxTuples];
+    memset(values, 0, maxTuples * sizeof(ocTupleValue));
 }
 
 
 Table::~Table()
 {
-    if (data) delete [] (char*)data;
+    if (keys) delete [] keys;
+    if (values) delete [] values;
+    dropIndex();
 }
 
 
 long long Table::size()
 {
-    return TupleBytes * maxTupleCount + sizeof(Table);
+    long long size = (keysize * sizeof(KeySegment) + sizeof(ocTupleValue)) * maxTupleCount + sizeof(Table);
+    if (hashSlots) size += (hashMask + 1) * sizeof(long long);
+    return size;
+}
+
+
+/**
+ * grow - make room for more tuples, keeping the current ones.
+ */
+void Table::grow()
+{
+    keys = (KeySegment*) growStorage(keys, maxTupleCount*keysize*sizeof(KeySegment), GROWTH_FACTOR);
+    values = (ocTupleValue*) growStorage(values, maxTupleCount*sizeof(ocTupleValue), GROWTH_FACTOR);
+    maxTupleCount *= GROWTH_FACTOR;
 }
 
 
 void Table::copy(const Table* from)
 {
-    while (from->tupleCount > maxTupleCount) {
-        data = growStorage(data, maxTupleCount*TupleBytes, GROWTH_FACTOR);
-        maxTupleCount *= GROWTH_FACTOR;
-    }
-    memcpy(data, from->data, TupleBytes * maxTupleCount);
+    while (from->tupleCount > maxTupleCount) grow();
+    memcpy(keys, from->keys, from->tupleCount * keysize * sizeof(KeySegment));
+    memcpy(values, from->values, from->tupleCount * sizeof(ocTupleValue));
     tupleCount = from->tupleCount;
+    buildIndex();
 }
 
 
@@ -82,15 +136,13 @@ void Table::copy(const Table* from)
  */
 void Table::addTuple(KeySegment *key, double value)
 {
-    while (tupleCount >= maxTupleCount) {
-        data = growStorage(data, maxTupleCount*TupleBytes, GROWTH_FACTOR);
-        maxTupleCount *= GROWTH_FACTOR;
-    }
-    KeySegment *keyptr = KeyPtr(data, keysize, tupleCount);
+    dropIndex();
+    while (tupleCount >= maxTupleCount) grow();
+    KeySegment *keyptr = KeyPtr(keys, keysize, tupleCount);
     memcpy(keyptr, key, sizeof(KeySegment) * keysize);			// copy key
     //-- for set relations, only values are 1 or 0
     if (type == TableType::SetTheoretic && value != 0.0) value = 1.0;
-    *(ValuePtr(data, keysize, tupleCount)) = (ocTupleValue) value;		// copy value
+    values[tupleCount] = (ocTupleValue) value;		// copy value
     tupleCount++;
 }
 
@@ -100,23 +152,20 @@ void Table::addTuple(KeySegment *key, double value)
  */
 void Table::insertTuple(KeySegment *key, double value, long long index)
 {
-    while (tupleCount >= maxTupleCount) {
-        data = growStorage(data, maxTupleCount*TupleBytes, GROWTH_FACTOR);
-        maxTupleCount *= GROWTH_FACTOR;
-    }
+    dropIndex();
+    while (tupleCount >= maxTupleCount) grow();
     if (index < tupleCount) {
-        void* dest = KeyPtr(data, keysize, index + 1);
-        void* src = KeyPtr(data, keysize, index);
-        long size = ((char*)KeyPtr(data, keysize, tupleCount)) - ((char*)KeyPtr(data, keysize, index));
-        memmove(dest, src, size);
+        memmove(KeyPtr(keys, keysize, index + 1), KeyPtr(keys, keysize, index),
+                (tupleCount - index) * keysize * sizeof(KeySegment));
+        memmove(values + index + 1, values + index, (tupleCount - index) * sizeof(ocTupleValue));
     }
     // else?
 
-    KeySegment *keyptr = KeyPtr(data, keysize, index);
+    KeySegment *keyptr = KeyPtr(keys, keysize, index);
     memcpy(keyptr, key, sizeof(KeySegment) * keysize);	// copy key
     //-- for set relations, only values are 1 or 0
     if (type == TableType::SetTheoretic && value != 0.0) value = 1.0;
-    *(ValuePtr(data, keysize, index)) = (ocTupleValue) value;						// copy value
+    values[index] = (ocTupleValue) value;						// copy value
     tupleCount++;
 }
 
@@ -127,15 +176,16 @@ void Table::insertTuple(KeySegment *key, double value, long long index)
  */
 void Table::sumTuple(KeySegment *key, double value)
 {
-    long long index = indexOf(key, false);
+    long long index = hashSlots ? hashFind(key) : -1;
+    if (index < 0)
+        index = indexOf(key, false);
     //-- index is either the matching tuple, or the next higher one. So we have to test again.
-    if (index >= tupleCount || Key::compareKeys(KeyPtr(data, keysize, index), key, keysize) != 0) {
+    if (index >= tupleCount || BY_KEYSIZE(compareFixed, KeyPtr(keys, keysize, index), key, keysize) != 0) {
         insertTuple(key, value, index);
     } else {
-        ocTupleValue *valuep = ValuePtr(data, keysize, index);
-        value += *valuep;
+        value += values[index];
         if (type == TableType::SetTheoretic && value != 0.0) value = 1.0;
-        *valuep = (ocTupleValue) value;
+        values[index] = (ocTupleValue) value;
     }
 }
 
@@ -148,7 +198,7 @@ void Table::sumTuple(KeySegment *key, double value)
 double Table::getValue(long long index)
 {
     if (index < 0 || index >= tupleCount) return 0.0;
-    return (double) *(ValuePtr(data, keysize, index));
+    return (double) values[index];
 }
 
 
@@ -158,7 +208,7 @@ double Table::getValue(long long index)
 void Table::setValue(long long index, double value)
 {
     if ((index < 0) || (index >= tupleCount)) return;
-    else *(ValuePtr(data, keysize, index)) = (ocTupleValue) value;
+    else values[index] = (ocTupleValue) value;
 }
 
 
@@ -168,7 +218,7 @@ void Table::setValue(long long index, double value)
 KeySegment *Table::getKey(long long index)
 {
     if (index < 0 || index >= tupleCount) return 0;
-    else return KeyPtr(data, keysize, index);
+    else return KeyPtr(keys, keysize, index);
 }
 
 
@@ -183,10 +233,10 @@ void Table::copyKey(long long index, KeySegment *key)
 
 
 /**
- * indexOf - search the table for the given key, and return the index. Returns -1 if not
- * found. This function assumes the keys are sorted, and does a binary search.
+ * searchKeys - the binary search for indexOf.
  */
-long long Table::indexOf(KeySegment *key, bool matchOnly)
+template <int N>
+static long long searchKeys(KeySegment *keys, int keysize, long long tupleCount, KeySegment *key, bool matchOnly)
 {
     int compare;
     long long top = 0;
@@ -194,11 +244,11 @@ long long Table::indexOf(KeySegment *key, bool matchOnly)
     if (bottom < 0) return matchOnly ? -1 : 0;	// empty table
 
     // Handle ends of range first
-    compare = Key::compareKeys(KeyPtr(data, keysize, top), key, keysize);
+    compare = compareFixed<N>(KeyPtr(keys, keysize, top), key, keysize);
     if (compare == 0) return top;
     else if (compare > 0) return matchOnly ? -1 : 0;
 
-    compare = Key::compareKeys(KeyPtr(data, keysize, bottom), key, keysize);
+    compare = compareFixed<N>(KeyPtr(keys, keysize, bottom), key, keysize);
     if (compare == 0) return bottom;
     else if (compare < 0) return matchOnly ? -1 : tupleCount;
 
@@ -208,7 +258,7 @@ long long Table::indexOf(KeySegment *key, bool matchOnly)
     // Each iteration, the midpoint of the remaining range is checked, and
     // then half the keys are discarded.
     while (true) {
-        compare = Key::compareKeys(KeyPtr(data, keysize, mid), key, keysize);
+        compare = compareFixed<N>(KeyPtr(keys, keysize, mid), key, keysize);
         if (compare == 0) return mid;	// got a match
         if (compare > 0) {	// search top half of range
             bottom = mid;
@@ -223,21 +273,264 @@ long long Table::indexOf(KeySegment *key, bool matchOnly)
 
 
 /**
- * sort() - sort the tuples by key value (to allow binary search).  This uses
- * the Unix QuickSort function qsort. We need a little adaptor function for the
- * comparator, because compareKeys isn't quite right
+ * indexOf - search the table for the given key, and return the index. Returns -1 if not
+ * found. This function assumes the keys are sorted, and does a binary search, unless
+ * the table has a hash index and only an exact match is wanted.
  */
-static int sortKeySize;	// must be set before calling sortCompare
-static int sortCompare(const void *k1, const void *k2)
+long long Table::indexOf(KeySegment *key, bool matchOnly)
 {
-    return Key::compareKeys((KeySegment *)k1, (KeySegment *)k2, sortKeySize);
+    if (matchOnly && hashSlots) return hashFind(key);
+    return BY_KEYSIZE(searchKeys, keys, keysize, tupleCount, key, matchOnly);
 }
 
 
+/**
+ * sortTuples - sort the tuples by key. Keys of a fixed size are sorted together with
+ * their values as one array of records, so the comparisons are inlined and read
+ * neighbouring memory; other sizes sort an index, which is then applied to both arrays.
+ * A stable sort keeps tuples with equal keys in the order they were added.
+ */
+template <int N>
+struct SortTuple {
+    KeySegment key[N];
+    ocTupleValue value;
+    bool operator<(const SortTuple &other) const {
+        return compareFixed<N>(key, other.key, N) < 0;
+    }
+};
+
+template <int N>
+static void sortTuples(KeySegment *keys, ocTupleValue *values, int keysize, long long count, bool stable)
+{
+    std::vector<SortTuple<N> > tuples(count);
+    for (long long i = 0; i < count; i++) {
+        memcpy(tuples[i].key, KeyPtr(keys, N, i), N * sizeof(KeySegment));
+        tuples[i].value = values[i];
+    }
+    if (stable) std::stable_sort(tuples.begin(), tuples.end());
+    else std::sort(tuples.begin(), tuples.end());
+    for (long long i = 0; i < count; i++) {
+        memcpy(KeyPtr(keys, N, i), tuples[i].key, N * sizeof(KeySegment));
+        values[i] = tuples[i].value;
+    }
+}
+
+//-- rearrange the tuples so the i'th is the one which was at order[i]
+static void applyOrder(KeySegment *keys, ocTupleValue *values, int keysize, const std::vector<long long> &order)
+{
+    long long count = order.size();
+    std::vector<KeySegment> sortedKeys(count * keysize);
+    std::vector<ocTupleValue> sortedValues(count);
+    for (long long i = 0; i < count; i++) {
+        memcpy(&sortedKeys[i * keysize], KeyPtr(keys, keysize, order[i]), keysize * sizeof(KeySegment));
+        sortedValues[i] = values[order[i]];
+    }
+    memcpy(keys, sortedKeys.data(), count * keysize * sizeof(KeySegment));
+    memcpy(values, sortedValues.data(), count * sizeof(ocTupleValue));
+}
+
+template <>
+void sortTuples<0>(KeySegment *keys, ocTupleValue *values, int keysize, long long count, bool stable)
+{
+    std::vector<long long> order(count);
+    for (long long i = 0; i < count; i++) order[i] = i;
+    auto less = [keys, keysize](long long a, long long b) {
+        return compareFixed<0>(KeyPtr(keys, keysize, a), KeyPtr(keys, keysize, b), keysize) < 0;
+    };
+    if (stable) std::stable_sort(order.begin(), order.end(), less);
+    else std::sort(order.begin(), order.end(), less);
+    applyOrder(keys, values, keysize, order);
+}
+
+
+/**
+ * mergeTuples - merge two sorted runs of tuples, the first split tuples and the rest,
+ * into one sorted run. Tuples of the first run come before equal ones of the second.
+ */
+template <int N>
+static void mergeTuples(KeySegment *keys, ocTupleValue *values, int keysize, long long split, long long count)
+{
+    std::vector<long long> order(count);
+    for (long long i = 0; i < count; i++) order[i] = i;
+    auto less = [keys, keysize](long long a, long long b) {
+        return compareFixed<N>(KeyPtr(keys, keysize, a), KeyPtr(keys, keysize, b), keysize) < 0;
+    };
+    std::inplace_merge(order.begin(), order.begin() + split, order.end(), less);
+    applyOrder(keys, values, keysize, order);
+}
+
+
+/**
+ * sort() - sort the tuples by key value (to allow binary search).
+ */
 void Table::sort()
 {
-    sortKeySize = keysize;
-    qsort(data, tupleCount, TupleBytes, sortCompare);
+    dropIndex();
+    BY_KEYSIZE(sortTuples, keys, values, keysize, tupleCount, false);
+    buildIndex();
+}
+
+
+/**
+ * setTupleData - replace the contents of the table with a copy of sorted keys and values.
+ */
+void Table::setTupleData(const KeySegment *fromKeys, const ocTupleValue *fromValues, long long count)
+{
+    dropIndex();
+    while (count > maxTupleCount) grow();
+    memcpy(keys, fromKeys, count * keysize * sizeof(KeySegment));
+    memcpy(values, fromValues, count * sizeof(ocTupleValue));
+    tupleCount = count;
+    buildIndex();
+}
+
+
+/**
+ * sumSorted - merge runs of equal keys in sorted tuples, compacting them. Returns the
+ * number of tuples left.
+ */
+template <int N>
+static long long sumSorted(KeySegment *keys, ocTupleValue *values, int keysize, long long count, bool setType)
+{
+    long long last = -1;
+    for (long long i = 0; i < count; i++) {
+        KeySegment *key = KeyPtr(keys, keysize, i);
+        if (last >= 0 && compareFixed<N>(KeyPtr(keys, keysize, last), key, keysize) == 0) {
+            values[last] += values[i];
+            if (setType && values[last] != 0.0) values[last] = 1.0;
+        } else {
+            last++;
+            if (last != i) {
+                memcpy(KeyPtr(keys, keysize, last), key, keysize * sizeof(KeySegment));
+                values[last] = values[i];
+            }
+        }
+    }
+    return last + 1;
+}
+
+
+/**
+ * sortAndSum() - sort the tuples, then merge runs of equal keys in a single pass,
+ * compacting the table as it goes. If the first tuples are already sorted (from an
+ * earlier call), only the rest are sorted, and then the two runs are merged.
+ */
+void Table::sortAndSum(long long sortedCount)
+{
+    dropIndex();
+    BY_KEYSIZE(sortTuples, KeyPtr(keys, keysize, sortedCount), values + sortedCount, keysize,
+            tupleCount - sortedCount, true);
+    if (sortedCount > 0)
+        BY_KEYSIZE(mergeTuples, keys, values, keysize, sortedCount, tupleCount);
+    tupleCount = BY_KEYSIZE(sumSorted, keys, values, keysize, tupleCount, type == TableType::SetTheoretic);
+    buildIndex();
+}
+
+
+/**
+ * buildIndex - build the open addressing (linear probing) index over the current
+ * tuples. The slot count is kept at least twice the tuple count, so probes stay short.
+ */
+void Table::buildIndex()
+{
+    dropIndex();
+    if (!indexing || !indexed || tupleCount < INDEX_MIN_TUPLES) return;
+    long long slots = 1;
+    while (slots < 2 * tupleCount) slots <<= 1;
+    indexTuples(slots);
+}
+
+
+template <int N>
+static void fillSlots(long long *hashSlots, long long hashMask, KeySegment *keys, int keysize, long long count)
+{
+    for (long long i = 0; i < count; i++) {
+        long long slot = hashKey<N>(KeyPtr(keys, keysize, i), keysize) & hashMask;
+        while (hashSlots[slot] >= 0) slot = (slot + 1) & hashMask;
+        hashSlots[slot] = i;
+    }
+}
+
+
+/**
+ * indexTuples - index the current tuples in a new index of the given (power of 2) size.
+ */
+void Table::indexTuples(long long slots)
+{
+    dropIndex();
+    hashSlots = new long long[slots];
+    memset(hashSlots, 0xff, slots * sizeof(long long));
+    hashMask = slots - 1;
+    BY_KEYSIZE(fillSlots, hashSlots, hashMask, keys, keysize, tupleCount);
+}
+
+
+/**
+ * dropIndex - discard the hash index, if any.
+ */
+void Table::dropIndex()
+{
+    if (hashSlots) delete [] hashSlots;
+    hashSlots = NULL;
+    hashMask = 0;
+}
+
+
+/**
+ * findSlot - probe the hash index for a key. Returns the slot holding its tuple, or
+ * else the empty slot where it would go.
+ */
+template <int N>
+static long long findSlot(long long *hashSlots, long long hashMask, KeySegment *keys, int keysize, KeySegment *key)
+{
+    long long slot = hashKey<N>(key, keysize) & hashMask;
+    long long index;
+    while ((index = hashSlots[slot]) >= 0) {
+        if (compareFixed<N>(KeyPtr(keys, keysize, index), key, keysize) == 0) return slot;
+        slot = (slot + 1) & hashMask;
+    }
+    return slot;
+}
+
+
+/**
+ * hashFind - look up a key in the hash index. Returns -1 if not found.
+ */
+long long Table::hashFind(KeySegment *key)
+{
+    return hashSlots[BY_KEYSIZE(findSlot, hashSlots, hashMask, keys, keysize, key)];
+}
+
+
+/**
+ * accumulateTuple - sum a value into the tuple with this key, appending the tuple if
+ * there is none. Without the hash index (see setIndexing) this is just sumTuple.
+ */
+void Table::accumulateTuple(KeySegment *key, double value)
+{
+    if (!indexing) {
+        sumTuple(key, value);
+        return;
+    }
+    if (!hashSlots || 2 * (tupleCount + 1) > hashMask + 1) {
+        long long slots = INDEX_MIN_TUPLES;
+        while (slots < 4 * (tupleCount + 1)) slots <<= 1;
+        indexTuples(slots);
+    }
+    long long slot = BY_KEYSIZE(findSlot, hashSlots, hashMask, keys, keysize, key);
+    long long index = hashSlots[slot];
+    if (index >= 0) {
+        value += values[index];
+        if (type == TableType::SetTheoretic && value != 0.0) value = 1.0;
+        values[index] = (ocTupleValue) value;
+        return;
+    }
+    while (tupleCount >= maxTupleCount) grow();
+    memcpy(KeyPtr(keys, keysize, tupleCount), key, sizeof(KeySegment) * keysize);
+    if (type == TableType::SetTheoretic && value != 0.0) value = 1.0;
+    values[tupleCount] = (ocTupleValue) value;
+    hashSlots[slot] = tupleCount;
+    tupleCount++;
 }
 
 
@@ -249,10 +542,10 @@ double Table::normalize()
     double denom = 0;
     long long i;
     for (i = 0; i < tupleCount; i++) {
-        denom += getValue(i);
+        denom += values[i];
     }
     for (i = 0; i < tupleCount; i++) {
-        setValue(i, (getValue(i)/denom));
+        values[i] /= denom;
     }
     //-- if the data was already normalized, then not much will have happened.
     //-- but in that case there is no sample size info, so return 1.
@@ -267,7 +560,7 @@ void Table::addConstant(double constant)
 {
     long long i;
     for (i = 0; i < tupleCount; i++) {
-        setValue(i, getValue(i) + constant);
+        values[i] += constant;
     }
 }
 
@@ -277,8 +570,8 @@ double Table::getLowestValue()
 {
     double lowest = getValue(0);
     for (long long i = 0; i < tupleCount; i++) {
-        if (getValue(i) < lowest)
-            lowest = getValue(i);
+        if (values[i] < lowest)
+            lowest = values[i];
     }
     return lowest;
 }
@@ -289,7 +582,13 @@ double Table::getLowestValue()
  */
 void Table::reset(int keysize)
 {
+    dropIndex();
     this->tupleCount = 0;
+    //-- the key storage must hold as many tuples of a longer key
+    if (keysize > this->keysize) {
+        delete [] keys;
+        keys = new KeySegment[keysize * maxTupleCount];
+    }
     this->keysize = keysize;
 }
 
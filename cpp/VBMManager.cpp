@@ -102,7 +102,7 @@ void VBMManager::makeAllChildRelations(Relation *rel, Relation **children, bool
 }
 
 Model *VBMManager::makeChildModel(Model *model, int remove, bool *fromCache, bool makeProject) {
-    Model *newModel = new Model(varList->getVarCount());
+    Model *newModel = new Model(varList->getVarCount(), modelArena);
     int count = model->getRelationCount();
     if (remove >= count)
         return NULL; // bad argument
@@ -122,8 +122,7 @@ Model *VBMManager::makeChildModel(Model *model, int remove, bool *fromCache, boo
     }
     //-- return one from cache if possible
     if (!modelCache->addModel(newModel)) {
-        const char *name = newModel->getPrintName();
-        Model *cacheModel = modelCache->findModel(name);
+        Model *cacheModel = modelCache->findModel(newModel);
         delete newModel;
         newModel = cacheModel;
         if (fromCache)
@@ -136,7 +135,7 @@ Model *VBMManager::makeChildModel(Model *model, int remove, bool *fromCache, boo
 }
 
 void VBMManager::makeReferenceModels(Relation *top) {
-    Model *model = new Model(1);
+    Model *model = new Model(1, modelArena);
     model->addRelation(top);
     modelCache->addModel(model);
     topRef = model;
@@ -151,7 +150,7 @@ void VBMManager::makeReferenceModels(Relation *top) {
     int i;
     if (varList->isDirected()) {
         //-- first, make a relation with all the independent variables
-        model = new Model(2); // typical case: one dep variable
+        model = new Model(2, modelArena); // typical case: one dep variable
         int pos = 0;
         Variable *var;
         for (i = 0; i < varCount; i++) {
@@ -172,7 +171,7 @@ void VBMManager::makeReferenceModels(Relation *top) {
             }
         }
     } else {
-        model = new Model(varCount);
+        model = new Model(varCount, modelArena);
         for (i = 0; i < varCount; i++) {
             varindices[0] = i;
             rel = getRelation(varindices, 1, true);
@@ -354,7 +353,7 @@ double VBMManager::computeDDF(Model *model) {
     // to find all those that are in the higher but not the lower.
     int hiCount = hiModel->getRelationCount();
     bool directed = varList->isDirected();
-    Model *diffModel = new Model(varList->getVarCount());
+    Model *diffModel = new Model(varList->getVarCount(), modelArena);
     for (int i = 0; i < hiCount; i++) {
         Relation *hiRel = hiModel->getRelation(i);
         buildDDF(hiRel, loModel, diffModel, directed);
@@ -419,13 +418,16 @@ void VBMManager::calculateBP_AicBic(Model *model) {
     double modelDF = computeDF(model); // get DF of the model
 
     // delta - AIC & BIC
-    if (firstCome) {
-        double reDeltaH_Aic = computeH(refModel);
-        double refDF = computeDF(refModel); // get DF of the ref model
-        reDeltaH_Aic *= log(2.0);
-        firstCome = false;
-        refer_BP_AIC = (2 * sampleSize) * reDeltaH_Aic + 2 * refDF;
-        refer_BP_BIC = (2 * sampleSize) * reDeltaH_Aic + (log(sampleSize) * refDF);
+    {
+        std::lock_guard<std::recursive_mutex> guard(sharedLock);
+        if (firstCome) {
+            double reDeltaH_Aic = computeH(refModel);
+            double refDF = computeDF(refModel); // get DF of the ref model
+            reDeltaH_Aic *= log(2.0);
+            refer_BP_AIC = (2 * sampleSize) * reDeltaH_Aic + 2 * refDF;
+            refer_BP_BIC = (2 * sampleSize) * reDeltaH_Aic + (log(sampleSize) * refDF);
+            firstCome = false;
+        }
     }
     deltaH_Aic = (2 * sampleSize) * deltaH_Aic + 2 * modelDF;
     deltaH_Bic = (2 * sampleSize) * deltaH_Bic + (log(sampleSize) * modelDF);
@@ -496,11 +498,13 @@ void VBMManager::computePearsonStatistics(Model *model) {
     if (model == NULL || bottomRef == NULL)
         return;
     makeFitTable(model);
-    Table *modelFitTable = new Table(keysize, fitTable1->getTupleCount());
-    modelFitTable->copy(fitTable1);
+    Table *fitTable = getFitTable();
+    Table *modelFitTable = new Table(keysize, fitTable->getTupleCount());
+    modelFitTable->copy(fitTable);
     makeFitTable(bottomRef);
+    fitTable = getFitTable();
     double modelP2 = ocPearsonChiSquared(inputData, modelFitTable, (long) round(sampleSize));
-    double refP2 = ocPearsonChiSquared(inputData, fitTable1, (long) round(sampleSize));
+    double refP2 = ocPearsonChiSquared(inputData, fitTable, (long) round(sampleSize));
 
     int errcode;
     double refDDF = computeDDF(model);
@@ -597,26 +601,27 @@ double VBMManager::computeBPT(Model *model) {
             }
 
             virtual void process(bool sign, Relation *rel, int count) {
-                for (int counter = 0; counter < count; counter++) {
-                    KeySegment key[keysize];
-                    double qi, q;
-                    //-- get the orthogonal dimension of the relation (the number of states projected into one substate)
-                    double relDimension = fullDimension / (ocDegreesOfFreedom(rel) + 1);
-                    //-- add the scaled contribution to each q
-                    for (int i = 0; i < qData->getTupleCount(); i++) {
-                        qData->copyKey(i, key);
+                KeySegment key[keysize];
+                double qi, q;
+                //-- get the orthogonal dimension of the relation (the number of states projected into one substate)
+                double relDimension = fullDimension / (ocDegreesOfFreedom(rel) + 1);
+                KeySegment *mask = rel->getMask();
+                //-- add the scaled contribution to each q, once for each time the term occurs.
+                //-- The tuple is looked up once, but the additions are made one at a time.
+                for (int i = 0; i < qData->getTupleCount(); i++) {
+                    qData->copyKey(i, key);
+                    for (int k = 0; k < keysize; k++)
+                        key[k] |= mask[k];
+                    int j = rel->getTable()->indexOf(key);
+                    if (j >= 0) {
                         q = qData->getValue(i);
-                        KeySegment *mask = rel->getMask();
-                        for (int k = 0; k < keysize; k++)
-                            key[k] |= mask[k];
-                        int j = rel->getTable()->indexOf(key);
-                        if (j >= 0) {
-                            qi = (sign ? 1 : -1) * (rel->getTable()->getValue(j) / relDimension);
-                            qData->setValue(i, qi + q);
-                        }
+                        qi = (sign ? 1 : -1) * (rel->getTable()->getValue(j) / relDimension);
+                        for (int counter = 0; counter < count; counter++)
+                            q = qi + q;
+                        qData->setValue(i, q);
                     }
-                    originTerms += (sign ? 1 : -1);
                 }
+                originTerms += (sign ? 1 : -1) * count;
             }
 
             double getTransmission() {
@@ -652,8 +657,6 @@ double VBMManager::computeBPT(Model *model) {
             int originTerms;
     };
 
-    static BPIntersectProcessor *processor = NULL;
-
     //-- see if we did this already.
     double modelT = model->getAttribute(ATTRIBUTE_BP_T);
     if (modelT >= 0)
@@ -671,17 +674,12 @@ double VBMManager::computeBPT(Model *model) {
         ManagerBase::makeProjection(rel);
     }
 
-    if (processor == NULL)
-        processor = new BPIntersectProcessor(inputData, fullDimension);
+    //-- the processor is kept in this thread's workspace, and released with it
+    ManagerWorkspace *ws = workspace();
+    if (ws->bpProcessor == NULL)
+        ws->bpProcessor = new BPIntersectProcessor(inputData, fullDimension);
+    BPIntersectProcessor *processor = (BPIntersectProcessor *) ws->bpProcessor;
     processor->reset(relCount);
-    if (intersectArray != NULL) {
-        delete[] intersectArray;
-        intersectCount = 0;
-        intersectMax = model->getRelationCount();
-        ;
-        intersectArray = NULL;
-    }
-
     doIntersectionProcessing(model, processor);
     modelT = processor->getTransmission();
     model->setAttribute(ATTRIBUTE_BP_T, modelT);
@@ -790,7 +788,7 @@ void VBMManager::computePercentCorrect(Model *model) {
         printf("ERROR: Failed to fit variable-based model '%s'\n", model->getPrintName());
         exit(1);
     }
-    Table *modelTable = fitTable1;
+    Table *modelTable = getFitTable();
     Table *maxTable = new Table(modelTable->getKeySize(), modelTable->getTupleCount());
 
     int maxCount = varList->getVarCount();
@@ -6,9 +6,11 @@
  */
 
 #include "VariableList.h"
+#include "Globals.h"
 #include "_Core.h"
 #include <assert.h>
 #include <string.h>
+#include <mutex>
 #include <stdio.h>
 #include <ctype.h>
 
@@ -50,6 +52,7 @@ VariableList::VariableList(int maxVars) {
     noUseMask = new bool[noUseMaskSize];
     for (int i = 0; i < noUseMaskSize; i++)
         noUseMask[i] = false;
+    displayRanks = NULL;
 }
 
 VariableList::~VariableList() {
@@ -65,6 +68,7 @@ VariableList::~VariableList() {
         delete vars;
     if (noUseMask)
         delete[] noUseMask;
+    deleteDisplayRanks();
 }
 
 long VariableList::size() {
@@ -77,6 +81,7 @@ long VariableList::size() {
 int VariableList::addVariable(const char *name, const char *abbrev, int cardinality, bool dv, bool rebin,
         int old_card) {
     const int GROWTH_FACTOR = 2;
+    deleteDisplayRanks();
     while (varCount >= maxVarCount) {
         vars = (Variable*) growStorage(vars, maxVarCount*sizeof(Variable), GROWTH_FACTOR);
         maxVarCount *= GROWTH_FACTOR;
@@ -97,6 +102,10 @@ int VariableList::addVariable(const char *name, const char *abbrev, int cardinal
     varp->rebin = rebin;
     varp->old_card = old_card;
     varp->exclude = NULL;
+    valueIndexes.resize(varCount);
+    valueIndexes[varCount - 1].reserve(cardinality);
+    rebinMaps.resize(varCount);
+    rebinDefaults.resize(varCount, NULL);
 
     //-- keep track of longest name (helps storage allocation of other functions
     int abbrevLen = strlen(varp->abbrev);
@@ -163,43 +172,46 @@ int VariableList::markForNoUse() {
     return 0;
 }
 
-/* This function returns the new binning value for an old one for a given variable
+//-- the length of a data value, which ends at a space or comma
+static int valueLength(const char *value) {
+    int len = 0;
+    while (value[len] != '\0' && !isspace(value[len]) && value[len] != ',')
+        len++;
+    return len;
+}
+
+/* Builds the table of new binning values for a variable. The mapping is searched in
+ * order, so the first entry for an old value is the one kept, and nothing after a "*"
+ * is reachable.
  */
-int VariableList::getNewValue(int index, char * old_value, char*new_value) {
-    int i = 0, k;
-    int chr;
-    char myvalue[100];
-    for (chr = 0; chr < 100; chr++) {
-        if (old_value[chr] == '\0' || isspace(old_value[chr]) || old_value[chr] == ',')
+void VariableList::compileRebin(int index) {
+    Variable *varp = vars + index;
+    rebinMaps[index].clear();
+    rebinDefaults[index] = NULL;
+    for (int i = 0; varp->oldnew[NEW_ROW][i] != NULL; i++) {
+        if (strcmp(varp->oldnew[OLD_ROW][i], "*") == 0) {
+            rebinDefaults[index] = varp->oldnew[NEW_ROW][i];
             break;
-        else
-            myvalue[chr] = old_value[chr];
+        }
+        rebinMaps[index].emplace(varp->oldnew[OLD_ROW][i], varp->oldnew[NEW_ROW][i]);
     }
-    myvalue[chr] = '\0';
+}
+
+/* This function returns the new binning value for an old one for a given variable
+ */
+const char *VariableList::getNewValue(int index, const char *old_value) {
+    int len = valueLength(old_value);
     //exclude case
     if ((vars + index)->exclude != NULL) {
-        if ((k = strcmp(myvalue, (vars + index)->exclude)) == 0)
-            return -1;
-        else {
-            strcpy(new_value, myvalue);
-            return 1;
-        }
-    }
-    for (;;) {
-        char * value_new = (vars + index)->oldnew[1][i];
-        char * value_old = (vars[index]).oldnew[0][i];
-        if (value_new == NULL)
-            break;
-        if ((k = strcmp(value_old, myvalue)) == 0) {
-            strcpy(new_value, value_new);
-            return 1;
-        } else if ((k = strcmp(value_old, "*")) == 0) {
-            strcpy(new_value, value_new);
-            return 1;
-        }
-        i++;
+        if (strncmp(old_value, (vars + index)->exclude, len) == 0 && (vars + index)->exclude[len] == '\0')
+            return NULL;
+        else
+            return old_value;
     }
-    return -1;
+    auto found = rebinMaps[index].find(std::string(old_value, len));
+    if (found != rebinMaps[index].end())
+        return found->second;
+    return rebinDefaults[index];
 }
 
 /**
@@ -398,31 +410,22 @@ int VariableList::getVarStateList(const char *name, int *varlist, int *stlist) {
 }
 
 int VariableList::getVarValueIndex(int varindex, const char *value) {
-    int index = 0;
     char **map = vars[varindex].valmap;
-    char myvalue[100];
-    int chr;
     int cardinality = vars[varindex].cardinality;
-    //-- extract the name as a separate string
-    for (chr = 0; chr < 100; chr++) {
-        if (value[chr] == '\0' || isspace(value[chr]) || (value[chr] == ','))
-            break;
-        else
-            myvalue[chr] = value[chr];
-    }
-    myvalue[chr] = '\0';
-    //-- find this value in the value map. Stop on first empty entry
-    while (index < cardinality) {
-        if (map[index] == NULL)
-            break;
-        if (strcmp(myvalue, map[index]) == 0)
-            return index;
-        index++;
-    }
+    //-- extract the name as a separate string, and find it in the value map
+    int len = valueLength(value);
+    std::string name(value, len);
+    std::unordered_map<std::string, int> &indexes = valueIndexes[varindex];
+    auto found = indexes.find(name);
+    if (found != indexes.end())
+        return found->second;
     //-- if we have room, add this value. Otherwise return error.
+    int index = indexes.size();
     if (index < cardinality) {
-        map[index] = new char[strlen(value) + 1];
-        strcpy(map[index], myvalue);
+        map[index] = new char[len + 1];
+        strcpy(map[index], name.c_str());
+        indexes.emplace(name, index);
+        deleteDisplayRanks();
         return index;
     } else
         return -1;
@@ -437,6 +440,74 @@ const char *VariableList::getVarValue(int varindex, int valueindex) {
         return "?";
 }
 
+//-- the display ranks of all lists are built under one lock; it is only taken once per sort
+static std::mutex displayRankLock;
+
+void VariableList::deleteDisplayRanks() {
+    if (displayRanks == NULL)
+        return;
+    for (int i = 0; i < varCount; i++)
+        delete[] displayRanks[i];
+    delete[] displayRanks;
+    displayRanks = NULL;
+}
+
+//-- merge sort of value indices by printable value. The value comparison isn't a strict
+//-- ordering when numeric and other values are mixed, so a merge sort is used, which
+//-- can't misbehave on that.
+static void sortValues(int *order, int *work, int count, const char **values) {
+    if (count < 2)
+        return;
+    int half = count / 2;
+    sortValues(order, work, half, values);
+    sortValues(order + half, work, count - half, values);
+    int i = 0, j = half, k = 0;
+    while (i < half && j < count) {
+        if (strcmpAccountingForNumbers(values[order[j]], values[order[i]]) < 0)
+            work[k++] = order[j++];
+        else
+            work[k++] = order[i++];
+    }
+    while (i < half)
+        work[k++] = order[i++];
+    while (j < count)
+        work[k++] = order[j++];
+    memcpy(order, work, count * sizeof(int));
+}
+
+const int *VariableList::getDisplayRanks(int varindex) {
+    std::lock_guard<std::mutex> guard(displayRankLock);
+    if (displayRanks == NULL) {
+        int **ranks = new int*[varCount];
+        for (int v = 0; v < varCount; v++) {
+            //-- a key field can hold any value up to all 1's (DONT_CARE)
+            Variable *var = vars + v;
+            int count = 1 << var->size;
+            const char **values = new const char*[count];
+            for (int i = 0; i < count; i++)
+                values[i] = (i < var->cardinality) ? getVarValue(v, i) : "?";
+            int *order = new int[count];
+            int *work = new int[count];
+            for (int i = 0; i < count; i++)
+                order[i] = i;
+            sortValues(order, work, count, values);
+            //-- values which compare equal get the same rank
+            ranks[v] = new int[count];
+            int rank = 0;
+            for (int i = 0; i < count; i++) {
+                if (i > 0 && strcmpAccountingForNumbers(values[order[i - 1]], values[order[i]]) != 0)
+                    rank = i;
+                ranks[v][order[i]] = rank;
+            }
+            delete[] work;
+            delete[] order;
+            delete[] values;
+        }
+        displayRanks = ranks;
+    }
+    return displayRanks[varindex];
+}
+
 bool VariableList::checkCardinalities() {
     bool result = true;
     for (int varindex = 0; varindex < varCount; varindex++) {
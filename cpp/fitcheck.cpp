@@ -0,0 +1,168 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+/**
+ * fitcheck.cpp - checks that the alternative ways of fitting a model agree.
+ * A short full-up search is run from the bottom model to collect models, as in
+ * ipfbench, and every collected model is fit with IPF over sparse tables and again
+ * over a dense array (forced on, whatever the fill of the state space). The models
+ * which makeFitTable fits algebraically (loopless ones, and for directed data, those
+ * with the relation of all the IVs) are also fit that way. The fitted entropies, and
+ * the LRs against the data, must agree with the sparse IPF fit within a tolerance;
+ * DF doesn't depend on the fit, so it is only printed with a disagreement. Prints
+ * one line for the data file, and returns nonzero if any model disagrees.
+ */
+
+#include "VBMManager.h"
+#include "DenseTable.h"
+#include "SearchBase.h"
+#include "Report.h"
+#include "Math.h"
+#include <math.h>
+#include <string.h>
+#include <stdio.h>
+
+const int CHECK_LEVELS = 3;
+const int CHECK_WIDTH = 3;
+const double CHECK_TOLERANCE = 1e-8;
+//-- the dense check is skipped for state spaces larger than this
+const long long CHECK_DENSE_LIMIT = 1 << 22;
+
+static int collectModels(VBMManager *mgr, Model **&found) {
+    mgr->setSearch("full-up");
+    mgr->setRefModel("bottom");
+    mgr->setSortAttr("information");
+    Model *start = mgr->getBottomRefModel();
+    int foundMax = 1, foundCount = 0;
+    found = new Model*[foundMax];
+    Model **kept = new Model*[1];
+    kept[0] = start;
+    int keptCount = 1;
+    for (int level = 0; level < CHECK_LEVELS; level++) {
+        int nextCount = 0;
+        for (int k = 0; k < keptCount; k++) {
+            Model **models = mgr->getSearch()->search(kept[k]);
+            if (models == NULL) continue;
+            for (Model **model = models; *model; model++) {
+                bool dup = false;
+                for (int i = 0; i < foundCount; i++) {
+                    if (found[i] == *model) {
+                        dup = true;
+                        break;
+                    }
+                }
+                if (dup) continue;
+                mgr->computeInformationStatistics(*model);
+                if (foundCount >= foundMax) {
+                    Model **grown = new Model*[foundMax * 2];
+                    memcpy(grown, found, foundCount * sizeof(Model*));
+                    delete[] found;
+                    found = grown;
+                    foundMax *= 2;
+                }
+                found[foundCount++] = *model;
+                nextCount++;
+            }
+            delete[] models;
+        }
+        delete[] kept;
+        //-- keep the best models of this level as the next search starting points
+        Model **level_models = found + foundCount - nextCount;
+        Report::sort(level_models, nextCount, mgr->getSortAttr(), Direction::Descending);
+        keptCount = nextCount < CHECK_WIDTH ? nextCount : CHECK_WIDTH;
+        kept = new Model*[keptCount];
+        memcpy(kept, level_models, keptCount * sizeof(Model*));
+    }
+    delete[] kept;
+    return foundCount;
+}
+
+//-- fit every model by IPF with the given dense limit, saving the entropies
+static void fitIPF(VBMManager *mgr, Model **models, int count, long long denseLimit, double *entropies) {
+    mgr->setDenseLimit(denseLimit);
+    for (int i = 0; i < count; i++) {
+        mgr->makeFitTableIPF(models[i]);
+        entropies[i] = ocEntropy(mgr->getFitTable());
+    }
+}
+
+//-- fit the models which makeFitTable would fit algebraically that way, saving the
+//-- entropies, and marking the rest with -1. Returns the number fit.
+static int fitAlgebraic(VBMManager *mgr, Model **models, int count, double *entropies) {
+    bool directed = mgr->getVariableList()->isDirected();
+    int fitCount = 0;
+    for (int i = 0; i < count; i++) {
+        Model *model = models[i];
+        entropies[i] = -1;
+        if (mgr->hasLoops(model) || model->isStateBased())
+            continue;
+        if (directed && mgr->findIndependentRelation(model) == NULL)
+            continue;
+        mgr->makeFitTableAlgebraic(model);
+        entropies[i] = ocEntropy(mgr->getFitTable());
+        fitCount++;
+    }
+    return fitCount;
+}
+
+//-- compare each model's entropy, and its LR against the data, with the reference fit.
+//-- Models not fit (entropy -1) are skipped.
+static int compare(const char *what, VBMManager *mgr, Model **models, int count, double *ref, double *h) {
+    double dataH = ocEntropy(mgr->getInputData());
+    double lrScale = 2.0 * M_LN2 * mgr->getSampleSz();
+    int mismatch = 0;
+    for (int i = 0; i < count; i++) {
+        if (h[i] < 0)
+            continue;
+        double refLR = lrScale * (ref[i] - dataH);
+        double lr = lrScale * (h[i] - dataH);
+        if (fabs(ref[i] - h[i]) > CHECK_TOLERANCE || fabs(refLR - lr) > CHECK_TOLERANCE * lrScale) {
+            printf("\t%s mismatch: %s DF %.0f H %.12g vs %.12g LR %.12g vs %.12g\n", what,
+                    models[i]->getPrintName(), mgr->computeDF(models[i]), ref[i], h[i], refLR, lr);
+            mismatch++;
+        }
+    }
+    return mismatch;
+}
+
+int main(int argc, char* argv[]) {
+    if (argc <= 1) {
+        printf("usage: %s datafile\n", argv[0]);
+        return 1;
+    }
+    VBMManager *mgr = new VBMManager();
+    if (!mgr->initFromCommandLine(argc, argv))
+        return 1;
+    Model **models;
+    int count = collectModels(mgr, models);
+    double *sparse = new double[count];
+    double *dense = new double[count];
+    double *algebraic = new double[count];
+    int mismatch = 0;
+
+    fitIPF(mgr, models, count, 0, sparse);
+    const char *denseResult = "skipped";
+    if (DenseTable::cellCount(mgr->getVariableList(), CHECK_DENSE_LIMIT) > 0) {
+        mgr->setDenseFill(0);
+        fitIPF(mgr, models, count, CHECK_DENSE_LIMIT, dense);
+        int denseMismatch = compare("dense", mgr, models, count, sparse, dense);
+        mismatch += denseMismatch;
+        denseResult = denseMismatch ? "FAILED" : "ok";
+    }
+
+    int algebraicCount = fitAlgebraic(mgr, models, count, algebraic);
+    int algebraicMismatch = compare("algebraic", mgr, models, count, sparse, algebraic);
+    mismatch += algebraicMismatch;
+
+    printf("%s: %d models\tdense vs sparse: %s\talgebraic vs IPF: %d models, %s\n", argv[argc - 1], count,
+            denseResult, algebraicCount, algebraicMismatch ? "FAILED" : "ok");
+    delete[] sparse;
+    delete[] dense;
+    delete[] algebraic;
+    delete[] models;
+    return mismatch == 0 ? 0 : 1;
+}
@@ -0,0 +1,125 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+/**
+ * ipfbench.cpp - times IPF fitting with the table hash index on and off.
+ * A short full-up search is run from the bottom model to collect models, and then
+ * every collected model is fit with IPF, once with each lookup mode. The cached
+ * relation projections are re-indexed (or stripped of their index) before each pass.
+ * The fitted entropies of the two passes are compared, since the index must not
+ * change results.
+ */
+
+#include "VBMManager.h"
+#include "SearchBase.h"
+#include "Report.h"
+#include "Math.h"
+#include <math.h>
+#include <string.h>
+#include <stdio.h>
+#include <time.h>
+
+const int BENCH_LEVELS = 2;
+const int BENCH_WIDTH = 3;
+const int BENCH_REPEAT = 3;
+
+static int collectModels(VBMManager *mgr, Model **&found) {
+    mgr->setSearch("full-up");
+    mgr->setRefModel("bottom");
+    mgr->setSortAttr("information");
+    Model *start = mgr->getBottomRefModel();
+    int foundMax = 1, foundCount = 0;
+    found = new Model*[foundMax];
+    Model **kept = new Model*[1];
+    kept[0] = start;
+    int keptCount = 1;
+    for (int level = 0; level < BENCH_LEVELS; level++) {
+        int nextCount = 0;
+        for (int k = 0; k < keptCount; k++) {
+            Model **models = mgr->getSearch()->search(kept[k]);
+            if (models == NULL) continue;
+            for (Model **model = models; *model; model++) {
+                bool dup = false;
+                for (int i = 0; i < foundCount; i++) {
+                    if (found[i] == *model) {
+                        dup = true;
+                        break;
+                    }
+                }
+                if (dup) continue;
+                mgr->computeInformationStatistics(*model);
+                if (foundCount >= foundMax) {
+                    Model **grown = new Model*[foundMax * 2];
+                    memcpy(grown, found, foundCount * sizeof(Model*));
+                    delete[] found;
+                    found = grown;
+                    foundMax *= 2;
+                }
+                found[foundCount++] = *model;
+                nextCount++;
+            }
+            delete[] models;
+        }
+        delete[] kept;
+        //-- keep the best models of this level as the next search starting points
+        Model **level_models = found + foundCount - nextCount;
+        Report::sort(level_models, nextCount, mgr->getSortAttr(), Direction::Descending);
+        keptCount = nextCount < BENCH_WIDTH ? nextCount : BENCH_WIDTH;
+        kept = new Model*[keptCount];
+        memcpy(kept, level_models, keptCount * sizeof(Model*));
+    }
+    delete[] kept;
+    return foundCount;
+}
+
+static double timeIPF(VBMManager *mgr, Model **models, int count, double *entropies) {
+    for (int i = 0; i < count; i++) {
+        mgr->makeProjections(models[i]);
+        for (int r = 0; r < models[i]->getRelationCount(); r++)
+            models[i]->getRelation(r)->getTable()->buildIndex();
+    }
+    clock_t t0 = clock();
+    for (int r = 0; r < BENCH_REPEAT; r++) {
+        for (int i = 0; i < count; i++) {
+            mgr->makeFitTableIPF(models[i]);
+            entropies[i] = ocEntropy(mgr->getFitTable());
+        }
+    }
+    return (double)(clock() - t0) / CLOCKS_PER_SEC;
+}
+
+int main(int argc, char* argv[]) {
+    if (argc <= 1) {
+        printf("usage: %s datafile\n", argv[0]);
+        return 1;
+    }
+    VBMManager *mgr = new VBMManager();
+    if (!mgr->initFromCommandLine(argc, argv))
+        return 1;
+    Model **models;
+    int count = collectModels(mgr, models);
+    double *plain = new double[count];
+    double *indexed = new double[count];
+
+    Table::setIndexing(false);
+    double plainTime = timeIPF(mgr, models, count, plain);
+    Table::setIndexing(true);
+    double indexTime = timeIPF(mgr, models, count, indexed);
+
+    int mismatch = 0;
+    for (int i = 0; i < count; i++) {
+        if (fabs(plain[i] - indexed[i]) > 1e-10)
+            mismatch++;
+    }
+    printf("%s: %d models x %d\tbinary search: %.3fs\thash index: %.3fs\tspeedup: %.2fx\tmismatches: %d\n",
+            argv[argc - 1], count, BENCH_REPEAT, plainTime, indexTime,
+            indexTime > 0 ? plainTime / indexTime : 0.0, mismatch);
+    delete[] plain;
+    delete[] indexed;
+    delete[] models;
+    return mismatch == 0 ? 0 : 1;
+}
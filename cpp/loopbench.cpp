@@ -0,0 +1,118 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+/**
+ * loopbench.cpp - times loop detection on generated models over many variables.
+ * No data is needed. Each model is grown from a core, by adding relations which share
+ * part of an earlier relation and bring in new variables. A core of one relation gives
+ * a loopless model; a core which is a ring of three or more relations gives a model
+ * with a loop. Since the answer is known for every model, the checks are verified too.
+ */
+
+#include "Math.h"
+#include "Model.h"
+#include "Relation.h"
+#include "VariableList.h"
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+#include <algorithm>
+#include <vector>
+
+const int BENCH_VARS = 96;
+const int BENCH_MODELS = 200;
+const int BENCH_REPEAT = 50;
+
+static Relation *makeRelation(VariableList *vars, std::vector<int> members) {
+    std::sort(members.begin(), members.end());
+    members.erase(std::unique(members.begin(), members.end()), members.end());
+    Relation *rel = new Relation(vars, members.size());
+    for (int v : members)
+        rel->addVariable(v);
+    return rel;
+}
+
+static Model *generateModel(VariableList *vars, bool loop, std::vector<Relation*> &made) {
+    int varCount = vars->getVarCount();
+    std::vector<int> fresh(varCount);
+    for (int i = 0; i < varCount; i++)
+        fresh[i] = i;
+    for (int i = varCount - 1; i > 0; i--)
+        std::swap(fresh[i], fresh[rand() % (i + 1)]);
+
+    std::vector<std::vector<int> > rels;
+    int next;
+    if (loop) {
+        int ring = 3 + rand() % 6;
+        for (int i = 0; i < ring; i++)
+            rels.push_back({fresh[i], fresh[(i + 1) % ring]});
+        next = ring;
+    } else {
+        rels.push_back({fresh[0], fresh[1]});
+        next = 2;
+    }
+    while (next < varCount) {
+        std::vector<int> base = rels[rand() % rels.size()];
+        int shared = 1 + rand() % std::min(2, (int) base.size());
+        int start = rand() % base.size();
+        std::vector<int> rel;
+        for (int s = 0; s < shared; s++)
+            rel.push_back(base[(start + s) % base.size()]);
+        int added = 1 + rand() % 3;
+        for (int a = 0; a < added && next < varCount; a++)
+            rel.push_back(fresh[next++]);
+        rels.push_back(rel);
+    }
+
+    Model *model = new Model(rels.size());
+    for (auto &members : rels) {
+        Relation *rel = makeRelation(vars, members);
+        made.push_back(rel);
+        model->addRelation(rel, false);
+    }
+    return model;
+}
+
+int main(int argc, char* argv[]) {
+    srand(argc > 1 ? atoi(argv[1]) : 1);
+    VariableList *vars = new VariableList(BENCH_VARS);
+    char name[16];
+    for (int i = 0; i < BENCH_VARS; i++) {
+        snprintf(name, sizeof(name), "V%d", i);
+        vars->addVariable(name, name, 2);
+    }
+    std::vector<Model*> models;
+    std::vector<bool> expected;
+    std::vector<Relation*> made;
+    long relCount = 0;
+    for (int i = 0; i < BENCH_MODELS; i++) {
+        bool loop = i % 2 == 1;
+        models.push_back(generateModel(vars, loop, made));
+        expected.push_back(loop);
+        relCount += models.back()->getRelationCount();
+    }
+
+    int mismatch = 0;
+    clock_t t0 = clock();
+    for (int r = 0; r < BENCH_REPEAT; r++) {
+        for (int i = 0; i < BENCH_MODELS; i++) {
+            if (ocHasLoops(models[i]) != expected[i] && r == 0)
+                mismatch++;
+        }
+    }
+    double seconds = (double)(clock() - t0) / CLOCKS_PER_SEC;
+    printf("%d variables, %d models, %.1f relations each, x %d\tloop checks: %.3fs\t%.2f us/check\tmismatches: %d\n",
+            BENCH_VARS, BENCH_MODELS, (double) relCount / BENCH_MODELS, BENCH_REPEAT, seconds,
+            1e6 * seconds / (BENCH_MODELS * BENCH_REPEAT), mismatch);
+
+    for (Model *model : models)
+        delete model;
+    for (Relation *rel : made)
+        delete rel;
+    delete vars;
+    return mismatch == 0 ? 0 : 1;
+}
@@ -15,6 +15,10 @@
 
 #undef SB
 //#define SB
+//-- or build with -DSTATE_BASED, as the Makefile does for occsb
+#ifdef STATE_BASED
+#define SB
+#endif
 
 int main(int argc, char* argv[]) {
     if (argc <= 1) {
@@ -99,11 +103,14 @@ int main(int argc, char* argv[]) {
         t1 = clock();
         printf("Setup time: %f seconds\n", (float)(t1 - t0)/CLOCKS_PER_SEC);
         for (int j=0; j < levels; j++) {
+            mgr->newSearchLevel();
             nextCount = 0;
             nextModels = new Model*[keptCount * (int)width];
             levelCount = 0;
             printf("level: %d\t", j+1); fflush(stdout);
             for (int k=0; k < keptCount; k++) {
+                //-- projections may be evicted between kept models, but not while one is searched
+                ManagerBase::TableUse use(mgr);
                 models = mgr->getSearch()->search(keptModels[k]);
                 count = 0;
                 if (models) {
@@ -146,10 +153,12 @@ int main(int argc, char* argv[]) {
             for (i=0; i < keptCount; i++) {
                 nextModels[i]->setAttribute("level", (double)j+1);
                 nextModels[i]->setID(nextID++);
+                ManagerBase::TableUse use(mgr);
                 mgr->computeDFStatistics(nextModels[i]);
                 mgr->computeL2Statistics(nextModels[i]);
                 mgr->computeIncrementalAlpha(nextModels[i]);
                 report->addModel(nextModels[i]);
+                mgr->promoteModel(nextModels[i]);
                 keptModels[i] = nextModels[i];
             }
             delete[] nextModels;
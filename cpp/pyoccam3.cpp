@@ -14,6 +14,7 @@
 #include "VariableList.h"
 #include "Variable.h"
 #include <limits>
+#include <mutex>
 #include <unistd.h>
 #include <Python.h>
 
@@ -38,6 +39,22 @@
 //-- Creates a new instance of a python wrapper type.
 #define ObjNew(type) ((P##type*)PyObject_NEW(P##type, &T##type))
 
+//-- Run a statement with the GIL released, so other Python threads can run meanwhile.
+//-- Managers keep a workspace per thread, so statistics and fit tables can be computed
+//-- on one manager from several threads at once. The statement runs in a TableUse
+//-- scope, so no projection it reads is evicted until it is done.
+#define ComputeWithoutGIL(mgr, statement) \
+    Py_BEGIN_ALLOW_THREADS \
+    { ManagerBase::TableUse use(mgr); statement; } \
+    Py_END_ALLOW_THREADS
+
+//-- As above, for statements which change the model lattice (searches, progenitor links).
+//-- These are serialized by the manager's compute lock.
+#define ExclusiveWithoutGIL(mgr, statement) \
+    Py_BEGIN_ALLOW_THREADS \
+    { std::lock_guard<std::mutex> guard((mgr)->getComputeLock()); ManagerBase::TableUse use(mgr); statement; } \
+    Py_END_ALLOW_THREADS
+
 // Define the struct for a PyObject type which carries a pointer to an instance
 // of the actual type and indexes used by iterators
 #define DefineIterablePyObject(type) \
@@ -74,6 +91,264 @@ DefinePyObject(Variable);
 
 DefineIterablePyObject(VariableList)
 
+//-- A Table carries a pointer to a table whose keys and values Python can read through the
+//-- buffer protocol, without copying (see TableArray). Tables the manager keeps for its lifetime (input and test
+//-- data) are borrowed; fits and projections, which the manager reuses or evicts, are
+//-- copied once into a table owned by this object. The manager is kept alive meanwhile.
+extern PyTypeObject TTable;
+struct PTable {
+    PyObject_HEAD
+    Table *obj;
+    bool owned;
+    PyObject *owner;
+    VariableList *varList;
+};
+
+//-- A TableArray is one of the arrays of a Table: its keys, as a two-dimensional array of
+//-- key segments with a row per tuple, or its values. It keeps the Table alive.
+extern PyTypeObject TTableArray;
+struct PTableArray {
+    PyObject_HEAD
+    PTable *table;
+    bool values;
+    Py_ssize_t shape[2];
+    Py_ssize_t strides[2];
+};
+
+
+/*******************/
+/****** Table ******/
+/*******************/
+
+static PyObject *newTable(Table *table, bool owned, PyObject *owner, VariableList *vars)
+{
+    PTable *newobj = PyObject_NEW(PTable, &TTable);
+    if (newobj == NULL) {
+        if (owned) delete table;
+        return NULL;
+    }
+    newobj->obj = table;
+    newobj->owned = owned;
+    newobj->owner = owner;
+    Py_INCREF(owner);
+    newobj->varList = vars;
+    return (PyObject*) newobj;
+}
+
+static void Table_dealloc(PTable *self)
+{
+    if (self->owned)
+        delete self->obj;
+    Py_XDECREF(self->owner);
+    PyObject_Del(self);
+}
+
+static PyObject *newTableArray(PTable *table, bool values)
+{
+    PTableArray *newobj = PyObject_NEW(PTableArray, &TTableArray);
+    if (newobj == NULL)
+        return NULL;
+    newobj->table = table;
+    Py_INCREF(table);
+    newobj->values = values;
+    int keysize = table->obj->getKeySize();
+    newobj->shape[0] = table->obj->getTupleCount();
+    newobj->shape[1] = keysize;
+    newobj->strides[0] = values ? sizeof(ocTupleValue) : keysize * sizeof(KeySegment);
+    newobj->strides[1] = sizeof(KeySegment);
+    return (PyObject*) newobj;
+}
+
+static void TableArray_dealloc(PTableArray *self)
+{
+    Py_XDECREF(self->table);
+    PyObject_Del(self);
+}
+
+//-- the array as a read-only buffer: keys are unsigned longs, values doubles
+static int TableArray_getbuffer(PyObject *self, Py_buffer *view, int flags)
+{
+    PTableArray *array = (PTableArray*) self;
+    if (flags & PyBUF_WRITABLE) {
+        PyErr_SetString(PyExc_BufferError, "Table buffers are read-only");
+        view->obj = NULL;
+        return -1;
+    }
+    Table *table = array->table->obj;
+    view->obj = self;
+    Py_INCREF(self);
+    if (array->values) {
+        view->buf = (void*) table->getValueData();
+        view->itemsize = sizeof(ocTupleValue);
+        view->ndim = 1;
+        view->format = (flags & PyBUF_FORMAT) ? (char*) "d" : NULL;
+    } else {
+        view->buf = (void*) table->getKeyData();
+        view->itemsize = sizeof(KeySegment);
+        view->ndim = 2;
+        view->format = (flags & PyBUF_FORMAT) ? (char*) "L" : NULL;
+    }
+    view->len = array->shape[0] * (array->values ? 1 : array->shape[1]) * view->itemsize;
+    view->readonly = 1;
+    view->shape = (flags & PyBUF_ND) ? array->shape : NULL;
+    view->strides = ((flags & PyBUF_STRIDES) == PyBUF_STRIDES) ? array->strides : NULL;
+    view->suboffsets = NULL;
+    view->internal = NULL;
+    return 0;
+}
+
+static PyBufferProcs TableArray_as_buffer = {
+    .bf_getbuffer       = TableArray_getbuffer,
+    .bf_releasebuffer   = nullptr,
+};
+
+PyTypeObject TTableArray = {
+    PyVarObject_HEAD_INIT(&PyType_Type, 0)
+    .tp_name            = "TableArray_cpp",
+    .tp_basicsize       = sizeof(PTableArray),
+    .tp_itemsize        = NULL,
+    .tp_dealloc         = (destructor) TableArray_dealloc,
+    .tp_print           = nullptr,
+    .tp_getattr         = nullptr,
+    .tp_setattr         = nullptr,
+    .tp_as_async        = nullptr,
+    .tp_repr            = nullptr,
+    .tp_as_number       = nullptr,
+    .tp_as_sequence     = nullptr,
+    .tp_as_mapping      = nullptr,
+    .tp_hash            = nullptr,
+    .tp_call            = nullptr,
+    .tp_str             = nullptr,
+    .tp_getattro        = nullptr,
+    .tp_setattro        = nullptr,
+    .tp_as_buffer       = &TableArray_as_buffer,
+    .tp_flags           = Py_TPFLAGS_DEFAULT,
+};
+
+// TableArray getKeys()
+DefinePyFunction(Table, getKeys) {
+    PyArg_ParseTuple(args, "");
+    return newTableArray((PTable*) self, false);
+}
+
+// TableArray getValues()
+DefinePyFunction(Table, getValues) {
+    PyArg_ParseTuple(args, "");
+    return newTableArray((PTable*) self, true);
+}
+
+// int getKeySize()
+DefinePyFunction(Table, getKeySize) {
+    PyArg_ParseTuple(args, "");
+    return PyLong_FromLong(((PTable*) self)->varList->getKeySize());
+}
+
+// long getTupleCount()
+DefinePyFunction(Table, getTupleCount) {
+    PyArg_ParseTuple(args, "");
+    return PyLong_FromLongLong(((PTable*) self)->obj->getTupleCount());
+}
+
+// list getKeyLayout() - (abbrev, segment, shift, mask) of each variable. A variable's
+// value in a key is (key[segment] & mask) >> shift; all ones means it isn't in the key.
+DefinePyFunction(Table, getKeyLayout) {
+    PyArg_ParseTuple(args, "");
+    VariableList *vars = ((PTable*) self)->varList;
+    PyObject *layout = PyList_New(vars->getVarCount());
+    for (int i = 0; i < vars->getVarCount(); i++) {
+        Variable *var = vars->getVariable(i);
+        PyList_SetItem(layout, i, Py_BuildValue("(siik)", var->abbrev, var->segment, var->shift, var->mask));
+    }
+    return layout;
+}
+
+static struct PyMethodDef Table_methods[] = {
+        PyMethodDef(Table, getKeyLayout),
+        PyMethodDef(Table, getKeys),
+        PyMethodDef(Table, getKeySize),
+        PyMethodDef(Table, getTupleCount),
+        PyMethodDef(Table, getValues),
+        { nullptr }
+};
+
+PyTypeObject TTable = {
+    PyVarObject_HEAD_INIT(&PyType_Type, 0)
+    .tp_name            = "Table_cpp",
+    .tp_basicsize       = sizeof(PTable),
+    .tp_itemsize        = NULL,
+    .tp_dealloc         = (destructor) Table_dealloc,
+    .tp_print           = nullptr,
+    .tp_getattr         = nullptr,
+    .tp_setattr         = nullptr,
+    .tp_as_async        = nullptr,
+    .tp_repr            = nullptr,
+    .tp_as_number       = nullptr,
+    .tp_as_sequence     = nullptr,
+    .tp_as_mapping      = nullptr,
+    .tp_hash            = nullptr,
+    .tp_call            = nullptr,
+    .tp_str             = nullptr,
+    .tp_getattro        = nullptr,
+    .tp_setattro        = nullptr,
+    .tp_as_buffer       = nullptr,
+    .tp_flags           = Py_TPFLAGS_DEFAULT,
+    .tp_doc             = nullptr,
+    .tp_traverse        = nullptr,
+    .tp_clear           = nullptr,
+    .tp_richcompare     = nullptr,
+    .tp_weaklistoffset  = NULL,
+    .tp_iter            = nullptr,
+    .tp_iternext        = nullptr,
+    .tp_methods         = Table_methods,
+};
+
+//-- The manager functions below are shared by VBMManager and SBMManager.
+
+//-- Table getInputTable(), Table getTestTable() - None if there is no test data
+static PyObject *inputTable(PyObject *self, ManagerBase *mgr, bool test)
+{
+    Table *table = test ? mgr->getTestData() : mgr->getInputData();
+    if (table == NULL) {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+    return newTable(table, false, self, mgr->getVariableList());
+}
+
+//-- Table getFitTable(Model)
+static PyObject *fitTable(PyObject *self, ManagerBase *mgr, PyObject *args)
+{
+    PyObject *Pmodel;
+    if (!PyArg_ParseTuple(args, "O!", &TModel, &Pmodel))
+        return NULL;
+    Model *model = ObjRef(Pmodel, Model);
+    if (model == NULL)
+        onError("Model is NULL!");
+    Table *table = new Table(mgr->getKeySize(), 1);
+    //-- the fit is made in this thread's workspace, so it is copied before the thread moves on
+    ComputeWithoutGIL(mgr, mgr->makeFitTable(model); table->copy(mgr->getFitTable()));
+    return newTable(table, true, self, mgr->getVariableList());
+}
+
+//-- Table getProjection(Model, int index) - the projection of the model's relation
+static PyObject *projectionTable(PyObject *self, ManagerBase *mgr, PyObject *args)
+{
+    PyObject *Pmodel;
+    int index;
+    if (!PyArg_ParseTuple(args, "O!i", &TModel, &Pmodel, &index))
+        return NULL;
+    Model *model = ObjRef(Pmodel, Model);
+    if (model == NULL)
+        onError("Model is NULL!");
+    if (index < 0 || index >= model->getRelationCount())
+        onError("Relation index out of range");
+    Relation *rel = model->getRelation(index);
+    Table *table = new Table(mgr->getKeySize(), 1);
+    //-- the projection may be evicted once the TableUse ends, so it is copied within it
+    ComputeWithoutGIL(mgr, mgr->makeProjection(rel); table->copy(rel->getTable()));
+    return newTable(table, true, self, mgr->getVariableList());
+}
+
 
 /**************************/
 /****** VBMManager ******/
@@ -176,7 +451,7 @@ DefinePyFunction(VBMManager, searchOneLevel) {
     }
     if (start->obj == NULL)
         onError("Model is NULL!");
-    models = mgr->getSearch()->search(start->obj);
+    ExclusiveWithoutGIL(mgr, models = mgr->getSearch()->search(start->obj));
 
     Model **model;
     long count = 0;
@@ -321,7 +596,8 @@ DefinePyFunction(VBMManager, computeInformationStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computeInformationStatistics(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeInformationStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -333,7 +609,8 @@ DefinePyFunction(VBMManager, computeDFStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computeDFStatistics(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeDFStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -345,7 +622,8 @@ DefinePyFunction(VBMManager, computeL2Statistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computeL2Statistics(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeL2Statistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -357,7 +635,8 @@ DefinePyFunction(VBMManager, computePearsonStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computePearsonStatistics(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computePearsonStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -369,7 +648,8 @@ DefinePyFunction(VBMManager, computeDependentStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computeDependentStatistics(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeDependentStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -381,7 +661,8 @@ DefinePyFunction(VBMManager, computeBPStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computeBPStatistics(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeBPStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -393,7 +674,8 @@ DefinePyFunction(VBMManager, computeIncrementalAlpha) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computeIncrementalAlpha(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeIncrementalAlpha(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -408,7 +690,8 @@ DefinePyFunction(VBMManager, compareProgenitors) {
         onError("Model is NULL.");
     if (progen == NULL)
         onError("Progen is NULL.");
-    ObjRef(self, VBMManager)->compareProgenitors(model, progen);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ExclusiveWithoutGIL(mgr, mgr->compareProgenitors(model, progen));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -573,7 +856,8 @@ DefinePyFunction(VBMManager, makeFitTable) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->makeFitTable(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->makeFitTable(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -613,6 +897,38 @@ DefinePyFunction(VBMManager, deleteModelFromCache) {
     return Py_BuildValue("i", success ? 1 : 0);
 }
 
+// void deleteFitTable(Model *model)
+DefinePyFunction(VBMManager, deleteFitTable) {
+    PyObject *Pmodel;
+    PyArg_ParseTuple(args, "O!", &TModel, &Pmodel);
+    Model *model = ObjRef(Pmodel, Model);
+    if (model == NULL)
+        onError("Model is NULL!");
+    ObjRef(self, VBMManager)->deleteFitTable(model);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+// void newSearchLevel()
+DefinePyFunction(VBMManager, newSearchLevel) {
+    PyArg_ParseTuple(args, "");
+    ObjRef(self, VBMManager)->newSearchLevel();
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+// void promoteModel(Model *model)
+DefinePyFunction(VBMManager, promoteModel) {
+    PyObject *Pmodel;
+    PyArg_ParseTuple(args, "O!", &TModel, &Pmodel);
+    Model *model = ObjRef(Pmodel, Model);
+    if (model == NULL)
+        onError("Model is NULL!");
+    ObjRef(self, VBMManager)->promoteModel(model);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 //double getSampleSz()
 DefinePyFunction(VBMManager, getSampleSz) {
     PyArg_ParseTuple(args, "");
@@ -646,22 +962,61 @@ DefinePyFunction(VBMManager, computePercentCorrect) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, VBMManager)->computePercentCorrect(model);
+    VBMManager *mgr = ObjRef(self, VBMManager);
+    ComputeWithoutGIL(mgr, mgr->computePercentCorrect(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
 
-//long getMemUsage()
-// This memory usage function doesn't work on Mac OS X, and perhaps other platforms.
+//double getMemUsage() - total bytes held, as in getMemoryStats
 DefinePyFunction(VBMManager, getMemUsage) {
-    static char *oldBrk = 0;
     PyArg_ParseTuple(args, "");
-    if (oldBrk == 0)
-        oldBrk = (char*) sbrk(0);
-    double used = ((char*) sbrk(0)) - oldBrk;
+    double used = ObjRef(self, VBMManager)->getMemUsage();
     return Py_BuildValue("d", used);
 }
 
+// Table getInputTable()
+DefinePyFunction(VBMManager, getInputTable) {
+    PyArg_ParseTuple(args, "");
+    return inputTable(self, ObjRef(self, VBMManager), false);
+}
+
+// Table getTestTable()
+DefinePyFunction(VBMManager, getTestTable) {
+    PyArg_ParseTuple(args, "");
+    return inputTable(self, ObjRef(self, VBMManager), true);
+}
+
+// Table getFitTable(Model)
+DefinePyFunction(VBMManager, getFitTable) {
+    return fitTable(self, ObjRef(self, VBMManager), args);
+}
+
+// Table getProjection(Model, int index)
+DefinePyFunction(VBMManager, getProjection) {
+    return projectionTable(self, ObjRef(self, VBMManager), args);
+}
+
+//dict getTableCacheStats()
+DefinePyFunction(VBMManager, getTableCacheStats) {
+    PyArg_ParseTuple(args, "");
+    TableCacheStats stats;
+    ObjRef(self, VBMManager)->getTableCacheStats(stats);
+    return Py_BuildValue("{s:L,s:L,s:L,s:l,s:L,s:L}", "hits", stats.hits, "misses", stats.misses,
+            "evictions", stats.evictions, "tables", stats.tables, "bytes", stats.bytes, "budget", stats.budget);
+}
+
+//dict getMemoryStats()
+DefinePyFunction(VBMManager, getMemoryStats) {
+    PyArg_ParseTuple(args, "");
+    MemoryStats stats;
+    ObjRef(self, VBMManager)->getMemoryStats(stats);
+    return Py_BuildValue("{s:L,s:L,s:L,s:L,s:L,s:L,s:L,s:L}", "input", stats.input, "projections",
+            stats.projections, "fit_tables", stats.fitTables, "workspaces", stats.workspaces, "models",
+            stats.models, "attributes", stats.attributes, "arena_unused", stats.arenaUnused, "total",
+            stats.total);
+}
+
 //int hasTestData()
 DefinePyFunction(VBMManager, hasTestData) {
     PyArg_ParseTuple(args, "");
@@ -711,16 +1066,23 @@ static struct PyMethodDef VBMManager_methods[] = {
         PyMethodDef(VBMManager, computePearsonStatistics),
         PyMethodDef(VBMManager, computePercentCorrect),
         PyMethodDef(VBMManager, computeT),
+        PyMethodDef(VBMManager, deleteFitTable),
         PyMethodDef(VBMManager, deleteModelFromCache),
         PyMethodDef(VBMManager, deleteTablesFromCache),
         PyMethodDef(VBMManager, dumpRelations),
         PyMethodDef(VBMManager, getBottomRefModel),
+        PyMethodDef(VBMManager, getFitTable),
+        PyMethodDef(VBMManager, getInputTable),
         PyMethodDef(VBMManager, getDvName),
+        PyMethodDef(VBMManager, getMemoryStats),
         PyMethodDef(VBMManager, getMemUsage),
         PyMethodDef(VBMManager, getOption),
         PyMethodDef(VBMManager, getOptionList),
+        PyMethodDef(VBMManager, getProjection),
         PyMethodDef(VBMManager, getRefModel),
         PyMethodDef(VBMManager, getSampleSz),
+        PyMethodDef(VBMManager, getTableCacheStats),
+        PyMethodDef(VBMManager, getTestTable),
         PyMethodDef(VBMManager, getTopRefModel),
         PyMethodDef(VBMManager, getVariableList),
         PyMethodDef(VBMManager, hasTestData),
@@ -730,9 +1092,11 @@ static struct PyMethodDef VBMManager_methods[] = {
         PyMethodDef(VBMManager, makeChildModel),
         PyMethodDef(VBMManager, makeFitTable),
         PyMethodDef(VBMManager, makeModel),
+        PyMethodDef(VBMManager, newSearchLevel),
         PyMethodDef(VBMManager, printBasicStatistics),
         PyMethodDef(VBMManager, printFitReport),
         PyMethodDef(VBMManager, printOptions),
+        PyMethodDef(VBMManager, promoteModel),
         PyMethodDef(VBMManager, printSizes),
         PyMethodDef(VBMManager, Report),
         PyMethodDef(VBMManager, searchOneLevel),
@@ -843,7 +1207,7 @@ DefinePyFunction(SBMManager, searchOneLevel) {
     }
     if (start->obj == NULL)
         onError("Model is NULL!");
-    models = mgr->getSearch()->search(start->obj);
+    ExclusiveWithoutGIL(mgr, models = mgr->getSearch()->search(start->obj));
     Model **model;
     long count = 0;
     //-- count the models
@@ -963,7 +1327,8 @@ DefinePyFunction(SBMManager, computeInformationStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computeInformationStatistics(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeInformationStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -975,7 +1340,8 @@ DefinePyFunction(SBMManager, computeDFStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computeDFStatistics(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeDFStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -987,7 +1353,8 @@ DefinePyFunction(SBMManager, computeL2Statistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computeL2Statistics(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeL2Statistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -999,7 +1366,8 @@ DefinePyFunction(SBMManager, computePearsonStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computePearsonStatistics(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computePearsonStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1011,7 +1379,8 @@ DefinePyFunction(SBMManager, computeDependentStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computeDependentStatistics(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeDependentStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1023,7 +1392,8 @@ DefinePyFunction(SBMManager, computeBPStatistics) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computeBPStatistics(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeBPStatistics(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1035,7 +1405,8 @@ DefinePyFunction(SBMManager, computeIncrementalAlpha) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computeIncrementalAlpha(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computeIncrementalAlpha(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1050,7 +1421,8 @@ DefinePyFunction(SBMManager, compareProgenitors) {
         onError("Model is NULL.");
     if (progen == NULL)
         onError("Progen is NULL.");
-    ObjRef(self, SBMManager)->compareProgenitors(model, progen);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ExclusiveWithoutGIL(mgr, mgr->compareProgenitors(model, progen));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1182,7 +1554,8 @@ DefinePyFunction(SBMManager, makeFitTable) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->makeFitTable(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->makeFitTable(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
@@ -1215,6 +1588,38 @@ DefinePyFunction(SBMManager, deleteModelFromCache) {
     return Py_BuildValue("i", success ? 1 : 0);
 }
 
+// void deleteFitTable(Model *model)
+DefinePyFunction(SBMManager, deleteFitTable) {
+    PyObject *Pmodel;
+    PyArg_ParseTuple(args, "O!", &TModel, &Pmodel);
+    Model *model = ObjRef(Pmodel, Model);
+    if (model == NULL)
+        onError("Model is NULL!");
+    ObjRef(self, SBMManager)->deleteFitTable(model);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+// void newSearchLevel()
+DefinePyFunction(SBMManager, newSearchLevel) {
+    PyArg_ParseTuple(args, "");
+    ObjRef(self, SBMManager)->newSearchLevel();
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+// void promoteModel(Model *model)
+DefinePyFunction(SBMManager, promoteModel) {
+    PyObject *Pmodel;
+    PyArg_ParseTuple(args, "O!", &TModel, &Pmodel);
+    Model *model = ObjRef(Pmodel, Model);
+    if (model == NULL)
+        onError("Model is NULL!");
+    ObjRef(self, SBMManager)->promoteModel(model);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 // void deleteTablesFromCache()
 DefinePyFunction(SBMManager, deleteTablesFromCache) {
     ObjRef(self, SBMManager)->deleteTablesFromCache();
@@ -1236,22 +1641,61 @@ DefinePyFunction(SBMManager, computePercentCorrect) {
     Model *model = ObjRef(Pmodel, Model);
     if (model == NULL)
         onError("Model is NULL!");
-    ObjRef(self, SBMManager)->computePercentCorrect(model);
+    SBMManager *mgr = ObjRef(self, SBMManager);
+    ComputeWithoutGIL(mgr, mgr->computePercentCorrect(model));
     Py_INCREF(Py_None);
     return Py_None;
 }
 
-//long getMemUsage()
-// This memory usage function doesn't work on Mac OS X, and perhaps other platforms.
+//double getMemUsage() - total bytes held, as in getMemoryStats
 DefinePyFunction(SBMManager, getMemUsage) {
-    static char *oldBrk = 0;
     PyArg_ParseTuple(args, "");
-    if (oldBrk == 0)
-        oldBrk = (char*) sbrk(0);
-    double used = ((char*) sbrk(0)) - oldBrk;
+    double used = ObjRef(self, SBMManager)->getMemUsage();
     return Py_BuildValue("d", used);
 }
 
+// Table getInputTable()
+DefinePyFunction(SBMManager, getInputTable) {
+    PyArg_ParseTuple(args, "");
+    return inputTable(self, ObjRef(self, SBMManager), false);
+}
+
+// Table getTestTable()
+DefinePyFunction(SBMManager, getTestTable) {
+    PyArg_ParseTuple(args, "");
+    return inputTable(self, ObjRef(self, SBMManager), true);
+}
+
+// Table getFitTable(Model)
+DefinePyFunction(SBMManager, getFitTable) {
+    return fitTable(self, ObjRef(self, SBMManager), args);
+}
+
+// Table getProjection(Model, int index)
+DefinePyFunction(SBMManager, getProjection) {
+    return projectionTable(self, ObjRef(self, SBMManager), args);
+}
+
+//dict getTableCacheStats()
+DefinePyFunction(SBMManager, getTableCacheStats) {
+    PyArg_ParseTuple(args, "");
+    TableCacheStats stats;
+    ObjRef(self, SBMManager)->getTableCacheStats(stats);
+    return Py_BuildValue("{s:L,s:L,s:L,s:l,s:L,s:L}", "hits", stats.hits, "misses", stats.misses,
+            "evictions", stats.evictions, "tables", stats.tables, "bytes", stats.bytes, "budget", stats.budget);
+}
+
+//dict getMemoryStats()
+DefinePyFunction(SBMManager, getMemoryStats) {
+    PyArg_ParseTuple(args, "");
+    MemoryStats stats;
+    ObjRef(self, SBMManager)->getMemoryStats(stats);
+    return Py_BuildValue("{s:L,s:L,s:L,s:L,s:L,s:L,s:L,s:L}", "input", stats.input, "projections",
+            stats.projections, "fit_tables", stats.fitTables, "workspaces", stats.workspaces, "models",
+            stats.models, "attributes", stats.attributes, "arena_unused", stats.arenaUnused, "total",
+            stats.total);
+}
+
 //long printBasicStatistics()
 DefinePyFunction(SBMManager, printBasicStatistics) {
     PyArg_ParseTuple(args, "");
@@ -1332,23 +1776,32 @@ static struct PyMethodDef SBMManager_methods[] = {
         PyMethodDef(SBMManager, computePearsonStatistics),
         PyMethodDef(SBMManager, computePercentCorrect),
         PyMethodDef(SBMManager, computeT),
+        PyMethodDef(SBMManager, deleteFitTable),
         PyMethodDef(SBMManager, deleteModelFromCache),
         PyMethodDef(SBMManager, deleteTablesFromCache),
         PyMethodDef(SBMManager, getBottomRefModel),
+        PyMethodDef(SBMManager, getFitTable),
+        PyMethodDef(SBMManager, getInputTable),
+        PyMethodDef(SBMManager, getMemoryStats),
         PyMethodDef(SBMManager, getMemUsage),
         PyMethodDef(SBMManager, getOption),
         PyMethodDef(SBMManager, getOptionList),
+        PyMethodDef(SBMManager, getProjection),
         PyMethodDef(SBMManager, getRefModel),
         PyMethodDef(SBMManager, getSampleSz),
+        PyMethodDef(SBMManager, getTableCacheStats),
+        PyMethodDef(SBMManager, getTestTable),
         PyMethodDef(SBMManager, getTopRefModel),
         PyMethodDef(SBMManager, hasTestData),
         PyMethodDef(SBMManager, initFromCommandLine),
         PyMethodDef(SBMManager, isDirected),
         PyMethodDef(SBMManager, makeFitTable),
         PyMethodDef(SBMManager, makeSbModel),
+        PyMethodDef(SBMManager, newSearchLevel),
         PyMethodDef(SBMManager, printBasicStatistics),
         PyMethodDef(SBMManager, printFitReport),
         PyMethodDef(SBMManager, printOptions),
+        PyMethodDef(SBMManager, promoteModel),
         PyMethodDef(SBMManager, Report),
         PyMethodDef(SBMManager, searchOneLevel),
         PyMethodDef(SBMManager, setFilter),
@@ -1651,6 +2104,38 @@ DefinePyFunction(Model, isEquivalentTo) {
     return Py_BuildValue("i", equivTest ? 1 : 0);
 }
 
+// tuple getSignature() - the relation masks as ints, in signature order. Each int has
+// the key bits of the relation's variables set, so it reads as a set of variables.
+DefinePyFunction(Model, getSignature) {
+    Model *model = ObjRef(self, Model);
+    int count = model->getRelationCount();
+    int keysize = count > 0 ? model->getRelation(0)->getKeySize() : 0;
+    const KeySegment *signature = model->getSignature();
+    PyObject *result = PyTuple_New(count);
+    PyObject *shift = PyLong_FromLong(KEY_SEGMENT_BITS);
+    for (int i = 0; i < count; i++) {
+        PyObject *mask = PyLong_FromLong(0);
+        for (int k = 0; k < keysize; k++) {
+            PyObject *shifted = PyNumber_Lshift(mask, shift);
+            KeySegment bits = ~signature[i * keysize + k] & ((1UL << KEY_SEGMENT_BITS) - 1);
+            PyObject *segment = PyLong_FromUnsignedLong(bits);
+            Py_DECREF(mask);
+            mask = PyNumber_Or(shifted, segment);
+            Py_DECREF(shifted);
+            Py_DECREF(segment);
+        }
+        PyTuple_SET_ITEM(result, i, mask);
+    }
+    Py_DECREF(shift);
+    return result;
+}
+
+// unsigned long long getSignatureHash()
+DefinePyFunction(Model, getSignatureHash) {
+    Model *model = ObjRef(self, Model);
+    return PyLong_FromUnsignedLongLong(model->getSignatureHash());
+}
+
 // void dump()
 DefinePyFunction(Model, dump) {
     Model *model = ObjRef(self, Model);
@@ -1746,6 +2231,8 @@ static struct PyMethodDef Model_methods[] = {
     PyMethodDef(Model, getProgenitor),
     PyMethodDef(Model, getRelation),
     PyMethodDef(Model, isEquivalentTo),
+    PyMethodDef(Model, getSignature),
+    PyMethodDef(Model, getSignatureHash),
     PyMethodDef(Model, setID),
     PyMethodDef(Model, setProgenitor),
     PyMethodDef(Model, getPrintName),
@@ -2359,6 +2846,10 @@ PyMODINIT_FUNC PyInit_occam(void)
         return NULL;
     if (PyType_Ready(&TVariable) < 0)
         return NULL;
+    if (PyType_Ready(&TTable) < 0)
+        return NULL;
+    if (PyType_Ready(&TTableArray) < 0)
+        return NULL;
 
     return m;
 }
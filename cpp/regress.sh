@@ -0,0 +1,71 @@
+#!/bin/sh
+# Copyright © 1990 The Portland State University OCCAM Project Team
+# [This program is licensed under the GPL version 3 or later.]
+# Please see the file LICENSE in the source
+# distribution of this software for license terms.
+
+# regress.sh - runs occ and occsb on the example data files, and compares the reports
+# (model tables and fit statistics) with those in ../examples/expected, which were made
+# before the performance work on fitting, caching and DF. Timing lines are left out.
+# Run from the cpp directory, after building occ and occsb. With -u, the expected
+# reports are rewritten instead, for a change meant to alter the output.
+# The data files are copied without their action, model and search options, since
+# options in a data file take precedence over the command line.
+
+EXPECTED=../examples/expected
+DATA=../examples
+OUT=${TMPDIR:-/tmp}/occam-regress.$$
+update=0
+if [ "$1" = "-u" ]; then
+    update=1
+fi
+mkdir -p $OUT $EXPECTED
+failed=0
+
+for f in bw21t08 fit lhs3b lhs3b2 search stat; do
+    tr -d '\r' < $DATA/$f.in \
+        | sed '/^:\(action\|short-model\|optimize-search-width\|search-levels\)$/,/^$/d' > $OUT/$f.in
+done
+
+run() {
+    name=$1
+    shift
+    "$@" 2>&1 | grep -v "Elapsed time\|Setup time\|seconds" > $OUT/$name.txt
+    if [ $update = 1 ]; then
+        cp $OUT/$name.txt $EXPECTED/$name.txt
+    elif ! diff $EXPECTED/$name.txt $OUT/$name.txt > $OUT/$name.diff; then
+        echo "$name: differs from $EXPECTED/$name.txt"
+        head -20 $OUT/$name.diff
+        failed=1
+    fi
+}
+
+#-- fits: loopless and loop models, neutral and directed
+run fit_loop ./occ -a fit -m "ABD:BCD:ACD" $OUT/fit.in
+run fit_loopless ./occ -a fit -m "AB:BCD" $OUT/fit.in
+run fit_ind ./occ -a fit -m "A:B:C:D" $OUT/fit.in
+run fit_sat ./occ -a fit -m "ABCD" $OUT/fit.in
+run fit_chain ./occ -a fit -m "AB:BC:CD" $OUT/fit.in
+run fit_lhs_d1 ./occ -a fit -m "IV:HTG:HA" $OUT/lhs3b.in
+run fit_lhs_d2 ./occ -a fit -m "IV:HTG:HGA:HT" $OUT/lhs3b.in
+run fit_lhs_d3 ./occ -a fit -m "IV:HTGI" $OUT/lhs3b.in
+run fit_bw_d1 ./occ -a fit -m "IV:ZBD:ZF" $OUT/bw21t08.in
+run fit_bw_d2 ./occ -a fit -m "IV:ZBD:ZDF:ZBF" $OUT/bw21t08.in
+
+#-- variable-based searches
+for f in bw21t08 fit lhs3b lhs3b2 search stat; do
+    run search_$f ./occ -w 3 -L 4 $OUT/$f.in
+done
+run search_s5 ./occ -w 3 -L 5 $OUT/search.in
+
+#-- state-based searches, on the small neutral data, since the dense structure matrix
+#-- used before didn't fit in memory for the larger state spaces
+run sbsearch_s ./occsb -w 3 -L 3 $OUT/search.in
+run sbsearch_s5 ./occsb -w 3 -L 5 $OUT/search.in
+run sbsearch_fit ./occsb -w 3 -L 3 $OUT/fit.in
+
+rm -rf $OUT
+if [ $failed = 0 ] && [ $update = 0 ]; then
+    echo "all reports match $EXPECTED"
+fi
+exit $failed
@@ -0,0 +1,60 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#ifndef ___Arena
+#define ___Arena
+
+#include <mutex>
+
+/**
+ * Arena - block storage for the many small arrays of short-lived search objects. Space
+ * is handed out from large blocks in order, and each block counts its live pieces; when
+ * the last piece of a block is released, the whole block is freed. A search starts each
+ * level in fresh blocks, so the candidates of a level share blocks with each other and
+ * not with the models kept from earlier levels. Once a level is done, the pieces of the
+ * models that survive it are promoted (moved) to separate long-lived blocks; the
+ * discarded candidates then leave their level's blocks empty, and those are freed in
+ * bulk, instead of leaving holes scattered through the heap.
+ * Each piece carries a small header giving its block, so release() needs no arena.
+ */
+class Arena {
+    public:
+        Arena(long blockSize = 16 * 1024);
+        ~Arena();
+
+        //-- space for the current level
+        void *allocate(long bytes);
+        //-- move a piece to long-lived storage, returning its new address. Pieces that are
+        //-- already long-lived, and NULL, are returned as they are.
+        void *promote(void *ptr);
+        //-- release a piece from any arena; NULL is ignored
+        static void release(void *ptr);
+
+        //-- start a new level: later pieces go in new blocks
+        void newLevel();
+
+        //-- bytes in blocks held, and bytes in pieces still live
+        long long getBlockBytes();
+        long long getLiveBytes();
+
+    private:
+        struct Block;
+        struct Piece;
+        Block *newBlock(long bytes, bool kept);
+        void *take(Block *&current, long bytes, bool kept);
+        void releaseLocked(Block *block, long bytes);
+        void freeBlock(Block *block);
+        long blockSize;
+        Block *levelBlock;      // open block for the current level
+        Block *keptBlock;       // open block for promoted pieces
+        Block *blocks;          // all blocks held
+        long long blockBytes;
+        long long liveBytes;
+        std::mutex lock;
+};
+
+#endif
@@ -10,19 +10,38 @@
 
 /**
  * AttributeList - associated with models and relations, an attribute carries a name and a numeric value.
+ * Attribute names are interned to small integer IDs, shared by all lists; the names in attrDescs.h
+ * get the first IDs (in that order), and any other name gets the next free ID when it is first set.
+ * Names match without regard to case, and anything from a "$" on is formatting info and is ignored.
+ * Each list keeps its values in an array indexed by ID, so access by ID is a direct array lookup.
  */
 class AttributeList {
     public:
-        // initialize empty attribute list
-        AttributeList(int size);
+        // initialize empty attribute list. If an arena is given, values are stored there.
+        AttributeList(int size, class Arena *arena = nullptr);
         ~AttributeList();
         long size();
         void reset();
+        // move the values to the arena's long-lived storage
+        void promote();
 
-        // Add an attribute. Names are not copied so the name argument must point to a
-        // permanent string. If an attribute by this name already exists, it is replaced.
+        // Get the ID for an attribute name, interning it if needed. Returns -1 only if the
+        // table of names is full.
+        static int getAttributeID(const char *name);
+        // Get the ID for an attribute name, or -1 if the name has never been interned.
+        static int findAttributeID(const char *name);
+        static const char *getAttributeName(int id);
+
+        // Set or get an attribute by name. If an attribute by this name already exists,
+        // it is replaced. Unset attributes read as -1.
         void setAttribute(const char *name, double value);
         double getAttribute(const char *name);
+
+        // Set or get an attribute by ID
+        void setAttribute(int id, double value);
+        double getAttribute(int id);
+
+        // The index of an attribute is its ID; -1 is returned if it isn't set in this list.
         int getAttributeIndex(const char *name);
         int getAttributeCount();
         double getAttributeByIndex(int index);
@@ -31,8 +50,12 @@ class AttributeList {
         void dump();
 
     private:
-        const char** names;
-        double *values;
+        void grow(int id);
+        void *allocate(long bytes);
+        void release(void *ptr);
+        class Arena *arena;
+        double *values;                 // indexed by attribute ID
+        unsigned long long *present;    // one bit per attribute ID
         int attrCount;
         int maxAttrCount;
 };
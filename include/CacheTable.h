@@ -0,0 +1,175 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#ifndef ___CacheTable
+#define ___CacheTable
+
+#include <string.h>
+
+//-- 64-bit FNV-1a hash of a name, for items which are identified by name
+inline unsigned long long cacheHashName(const char *name) {
+    unsigned long long code = 0xcbf29ce484222325ULL;
+    for (const unsigned char *cp = (const unsigned char *) name; *cp; cp++) {
+        code ^= *cp;
+        code *= 0x100000001b3ULL;
+    }
+    return code;
+}
+
+/**
+ * CacheTable.h - the hash table behind ModelCache and RelCache. Items are found by
+ * their structure rather than by name: the item type provides getCacheHash(), a 64-bit
+ * hash of what identifies it (a relation's variable mask, a model's signature), and
+ * sameCacheKey(), which tells whether two items are the same relation or model. The
+ * table uses open addressing with linear probing; each slot keeps the item's full hash,
+ * so a probe only compares keys when the hashes agree. The table doubles when it gets
+ * 70% full, so lookups stay short however large the cache grows. Deletion shifts the
+ * following entries back, so no tombstones are left behind.
+ */
+
+struct CacheStats {
+        long count;             // items in the cache
+        long capacity;          // slots in the table
+        double loadFactor;      // count / capacity
+        long long lookups;      // lookups done so far
+        double averageProbes;   // slots examined per lookup
+        long maxProbe;          // longest probe sequence needed to find a current item
+};
+
+template <class T>
+class CacheTable {
+    public:
+        CacheTable() {
+            capacity = INITIAL_CAPACITY;
+            slots = new Slot[capacity];
+            memset(slots, 0, capacity * sizeof(Slot));
+            count = 0;
+            lookups = 0;
+            probes = 0;
+        }
+
+        ~CacheTable() {
+            delete[] slots;
+        }
+
+        //-- find the item with the same key as the given one (which may be that item), or NULL
+        T *find(T *item) {
+            return find(item, item->getCacheHash());
+        }
+
+        T *find(T *item, unsigned long long code) {
+            lookups++;
+            long mask = capacity - 1;
+            for (long i = code & mask;; i = (i + 1) & mask) {
+                probes++;
+                Slot &slot = slots[i];
+                if (slot.item == NULL)
+                    return NULL;
+                if (slot.code == code && (slot.item == item || slot.item->sameCacheKey(item)))
+                    return slot.item;
+            }
+        }
+
+        //-- add an item, unless one with the same key is already present
+        bool insert(T *item) {
+            unsigned long long code = item->getCacheHash();
+            if (find(item, code) != NULL)
+                return false;
+            if ((count + 1) * 10 > capacity * 7)
+                grow();
+            place(item, code);
+            count++;
+            return true;
+        }
+
+        //-- remove this item (not just one with the same key). Returns false if it isn't present.
+        bool remove(T *item) {
+            long mask = capacity - 1;
+            long i = item->getCacheHash() & mask;
+            while (slots[i].item != item) {
+                if (slots[i].item == NULL)
+                    return false;
+                i = (i + 1) & mask;
+            }
+            //-- close the gap, moving back any entry whose probe sequence passes over it
+            long gap = i;
+            for (long j = (i + 1) & mask; slots[j].item != NULL; j = (j + 1) & mask) {
+                long home = slots[j].code & mask;
+                if (((j - home) & mask) >= ((j - gap) & mask)) {
+                    slots[gap] = slots[j];
+                    gap = j;
+                }
+            }
+            slots[gap].item = NULL;
+            slots[gap].code = 0;
+            count--;
+            return true;
+        }
+
+        long getCount() { return count; }
+        long getCapacity() { return capacity; }
+
+        //-- the item in a slot, or NULL; for walking the whole table
+        T *getSlot(long i) { return slots[i].item; }
+
+        long size() { return capacity * sizeof(Slot); }
+
+        void getStats(CacheStats &stats) {
+            stats.count = count;
+            stats.capacity = capacity;
+            stats.loadFactor = (double) count / capacity;
+            stats.lookups = lookups;
+            stats.averageProbes = lookups > 0 ? (double) probes / lookups : 0.0;
+            stats.maxProbe = 0;
+            long mask = capacity - 1;
+            for (long i = 0; i < capacity; i++) {
+                if (slots[i].item == NULL)
+                    continue;
+                long probe = ((i - (long) (slots[i].code & mask)) & mask) + 1;
+                if (probe > stats.maxProbe)
+                    stats.maxProbe = probe;
+            }
+        }
+
+    private:
+        static const long INITIAL_CAPACITY = 1024; // must be a power of 2
+
+        struct Slot {
+                unsigned long long code;
+                T *item;
+        };
+
+        void place(T *item, unsigned long long code) {
+            long mask = capacity - 1;
+            long i = code & mask;
+            while (slots[i].item != NULL)
+                i = (i + 1) & mask;
+            slots[i].code = code;
+            slots[i].item = item;
+        }
+
+        void grow() {
+            Slot *old = slots;
+            long oldCapacity = capacity;
+            capacity *= 2;
+            slots = new Slot[capacity];
+            memset(slots, 0, capacity * sizeof(Slot));
+            for (long i = 0; i < oldCapacity; i++) {
+                if (old[i].item != NULL)
+                    place(old[i].item, old[i].code);
+            }
+            delete[] old;
+        }
+
+        Slot *slots;
+        long capacity;
+        long count;
+        long long lookups;
+        long long probes;
+};
+
+#endif
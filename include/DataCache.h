@@ -0,0 +1,40 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#ifndef ___DataCache
+#define ___DataCache
+
+#include "Table.h"
+#include "VariableList.h"
+
+#include <stdio.h>
+
+/**
+ * DataCache - a binary copy of the parsed data of an input file, so later runs on the
+ * same file can skip parsing the data lines. The cache holds the value map of each
+ * variable, the sorted tuples of the input and test data, and a hash of the source
+ * file and of the options which affect parsing. It is only used if the hash still
+ * matches, and the variables (which are still defined from the options) agree with it.
+ */
+
+//-- hash the whole contents of a file. The file position is restored afterwards.
+unsigned long long ocHashFile(FILE *fd);
+
+//-- mix into a hash the options which affect how data lines are parsed: the variable
+//-- definitions, with their rebinning, whether given in the file or on the command line
+unsigned long long ocHashParseOptions(class Options *options, unsigned long long hash);
+
+//-- load the tables from a cache file, and fill in the variable value maps. Returns
+//-- false, leaving everything untouched, if the cache is missing, stale or unreadable.
+bool ocLoadDataCache(const char *path, unsigned long long sourceHash, VariableList *vars,
+        Table **indata, Table **testdata, int *dataLines, int *testLines);
+
+//-- write a cache file for the tables just read. testdata may be NULL.
+bool ocSaveDataCache(const char *path, unsigned long long sourceHash, VariableList *vars,
+        int dataLines, int testLines, Table *indata, Table *testdata);
+
+#endif
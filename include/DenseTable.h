@@ -0,0 +1,73 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#ifndef ___DenseTable
+#define ___DenseTable
+
+#include "Relation.h"
+#include "Table.h"
+#include "VariableList.h"
+
+//-- state spaces up to this many cells are fit densely unless set otherwise; each thread
+//-- fitting then holds one array of this many doubles
+const long long DEFAULT_DENSE_LIMIT = 1 << 20;
+//-- a dense fit visits every cell on every step, while a sparse one only visits the
+//-- nonzero tuples, so it is only used when the starting fit fills at least this
+//-- fraction of the cells. Full fits run about twice as fast dense; at a third full,
+//-- the sparse loop is already several times faster.
+const double DEFAULT_DENSE_FILL = 0.5;
+
+/**
+ * DenseTable - a distribution over the whole state space, kept as a flat array with
+ * one cell per state, rather than as sorted keys. A cell's index is the mixed-radix
+ * number formed from the variables' values (the last variable varies fastest), so a
+ * relation's marginal is a sum along the other variables' axes, and an IPF step is a
+ * multiply of each cell by its marginal's ratio. This is only worthwhile when the state
+ * space is small enough to hold, but then it avoids all key compares and lookups.
+ * IPF fits of such models are done here, and the result is stored back into a Table.
+ */
+class DenseTable {
+    public:
+        DenseTable(VariableList *vars);
+        ~DenseTable();
+        long long size();
+
+        //-- the number of cells in the state space, or -1 if it is over the limit
+        static long long cellCount(VariableList *vars, long long limit);
+
+        //-- fill with the orthogonal expansion of a relation's projection
+        void expand(Relation *rel, Table *relTable);
+        //-- fill from a (full key) table
+        void load(Table *table);
+        //-- store the nonzero cells into a table, sorted by key
+        void store(Table *table);
+
+        //-- one IPF step: scale each cell so the relation's marginal matches relTable.
+        //-- Cells whose input or computed marginal is zero are set to zero. Returns the
+        //-- largest difference between an input marginal and the computed one.
+        double fitRelation(Relation *rel, Table *relTable);
+
+    private:
+        //-- the stride of each variable in a relation's marginal array, 0 for variables
+        //-- not in the relation; returns the number of marginal cells
+        long long relationStrides(Relation *rel, long long *relStride);
+        //-- the marginal cell of each tuple of a relation's table
+        long long marginalIndex(KeySegment *key, long long *relStride);
+
+        VariableList *varList;
+        int varCount;
+        int keysize;
+        long long cells;
+        int *card;              // cardinality of each variable
+        long long *stride;      // stride of each variable in the cell array
+        double *data;
+        double *target;         // scratch: input marginal of the current relation
+        double *marginal;       // scratch: computed marginal of the current relation
+        long long marginalMax;
+};
+
+#endif
@@ -10,12 +10,13 @@
 
 #include "Types.h"
 
-extern class VariableList* sort_var_list;
-extern int sort_count;
-extern int* sort_vars;
-extern KeySegment** sort_keys;
-extern class Table* sort_table;
+//-- orderKeys - sort an index array into report order of the keys it refers to. The keys
+//-- are the tuples of table, or if keys is not NULL, entries of that array. The first
+//-- varCount variables are compared, or if varIndices is not NULL, the ones it lists.
+void orderKeys(int *order, long long count, class VariableList *vars, int varCount, int *varIndices,
+        KeySegment **keys, class Table *table);
 
-int sortKeys(const void*, const void*);
+//-- compare printable values, comparing all-digit values as numbers
+int strcmpAccountingForNumbers(const char* s1, const char* s2);
 
 #endif
@@ -11,7 +11,14 @@
 #include "Model.h"
 #include "Options.h"
 #include "VarIntersect.h"
+#include <atomic>
 #include <map>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <unordered_map>
+#include <utility>
+#include <vector>
 
 /**
  * ocIntersectProcessor - this is a base class for processing classes
@@ -37,6 +44,70 @@ class ocIntersectProcessor {
         virtual void process(bool sign, Relation *rel, int count = 1) = 0;
 };
 
+//-- hash for an intersection term's (relation, startIndex)
+struct VarIntersectHash {
+        size_t operator()(const std::pair<Relation*, int> &key) const {
+            return std::hash<Relation*>()(key.first) * 31 + key.second;
+        }
+};
+
+/**
+ * ManagerWorkspace - the scratch tables and intersect storage used while fitting a
+ * model. The manager keeps one workspace per thread, so several threads can fit
+ * models at once against the same input data. A thread's workspaces are deleted
+ * when it exits, so the threads of a pool which come and go don't leave theirs behind.
+ */
+struct ManagerWorkspace {
+        ManagerWorkspace();
+        ~ManagerWorkspace();
+        class Table *fitTable1;
+        class Table *fitTable2;
+        class Table *projTable;
+        class DenseTable *dense;
+        //-- the processor for BP transmissions, kept between models
+        ocIntersectProcessor *bpProcessor;
+
+        //-- intersection processing: each level's terms with their variables as bitsets,
+        //-- and the terms at the next level, by (relation, startIndex)
+        std::vector<VarIntersect> intersectLevel, nextLevel;
+        std::vector<unsigned long long> levelBits, nextBits, baseBits, intersectBits;
+        std::unordered_map<std::pair<Relation*, int>, int, VarIntersectHash> nextIndex;
+        //-- the relation over each variable set met, keyed by the bitset's bytes
+        std::unordered_map<std::string, Relation*> intersectRelations;
+        //-- the relations of the last model processed, and all the terms it produced
+        std::vector<Relation*> termRelations;
+        std::vector<VarIntersect> terms;
+};
+
+/**
+ * TableCacheStats - counters for the cache of relation projection tables. A hit is a
+ * request for a projection which was already present; a miss means it had to be made.
+ */
+struct TableCacheStats {
+        long long hits;
+        long long misses;
+        long long evictions;
+        long tables;            // projections currently held
+        long long bytes;        // their total size
+        long long budget;       // limit on bytes, or 0 for no limit
+};
+
+/**
+ * MemoryStats - the bytes held by each part of a manager. The sizes are worked out from
+ * the objects themselves (the capacity of each table and array), so storage counts the
+ * same whether the allocator got it from the heap or by mmap.
+ */
+struct MemoryStats {
+        long long input;        // input and test data
+        long long projections;  // the relation cache: relations and their projection tables
+        long long fitTables;    // fit tables kept with models
+        long long workspaces;   // each thread's scratch tables for fitting
+        long long models;       // the model cache's slots, and the own storage of all live models
+        long long attributes;   // attribute lists of models and relations
+        long long arenaUnused;  // model arena blocks not holding live storage
+        long long total;
+};
+
 /**
  * ManagerBase - implements base functionality of an ocManager.  This class is the
  * provider for algorithms which manipulate core objects.  The class is extensible,
@@ -109,18 +180,86 @@ class ManagerBase {
         // delete projection tables from all relations in cache
         virtual void deleteTablesFromCache();
 
+        //-- Projection tables are kept in a least-recently-used cache. When a budget is set
+        //-- (in bytes; 0 means no limit) and the projections go over it, the least recently
+        //-- used ones are deleted, and are made again if they are needed later. Tables are
+        //-- only evicted while no thread is inside a TableUse scope, so callers which read
+        //-- projections (statistics, fitting, searches) must run inside one.
+        void setTableBudget(long long bytes);
+        long long getTableBudget() {
+            return tableBudget;
+        }
+        void getTableCacheStats(TableCacheStats &stats);
+
+        //-- IPF warm start. When on, the fit of each model fit by IPF is kept with the model
+        //-- (as part of the table budget above), and a model with loops whose progenitor lies
+        //-- below it in the lattice starts IPF from the progenitor's fit rather than from
+        //-- the expansion of one relation. The progenitor's fit is already in the family of
+        //-- distributions the model can fit, so IPF converges to the same fit, but usually
+        //-- in fewer iterations.
+        void setIPFWarmStart(bool state) {
+            ipfWarmStart = state;
+        }
+        bool getIPFWarmStart() {
+            return ipfWarmStart;
+        }
+        void beginTableUse();
+        void endTableUse();
+
+        class TableUse {
+            public:
+                TableUse(ManagerBase *mgr) : mgr(mgr) {
+                    mgr->beginTableUse();
+                }
+                ~TableUse() {
+                    mgr->endTableUse();
+                }
+            private:
+                ManagerBase *mgr;
+        };
+
         // delete a model from the model cache
         virtual bool deleteModelFromCache(Model *model);
 
+        // delete a model's fit table. Use this rather than Model::deleteFitTable, so that
+        // a fit retained for IPF warm starts is also dropped from the projection cache.
+        void deleteFitTable(Model *model);
+
+        //-- Search levels. The storage of the models made during a level comes from the
+        //-- manager's model arena, in its blocks for that level. When the level is done, the models kept
+        //-- are promoted to long-lived storage, and once the rest are deleted from the
+        //-- cache, the level's blocks are freed together.
+        void newSearchLevel();
+        void promoteModel(Model *model);
+
+        //-- memory held, by part, and in total
+        void getMemoryStats(MemoryStats &stats);
+        long long getMemUsage();
+
 
         // Make a fit table. This function uses the IPF algorithm. The fit table is
         // linked to the model.  If the model already has a fit table, the function
         // returns immediately. False is returned on any error.
-        virtual void fitTestAlgebraic(Model *model, Table* algTable, double missingCard, const FitIntersectMap& map);
         virtual bool makeFitTable(Model *model);
         virtual bool makeFitTableIPF(Model *model);
         virtual bool makeFitTableAlgebraic(Model *model);
 
+        // When the whole state space has at most this many cells (0 = never), and the start
+        // of the fit has nonzero values in at least the given fraction of them, variable-based
+        // models are fit by IPF over a DenseTable instead of sparse tables.
+        void setDenseLimit(long long cells) {
+            denseLimit = cells > 0 ? cells : 0;
+        }
+        long long getDenseLimit() {
+            return denseLimit;
+        }
+        void setDenseFill(double fill) {
+            denseFill = fill > 0 ? fill : 0;
+        }
+        double getDenseFill() {
+            return denseFill;
+        }
+
         // Expand a single tuple into all values of all missing variables, recursively
         void expandTuple(double tupleValue, KeySegment *key, int *missingVars, int missingCount, Table *outTable,
                 int currentMissingVar);
@@ -130,11 +269,19 @@ class ManagerBase {
 
         // Process relations and intersections, as need for DF and H computation
         void doIntersectionProcessing(Model *model, ocIntersectProcessor *proc);
+        // The (projected) relation over the variables in a bitset
+        Relation *getIntersectRelation(ManagerWorkspace *ws, const unsigned long long *bits, int words);
+
+        // Process the terms of a loopless model's junction tree, as needed for DF and H
+        // computation: each relation, then negated, each separator. Returns false, having
+        // processed nothing, if the relations can't be arranged as a junction tree.
+        bool processJunctionTree(Model *model, ocIntersectProcessor *proc);
 
         // Compute degrees of freedom of a model.  This involves computing degrees
         // of freedom of the constituent relations, minus the first order overlaps,
         // plus the second order overlaps, etc. This also computes entropy, though
         // it isn't correct if the model contains loops. For models with loops, use IPF.
+        // For loopless models, only the junction tree's separators are needed.
         void calculateDfAndEntropy(Model *model);
 
         // Determine if the model has loops, and cache this fact for later use
@@ -206,6 +353,10 @@ class ManagerBase {
         class ModelCache *getModelCache() {
             return modelCache;
         }
+        //-- the arena for the models of this manager; pass it to new models
+        class Arena *getModelArena() {
+            return modelArena;
+        }
         class Table *getInputData() {
             return inputData;
         }
@@ -219,6 +370,7 @@ class ManagerBase {
         void getPredictingVars(Model *model, int *varindices, int &varcount, bool includeDeps);
         void getRelevantVars(Model *model, int *varindices, int &varcount, bool includeDeps);
         Relation *getDepRelation();
+        Relation *findIndependentRelation(Model *model);
         Relation *getIndRelation();
 
         //-- generate a model, given the name. This assumes "." as variable separator and
@@ -242,8 +394,14 @@ class ManagerBase {
 
         void printOptions(bool printHTML = false, bool skipNominal = false);
 
-        class Table *getFitTable() {
-            return fitTable1;
+        //-- the fit table most recently computed by the calling thread
+        class Table *getFitTable();
+
+        //-- lock for callers that change the model lattice (searches, making models)
+        //-- while other threads may be using this manager. Statistics and fit tables
+        //-- can be computed from several threads at once without it.
+        std::mutex &getComputeLock() {
+            return computeLock;
         }
         // state based Model functions
         // calculates the number of state constraints generated
@@ -280,22 +438,56 @@ class ManagerBase {
         int keysize;
         double sampleSize;
         double testSampleSize;
-        unsigned long long stateSpaceSize;
         Table *inputData;
         Table *testData;
         double inputH;
         class RelCache *relCache;
         class ModelCache *modelCache;
+        class Arena *modelArena;
         class Options *options;
-        Table *fitTable1;
-        Table *fitTable2;
-        Table *projTable;
+        std::mutex computeLock;
+        //-- guards state shared between threads which is built lazily: the relation
+        //-- cache and projections, the DV order, and the reference model values
+        std::recursive_mutex sharedLock;
+        std::map<std::thread::id, ManagerWorkspace*> workspaces;
+        std::mutex workspaceLock;
+        //-- get the calling thread's workspace, creating it on first use
+        ManagerWorkspace *workspace();
+        //-- delete the calling thread's workspace, when the thread exits
+        void releaseWorkspace();
+        friend struct WorkspaceOwner;
+        //-- the projection cache. The resident list and byte count are guarded by
+        //-- sharedLock; tableUsers by tableUseLock, which is also held
+        //-- while evicting, so no thread can start using tables meanwhile.
+        //-- Each entry is a relation's projection or, for IPF warm starts, a model's
+        //-- retained fit table; exactly one of rel and model is set. The retained fits
+        //-- are kept by model, so that deleting one doesn't search the list.
+        struct ResidentTable {
+                Relation *rel;
+                Model *model;
+                long long bytes;
+        };
+        void trimTables();
+        std::vector<ResidentTable> tableResident;
+        std::unordered_map<Model*, long long> retainedFits;
+        long long tableBytes;
+        long long tableBudget;
+        std::atomic<unsigned long long> tableClock;
+        std::atomic<long long> tableHits, tableMisses, tableEvictions;
+        std::mutex tableUseLock;
+        int tableUsers;
+        bool ipfWarmStart;
+        long long denseLimit;
+        double denseFill;
+        int makeFitTableMapped(Table **tableList, KeySegment **maskList, int relCount, double maxiter, double delta2,
+                double &error);
+        int makeFitTableDense(Model *model, Relation **relList, Table **tableList, int relCount, int startRel,
+                double maxiter, double delta2, double &error);
+        void retainFit(Model *model, Table *fit);
+        bool copyProgenitorFit(Model *model, Table *fit);
         int dataLines;
         int *DVOrder;
         int useInverseNotation;
-        VarIntersect *intersectArray;
-        int intersectCount;
-        int intersectMax;
         double functionConstant;
         double negativeConstant;
         bool valuesAreFunctions;
@@ -10,17 +10,29 @@
 
 #include "ModelCache.h"
 #include "Relation.h"
+#include <vector>
+
+class SparseRank;
 
 /**
  * Model - defines a model as a list of Relations.
  */
 class Model {
     public:
-        // initialize model, with space for the given number of relations
-        Model(int size = 2);
+        // initialize model, with space for the given number of relations. If an arena is
+        // given (normally the manager's model arena), the model's arrays are stored there.
+        Model(int size = 2, class Arena *arena = nullptr);
         ~Model();
         void deleteStructMatrix();
+        void deleteStructRank();
+        // move the model's storage out of the current search level's arena blocks, for a
+        // model kept past the end of the level
+        void promote();
         long size();
+        // the bytes held by every live model of an arena, cached or not, in three parts:
+        // the models' own storage, their fit tables, and their attribute lists
+        static void getLiveSizes(class Arena *arena, long long &models, long long &fitTables,
+                long long &attributes);
 
         bool isStateBased();
 
@@ -32,6 +44,13 @@ class Model {
         Table *getFitTable();
         void setFitTable(Table *tbl);
         void deleteFitTable();
+        // the manager's use clock when the retained fit table was last used
+        void setLastUse(unsigned long long stamp) {
+            lastUse.store(stamp, std::memory_order_relaxed);
+        }
+        unsigned long long getLastUse() {
+            return lastUse.load(std::memory_order_relaxed);
+        }
         void deleteRelationLinks();
 
         // copy relation references (but not the objects)
@@ -43,18 +62,12 @@ class Model {
         }
         void setAttribute(const char *name, double value);
         double getAttribute(const char *name);
+        void setAttribute(int id, double value);
+        double getAttribute(int id);
 
         // get a printable name for the relation, using the variable abbreviations
         const char *getPrintName(int useInverse = 0);
 
-        // set, get hash chain linkages
-        Model *getHashNext() {
-            return hashNext;
-        }
-        void setHashNext(Model *next) {
-            hashNext = next;
-        }
-
         // Checks if this model contains the specified relation.  That is, checks if any of
         // the model's relations *contain* this relation, not if any of them *are* this relation.
         bool containsRelation(Relation *relation, ModelCache *cache=NULL);
@@ -64,6 +77,21 @@ class Model {
         bool containsModel(Model *childModel);
 
         bool isEquivalentTo(Model *other);
+
+        // The signature is the canonical identity of the model: the variable masks of its
+        // relations, sorted, one key (getKeySize segments) per relation. It is built on
+        // first use and kept until the relations change.
+        const KeySegment *getSignature();
+        // 64-bit hash for hash tables. Models that are equivalent always hash alike. For
+        // state-based models, which can be equivalent with different relations, this is a
+        // hash of the union of the relation masks and of the span of the structure
+        // matrix rows, rather than of the whole signature.
+        unsigned long long getSignatureHash();
+        bool sameSignature(Model *other);
+        // Key for the model cache. Variable-based models are keyed by their signature;
+        // state-based ones, whose relations aren't identified by their masks, by name.
+        unsigned long long getCacheHash();
+        bool sameCacheKey(Model *other);
         // set and get for progenitor model.  (The model from which this one was derived in a search.)
         Model *getProgenitor() {
             return progenitor;
@@ -83,11 +111,11 @@ class Model {
         void dump(bool detail = false);
 
         // state based models need to make structure matrix for DF calculation
-        void makeStructMatrix(int statespace, VariableList *vars, int **stateSpaceArr);
-        int* getIndicesFromKey(KeySegment *key, VariableList *vars, int statespace,
-                int **stateSpaceArr, int *counter);
+        void makeStructMatrix(VariableList *vars);
+        int* getIndicesFromKey(KeySegment *key, VariableList *vars, int *counter);
         void completeSbModel();
-        int** makeStateSpaceArray(VariableList *varList, int statespace = 0);
+        // the structure matrix rows, in echelon form; kept for deriving the rank of children
+        SparseRank *getStructRank();
 
         void printStructMatrix();
         int **getStructMatrix(int *statespace, int *totalConst);
@@ -104,13 +132,23 @@ class Model {
         int relationCount;
         int maxRelationCount;
         class Table *fitTable;
+        std::atomic<unsigned long long> lastUse;
         class AttributeList *attributeList;
-        Model *hashNext;
         char *printName;
         char *inverseName;
         int **structMatrix;
+        std::vector<std::vector<int> > structRows; // the states covered by each constraint
+        SparseRank *structRank;
         long totalConstraints;
         int stateSpaceSize;
+        KeySegment *signature;
+        unsigned long long signatureHash;
+        void makeSignature();
+        void deleteSignature();
+        void *allocate(long bytes);
+        void release(void *ptr);
+        class Arena *arena;
+        Model *liveNext, *livePrev; // the list of live models, for getLiveSizes()
 };
 
 #endif
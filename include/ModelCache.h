@@ -16,7 +16,8 @@
  * There must be a separate model cache for each different problem instance.
  *
  */
-#define MODELCACHE_HASHSIZE 1001
+#include "CacheTable.h"
+
 class ModelCache {
     public:
 	//-- construct an empty model cache
@@ -26,6 +27,8 @@ class ModelCache {
 	~ModelCache();
 
 	long size();
+	//-- the bytes of the cache's own slots, without the models in them
+	long getTableSize();
 
 	//-- addModel - put a new model in the cache. If a matching model already
 	//-- exists, an error is returned.
@@ -35,14 +38,17 @@ class ModelCache {
 	//-- returns true if successful, false if not found.
 	bool deleteModel(class Model *model);
 
-	//-- findModel - find a model in the cache.  Null is returned if the given
-	//-- model doesn't exist.
-	class Model *findModel(const char *name);
+	//-- findModel - find the model in the cache with the same relations as the given
+	//-- one (which need not be cached).  Null is returned if there is none.
+	class Model *findModel(class Model *model);
+
+	//-- getStats - table size, load factor and probe lengths
+	void getStats(CacheStats &stats);
 
 	void dump();
 
     private:
-	class Model **hash;
+	CacheTable<class Model> *table;
 };
 
 #endif
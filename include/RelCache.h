@@ -17,7 +17,8 @@
  * There must be a separate relation cache for each different problem instance.
  *
  */
-#define RELCACHE_HASHSIZE 1001
+#include "CacheTable.h"
+
 class RelCache {
     public:
 	//-- construct an empty relation cache
@@ -27,6 +28,9 @@ class RelCache {
 	~RelCache();
 
 	long size();
+	//-- the bytes held by the cached relations with their projection tables, and by
+	//-- their attribute lists
+	void getSizes(long long &relations, long long &attributes);
 
 	//-- delete projection tables from all relations in cache
 	void deleteTables();
@@ -35,14 +39,17 @@ class RelCache {
 	//-- exists, an error is returned.
 	bool addRelation(class Relation *rel);
 
-	//-- findRelation - find a relation in the cache.  Null is returned if the given
-	//-- relation doesn't exist.
-	class Relation *findRelation(const char *name);
+	//-- findRelation - find the relation in the cache with the same variables (and
+	//-- states) as the given one.  Null is returned if there is none.
+	class Relation *findRelation(class Relation *rel);
+
+	//-- getStats - table size, load factor and probe lengths
+	void getStats(CacheStats &stats);
 
 	void dump();
 
     private:
-	class Relation **hash;
+	CacheTable<class Relation> *table;
 };
 
 #endif
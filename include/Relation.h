@@ -10,6 +10,7 @@
 
 #include "Table.h"
 #include "VariableList.h"
+#include <atomic>
 
 /*
  * Relation - defines a list of variables, and optionally a table which has been
@@ -68,6 +69,15 @@ class Relation {
         // deletes the projection table to recover storage
         void deleteTable();
 
+        // the manager's use clock when the projection was last asked for; used to pick
+        // the least recently used projections when they must be evicted
+        void setLastUse(unsigned long long stamp) {
+            lastUse.store(stamp, std::memory_order_relaxed);
+        }
+        unsigned long long getLastUse() {
+            return lastUse.load(std::memory_order_relaxed);
+        }
+
         // sets/gets the state constraints for the relation
         void setStateConstraints(class StateConstraint *constraints);
         StateConstraint *getStateConstraints();
@@ -103,24 +113,23 @@ class Relation {
         void sort();
         static void sort(int *vars, int varcount, int *states = nullptr);
 
-        // set, get hash chain linkages
-        Relation *getHashNext() {
-            return hashNext;
-        }
-        void setHashNext(Relation *next) {
-            hashNext = next;
-        }
-
         // get the attribute list for the relation
         class AttributeList *getAttributeList() {
             return attributeList;
         }
         void setAttribute(const char *name, double value);
         double getAttribute(const char *name);
+        void setAttribute(int id, double value);
+        double getAttribute(int id);
 
         // get a printable name for the relation, using the variable abbreviations
         const char *getPrintName(int useInverse = 0);
 
+        // Key for the relation cache. Variable-based relations are keyed by their mask;
+        // state-based ones, which can share a mask, by name.
+        unsigned long long getCacheHash();
+        bool sameCacheKey(Relation *other);
+
         // get a tuple value from the projection table, which matches the key passed in.
         // the key may contain don't cares but must have actual values for all the variables
         // of this relation (otherwise zero is returned).
@@ -138,9 +147,9 @@ class Relation {
         // variable in the rel,DONT_CARE if no state specified
         int varCount; // number of vars in relation
         int maxVarCount; // size of vars array
-        class Table *table;
+        std::atomic<class Table *> table; // read without the manager's lock; see setTable
+        std::atomic<unsigned long long> lastUse;
         class StateConstraint *stateConstraints; // state constraints
-        Relation *hashNext; // linkage for storing relations in a hash table
         KeySegment *mask; // mask has zero for variables in this rel, 1's elsewhere
         class AttributeList *attributeList;
         char *printName;
@@ -32,7 +32,6 @@ class dv_Data{
     int *rule_index;
 };
 
-int sortKeys(const void *d1, const void *d2);
 int sortCompare(const void *k1, const void *k2);
 void orderIndices(const char **stringArray, int len, int *order);
 
@@ -0,0 +1,56 @@
+/*
+ * Copyright © 1990 The Portland State University OCCAM Project Team
+ * [This program is licensed under the GPL version 3 or later.]
+ * Please see the file LICENSE in the source
+ * distribution of this software for license terms.
+ */
+
+#ifndef ___SparseRank
+#define ___SparseRank
+
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+/**
+ * SparseRank - the rank of a set of 0/1 rows over the state space, such as the rows
+ * of a state-based model's structure matrix. Rows are added one at a time, and kept
+ * in echelon form as sparse rows, one for each leading column. The arithmetic is
+ * modulo a prime near 2^61, so no pivot is lost to rounding as it can be in floating
+ * point; but the rank is not exact. A rank modulo p is never above the true rank, and
+ * falls short of it if p divides every nonzero minor of that size, which for a prime
+ * this large is very unlikely, though not impossible. Since a short rank would change
+ * a model's DF, and make models look equivalent that are not, a second basis is kept
+ * modulo another prime, and a row counts as raising the rank if it does so modulo
+ * either prime. The rank is then short only if both primes miss the same row.
+ * Since adding rows never changes the rows already kept, the rank of a model plus
+ * one more relation is found from a copy of the model's basis.
+ */
+class SparseRank {
+    public:
+        SparseRank();
+
+        //-- add a row with a one in each of the given columns, which must be ascending.
+        //-- Returns true if the row raised the rank.
+        bool addRow(const int *cols, int count);
+
+        long long getRank() { return rank; }
+
+        //-- a hash of the span of the rows: any rows with the same span give the same hash.
+        //-- It is taken over the reduced echelon form modulo the first prime, which the
+        //-- span determines.
+        unsigned long long getSpanHash();
+
+        //-- the bytes used by the basis
+        long size();
+
+    private:
+        typedef std::vector<std::pair<int, unsigned long long> > Row;
+        typedef std::unordered_map<int, Row> Basis;    // basis rows by leading column; each leads with 1
+        static bool reduce(Row &row, Basis &basis, unsigned long long prime);
+        Basis pivots;           // modulo the first prime
+        Basis checkPivots;      // modulo the second prime
+        long long rank;         // rows that raised the rank modulo either prime
+};
+
+#endif
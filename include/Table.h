@@ -15,9 +15,9 @@
 #include <stdio.h>
 
 /*
- * Table - defines a data table, which is a collection of tuples. The tuples are stored
- * in a contiguous table.  Since tuples are variable sized, the Table object stores the
- * size information for the tuple storage.
+ * Table - defines a data table, which is a collection of tuples. The keys and the values
+ * of the tuples are stored in two contiguous arrays.  Since keys are variable sized, the
+ * Table object stores the size information for the key storage.
  */
 
 class Relation;
@@ -35,6 +35,10 @@ class Table {
         void addTuple(KeySegment *key, double value); // append to end
         void insertTuple(KeySegment *key, double value, long long index); // insert in given spot
         void sumTuple(KeySegment *key, double value); // add (or) this value to matching tuple
+        //-- like sumTuple, but a new key is appended rather than inserted in order, and
+        //-- found again through the hash index, which grows with the table. Tuples stay in
+        //-- the order their keys first appeared, until sort() is called.
+        void accumulateTuple(KeySegment *key, double value);
 
         //-- key and value access functions
         double getValue(long long index);
@@ -53,8 +57,51 @@ class Table {
         }
 
         void sort(); // sort tuples by key
+
+        //-- sort the tuples by key, then combine tuples with equal keys into one, adding
+        //-- their values. Tuples can be appended in any order with addTuple and merged
+        //-- with this afterwards, which is much faster than keeping the table sorted
+        //-- with sumTuple when there are many distinct keys. If the first sortedCount
+        //-- tuples are already sorted and summed, they are merged with the rest instead.
+        void sortAndSum(long long sortedCount = 0);
         void reset(int keysize); // reset table to empty, but reuse the storage
 
+        //-- hash index over the keys of a sorted table. For tables marked with
+        //-- setIndexed, it is built by sort(), and dropped whenever tuples are added or
+        //-- moved (except by accumulateTuple). While it is valid, exact-match lookups in
+        //-- indexOf and updates of existing tuples in sumTuple use it instead of the
+        //-- binary search.
+        void buildIndex();
+        void dropIndex();
+        bool isIndexed() {
+            return hashSlots != NULL;
+        }
+        // keep the index on this table once sorted. Only the tables that get many lookups
+        // over their lifetime ask for it: the input data and the relation projections.
+        void setIndexed(bool enable) {
+            indexed = enable;
+        }
+        // enable or disable the index for all tables (on by default)
+        static void setIndexing(bool enable) {
+            indexing = enable;
+        }
+        static bool getIndexing() {
+            return indexing;
+        }
+
+        //-- raw access to the tuple storage: the keys, keysize segments per tuple, and
+        //-- the values, one per tuple, each in one contiguous array. This lets a sorted
+        //-- table be saved and restored in binary form (see DataCache), and scanned or
+        //-- viewed as arrays without copying. setTupleData copies count tuples, which
+        //-- must already be sorted by key.
+        const KeySegment *getKeyData() {
+            return keys;
+        }
+        const ocTupleValue *getValueData() {
+            return values;
+        }
+        void setTupleData(const KeySegment *keys, const ocTupleValue *values, long long count);
+
         // dump debug output
         void dump(bool detail = false);
 
@@ -71,11 +118,19 @@ class Table {
         double getLowestValue();
 
     private:
-        void* data; // storage for all keys and values
+        KeySegment *keys; // the key of each tuple, keysize segments each
+        ocTupleValue *values; // the value of each tuple
         int keysize; // number of key segments in the key for each tuple
         long long tupleCount; // number of tuples in the tuple array
-        long long maxTupleCount; // the total size of the data member, in terms of tuples
+        long long maxTupleCount; // the number of tuples there is storage for
+        void grow();
         TableType type; // one of INFO_TYPE, SET_TYPE
+        long long *hashSlots; // open addressing slots holding tuple indices, or -1; NULL if no index
+        long long hashMask; // slot count - 1 (slot count is a power of 2)
+        long long hashFind(KeySegment *key);
+        void indexTuples(long long slots);
+        bool indexed; // build the index when sorted; see setIndexed
+        static bool indexing;
 };
 
 template <typename F>
@@ -85,12 +140,7 @@ void tableIteration(Table* input_table, VariableList* varlist, Relation* rel,
     long long dataCount = input_table->getTupleCount();
     int *key_order = new int[dataCount];
     for (long long i = 0; i < dataCount; i++) { key_order[i] = i; }
-    sort_var_list = varlist;
-    sort_count = var_count;
-    sort_vars = nullptr;
-    sort_keys = nullptr;
-    sort_table = input_table;
-    qsort(key_order, dataCount, sizeof(int), sortKeys);
+    orderKeys(key_order, dataCount, varlist, var_count, nullptr, nullptr, input_table);
     if (fit_table == NULL) { fit_table = input_table; }
     if (indep_table == NULL) { indep_table = fit_table; }
 
@@ -121,12 +171,7 @@ void tableKVIteration(Table* table, VariableList* varlist, long var_count, F act
     char* keystr = new char[var_count * MAXABBREVLEN + 1];
     int *key_order = new int[dataCount];
     for (long long i = 0; i < dataCount; i++) { key_order[i] = i; }
-    sort_var_list = varlist;
-    sort_count = var_count;
-    sort_vars = nullptr;
-    sort_keys = nullptr;
-    sort_table = table;
-    qsort(key_order, dataCount, sizeof(int), sortKeys);
+    orderKeys(key_order, dataCount, varlist, var_count, nullptr, nullptr, table);
     for (long long order_i = 0; order_i < dataCount; order_i++) {
         int i = key_order[order_i];
         KeySegment* key = table->getKey(i);
@@ -9,6 +9,9 @@
 #define ___VariableList
 
 #include "Variable.h"
+#include <string>
+#include <unordered_map>
+#include <vector>
 
 /**
  * VariableList - defines a list of variables for the current problem. A public
@@ -70,6 +73,12 @@ class VariableList {
         //-- get the printable variable value from a given value index
         const char *getVarValue(int varindex, int valueindex);
 
+        //-- get the display rank of each value index of a variable: the position of its
+        //-- printable value in report order (numeric values compared as numbers). The
+        //-- array covers every value a key field can hold, so it can be indexed by
+        //-- Key::getKeyValue directly. Built on first use, and again if values are added.
+        const int *getDisplayRanks(int varindex);
+
         //-- check cardinalities of variables against the data, after input
         bool checkCardinalities();
 
@@ -83,9 +92,13 @@ class VariableList {
         //marks a particular variable as not be considered in the model
         int markForNoUse();
 
-        //Anjali
-        //get the new rebinning value for an old one
-        int getNewValue(int, char*, char*);
+        //-- build the lookup table for a rebinned variable from its old/new value lists,
+        //-- once they are complete
+        void compileRebin(int index);
+
+        //-- get the new rebinning value for an old one (which may be followed by more of
+        //-- the data line), or NULL if the old value is excluded or isn't rebinned
+        const char *getNewValue(int index, const char *old_value);
 
     private:
         Variable *vars;
@@ -97,6 +110,11 @@ class VariableList {
         //long *maskVars;		//(Anjali) this should store the positions of variables which are to be ignored
         int noUseMaskSize;
         bool *noUseMask;
+        int **displayRanks; // per variable; NULL until needed
+        std::vector<std::unordered_map<std::string, int> > valueIndexes; // per variable, value -> index
+        std::vector<std::unordered_map<std::string, const char*> > rebinMaps; // per variable, old -> new value
+        std::vector<const char*> rebinDefaults; // per variable, the new value for any other ("*"), or NULL
+        void deleteDisplayRanks();
 };
 
 #endif
@@ -1,6 +1,7 @@
 from .model import Model
 from .report import Report
 from .sbm_manager import SBMManager
+from .table import Table
 from .variable import Variable
 from .variable_list import VariableList
 from .vbm_manager import VBMManager
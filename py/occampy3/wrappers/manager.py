@@ -1,8 +1,9 @@
 from enum import Enum
-from typing import List, Sequence, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 from model import Model, ModelType
 from report import Report
+from table import Table
 
 
 class SearchDirection(Enum):
@@ -131,9 +132,26 @@ class Manager:
     def mem_usage(self) -> int:
         return self._ref.getMemUsage()
 
+    @property
+    def memory_stats(self) -> Dict[str, int]:
+        return self._ref.getMemoryStats()
+
+    @property
+    def table_cache_stats(self) -> Dict[str, int]:
+        return self._ref.getTableCacheStats()
+
     def delete_model_from_cache(self, model: Model) -> bool:
         return self._ref.deleteModelFromCache(model.ref)
 
+    def delete_fit_table(self, model: Model) -> None:
+        self._ref.deleteFitTable(model.ref)
+
+    def new_search_level(self) -> None:
+        self._ref.newSearchLevel()
+
+    def promote_model(self, model: Model) -> None:
+        self._ref.promoteModel(model.ref)
+
     def compute_percent_correct(self, model: Model) -> None:
         self._ref.computePercentCorrect(model.ref)
 
@@ -143,6 +161,24 @@ class Manager:
     def make_fit_table(self, model: Model) -> None:
         self._ref.makeFitTable(model.ref)
 
+    @property
+    def input_table(self) -> Table:
+        return Table(self._ref.getInputTable())
+
+    @property
+    def test_table(self) -> Optional[Table]:
+        ref = self._ref.getTestTable()
+        return Table(ref) if ref is not None else None
+
+    def fit_table(self, model: Model) -> Table:
+        return Table(self._ref.getFitTable(model.ref))
+
+    def projection(self, model: Model, index: int) -> Table:
+        """
+        The projection of the input data onto the model's relation at this index
+        """
+        return Table(self._ref.getProjection(model.ref, index))
+
     def print_options(self, print_html: bool, skip_nominal: bool) -> None:
         self._ref.printOptions(print_html, skip_nominal)
 
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Union
+from typing import List, Tuple, Union
 
 
 class ModelType(Enum):
@@ -26,6 +26,13 @@ class Model:
     def __eq__(self, other: 'Model') -> bool:
         return self.ref.isEquivalentTo(other.ref)
 
+    def __hash__(self) -> int:
+        return self.ref.getSignatureHash()
+
+    @property
+    def signature(self) -> Tuple[int, ...]:
+        return self.ref.getSignature()
+
     @property
     def name(self) -> str:
         return self.get_attribute_value("name")
@@ -0,0 +1,74 @@
+from typing import Dict, List, Tuple
+
+
+class Table:
+    """
+    Wrapper class for Table. The arrays share the engine's storage rather than copying it,
+    so they are read-only, and stay valid as long as they are referenced. NumPy is only
+    needed for the array properties.
+    """
+
+    def __init__(self, ref) -> None:
+        """
+        :param: ref: the reference to the Table object returned from the CPP engine
+        """
+        self._ref = ref  # type Table_cpp
+
+    def __len__(self) -> int:
+        return self._ref.getTupleCount()
+
+    @property
+    def key_size(self) -> int:
+        return self._ref.getKeySize()
+
+    @property
+    def key_layout(self) -> List[Tuple[str, int, int, int]]:
+        """
+        The (abbrev, segment, shift, mask) of each variable in the keys
+        """
+        return self._ref.getKeyLayout()
+
+    @property
+    def keys(self) -> 'numpy.ndarray':
+        """
+        The key segments, one row per tuple
+        """
+        import numpy as np
+
+        return np.asarray(self._ref.getKeys())
+
+    @property
+    def values(self) -> 'numpy.ndarray':
+        import numpy as np
+
+        return np.asarray(self._ref.getValues())
+
+    @property
+    def tuples(self) -> 'numpy.ndarray':
+        """
+        The tuples, as a structured array with fields 'key' and 'value'. Unlike the
+        other arrays, this is a copy.
+        """
+        import numpy as np
+
+        keys = self.keys
+        tuples = np.empty(len(keys), dtype=[('key', keys.dtype, (self.key_size,)), ('value', np.float64)])
+        tuples['key'] = keys
+        tuples['value'] = self.values
+        return tuples
+
+    def decode(self) -> Dict[str, 'numpy.ndarray']:
+        """
+        Decode the keys into an integer column of value indices for each variable, by
+        abbreviation. Variables not in the keys (as for a projection) decode to -1.
+        """
+        import numpy as np
+
+        keys = self.keys
+        columns = {}
+        for abbrev, segment, shift, mask in self.key_layout:
+            dont_care = mask >> shift
+            column = ((keys[:, segment] & np.uint64(mask)) >> np.uint64(shift)).astype(np.int64)
+            column[column == dont_care] = -1
+            columns[abbrev] = column
+        return columns
@@ -9,8 +9,9 @@ import heapq
 import re
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Dict, List, Sequence, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import ocGraph
 from model import Model, ModelType
@@ -76,6 +77,7 @@ class OCUtils:
         self._search_levels = 7
         self._search_sort_dir = SortDirection.ASCENDING
         self._search_width = 3
+        self._search_workers = 1
         self._skip_ivi_tables = True
         self._skip_nominal = False
         self._skip_trained_model_table = True
@@ -104,6 +106,12 @@ class OCUtils:
             report_attributes = re.sub(
                 r",\s(?:incr_)?alpha|lr|[ab]ic", '', report_attributes
             )
+        # with warm-started IPF, show how many iterations each fit took
+        if (
+            self._manager.get_option_list("ipf-warm-start")
+            and not re.search('ipf_iterations', report_attributes)
+        ):
+            report_attributes += ", ipf_iterations"
         self._report.set_attributes(report_attributes)
         if re.search('bp_t', report_attributes):
             self._bp_statistics = 1
@@ -165,6 +173,10 @@ class OCUtils:
             width = 1
         self._search_width = width
 
+    def set_search_workers(self, search_workers) -> None:
+        workers = int(round(float(search_workers)))
+        self._search_workers = max(1, workers)
+
     def set_search_levels(self, search_levels) -> None:
         levels = int(round(float(search_levels)))
         levels = max(0, levels)  # zero is OK here
@@ -248,75 +260,149 @@ class OCUtils:
             self._manager.compute_l2_statistics(model)
             self._manager.compute_dependent_statistics(model)
 
-    # this function generates the parents/children of the given model, and for
-    # any which haven't been seen before puts them into the new_model list
-    # this function also computes the LR statistics (H, LR, DF, etc.) as well
-    # as the dependent statistics (dH, %dH, etc.)
-    def process_model(
+    # this function generates the parents/children of the given model, and
+    # returns those which haven't been seen before, marked as processed
+    # if revisits is given, the (model, progenitor) pairs to compare are appended to
+    # it rather than compared at once
+    def new_candidates(
         self,
         level: int,
-        new_models_heap: List[Tuple[Union[str, float], Union[str, float], Model]],
-        model: Model
-    ) -> int:
-        add_count = 0
+        model: Model,
+        revisits: Optional[List[Tuple[Model, Model]]] = None
+    ) -> List[Model]:
+        candidates = []
         generated_models = self._manager.search_one_level(model)
         for new_model in generated_models:
             if new_model.get_attribute_value("processed") <= 0.0:
                 new_model.processed = 1.0
                 new_model.level = level  # Unused?
                 new_model.progenitor = model
-                self.compute_sort_statistic(new_model)
-                # need a fix here (or somewhere) to check for (and remove) models that have the same DF as the progenitor
-                # decorate model with a key for sorting, & push onto heap
-                key = new_model.get_attribute_value(self.sort_name)
-                if self._search_sort_dir == SortDirection.DESCENDING:
-                    key = -key
-                heapq.heappush(
-                    new_models_heap,
-                    ([key, new_model.get_attribute_value("name")], new_model),
-                )  # appending the model name makes sort alphabet-consistent
-                add_count += 1
+                candidates.append(new_model)
             else:
                 if self._incremental_alpha:
                     # this model has been made already, but this progenitor might lead to a better Incr.Alpha
                     # so we ask the manager to check on that, and save the best progenitor
-                    self._manager.compare_progenitors(new_model, model)
-        return add_count
+                    if revisits is not None:
+                        revisits.append((new_model, model))
+                    else:
+                        self._manager.compare_progenitors(new_model, model)
+        return candidates
+
+    # decorate a model with a key for sorting, & push onto heap
+    def push_candidate(
+        self,
+        new_models_heap: List[Tuple[Union[str, float], Union[str, float], Model]],
+        new_model: Model
+    ) -> None:
+        # need a fix here (or somewhere) to check for (and remove) models that have the same DF as the progenitor
+        key = new_model.get_attribute_value(self.sort_name)
+        if self._search_sort_dir == SortDirection.DESCENDING:
+            key = -key
+        heapq.heappush(
+            new_models_heap,
+            ([key, new_model.get_attribute_value("name")], new_model),
+        )  # appending the model name makes sort alphabet-consistent
+
+    # this function generates the parents/children of the given model, and for
+    # any which haven't been seen before puts them into the new_model list
+    # this function also computes the LR statistics (H, LR, DF, etc.) as well
+    # as the dependent statistics (dH, %dH, etc.)
+    def process_model(
+        self,
+        level: int,
+        new_models_heap: List[Tuple[Union[str, float], Union[str, float], Model]],
+        model: Model
+    ) -> int:
+        candidates = self.new_candidates(level, model)
+        for new_model in candidates:
+            self.compute_sort_statistic(new_model)
+            self.push_candidate(new_models_heap, new_model)
+        return len(candidates)
+
+    # parallel version of process_model, for all the models of a level. The
+    # candidates are generated in order, and their sort statistics are computed by
+    # a pool of worker threads. Then, model by model, the progenitors of models
+    # met again are compared and the candidates pushed, in the same order as the
+    # serial search, so every comparison sees the statistics it would there.
+    # Since the heap key includes the model name, the models kept are the same
+    # as with a single worker.
+    def process_models_parallel(
+        self,
+        level: int,
+        new_models_heap: List[Tuple[Union[str, float], Union[str, float], Model]],
+        models: List[Model]
+    ) -> int:
+        generated = []
+        for model in models:
+            revisits = []
+            candidates = self.new_candidates(level, model, revisits)
+            generated.append((revisits, candidates))
+        all_candidates = [new_model for _, candidates in generated for new_model in candidates]
+        with ThreadPoolExecutor(max_workers=self._search_workers) as pool:
+            list(pool.map(self.compute_sort_statistic, all_candidates))
+        for revisits, candidates in generated:
+            for new_model, progenitor in revisits:
+                self._manager.compare_progenitors(new_model, progenitor)
+            for new_model in candidates:
+                self.push_candidate(new_models_heap, new_model)
+        return len(all_candidates)
 
     # This function processes models from one level, and return models for the next level.
     def process_level(
         self, level: int, old_models: List[Model], clear_cache_flag: bool
     ) -> List[Model]:
-        # start a new heap
+        # start a new heap; the candidates of this level are stored together
+        self._manager.new_search_level()
         new_models_heap = []
         full_count = 0
-        for model in old_models:
-            full_count += self.process_model(level, new_models_heap, model)
+        if self._search_workers > 1:
+            full_count = self.process_models_parallel(
+                level, new_models_heap, old_models
+            )
+        else:
+            for model in old_models:
+                full_count += self.process_model(level, new_models_heap, model)
         # if search_width < heapsize, pop off search_width and add to best_models
         best_models = []
+        kept = set()
         while len(new_models_heap) > 0:
             # make sure that we're adding unique models to the list (mostly for state-based)
             key, candidate = heapq.heappop(new_models_heap)
             # if len(best_models) < self._search_width:  # or key[0] == last_key[0]:      # comparing keys allows us to select more than <width> models,
-            if len(best_models) < self._search_width and not any(
-                {n == candidate for n in best_models}
+            if (
+                len(best_models) < self._search_width and candidate not in kept
             ):  # in the case of ties
                 best_models.append(candidate)
+                kept.add(candidate)
             else:
                 break
         trunc_count = len(best_models)
         self._total_gen = full_count + self._total_gen
         self._total_kept = trunc_count + self._total_kept
-        mem_used = self._manager.mem_usage
+        mem_stats = self._manager.memory_stats
+        mem_used = mem_stats["total"]
+        mem_parts = ", ".join(
+            f'{name} {size // 1024} kb'
+            for name, size in mem_stats.items()
+            if name != "total"
+        )
+        table_stats = self._manager.table_cache_stats
         if not self._hide_intermediate_output:
             print(
                 f'{full_count} new models, {trunc_count} kept; '
                 f'{self._total_gen + 1} total models, '
                 f'{self._total_kept + 1} total kept; '
-                f'{mem_used / 1024} kb memory used; ',
+                f'{mem_used / 1024} kb memory used ({mem_parts}); '
+                f'{table_stats["hits"]} table hits, '
+                f'{table_stats["misses"]} misses, '
+                f'{table_stats["evictions"]} evictions; ',
                 end=' ',
             )
         sys.stdout.flush()
+        # move the models kept out of this level's storage, so that it is
+        # released in bulk once the rest are gone
+        for model in best_models:
+            self._manager.promote_model(model)
         if clear_cache_flag:
             for item in new_models_heap:
                 self._manager.delete_model_from_cache(item[1])
@@ -520,7 +606,7 @@ class OCUtils:
                     self._manager.compute_incremental_alpha(model)
                 self._next_id += 1
                 model.id_ = self._next_id
-                model.delete_fit_table()  # recover fit table memory
+                self._manager.delete_fit_table(model)  # recover fit table memory
                 self._report.add_model(model)
             old_models = new_models
             # if the list is empty, stop. Also, only do one step for chain search
@@ -856,6 +942,9 @@ class OCUtils:
         search_width = self._manager.get_option("optimize-search-width")
         if search_width != "":
             self._search_width = int(float(search_width))
+        search_workers = self._manager.get_option("search-workers")
+        if search_workers != "":
+            self.set_search_workers(search_workers)
         ref_model = self._manager.get_option("reference-model")
         if ref_model != "":
             self._ref_model = ref_model
@@ -916,6 +1005,8 @@ class OCUtils:
             self.print_option("Models to consider", self._search_filter)
             self.print_option("Search width", self._search_width)
             self.print_option("Search levels", self._search_levels)
+            if self._search_workers > 1:
+                self.print_option("Search workers", self._search_workers)
             self.print_option("Search sort by", self.sort_name)
             self.print_option("Search preference", self._search_sort_dir)
             self.print_option("Report sort by", self._report_sort_name)